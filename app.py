@@ -1,29 +1,90 @@
 import streamlit as st
-import google.generativeai as genai
+from chat_memory import DEFAULT_PAGE_SIZE, ConversationMemory
+from food_retrieval import estimate_tokens
+from gemini_client import LazyGeminiModel
+from gemini_streaming import stream_response_text
+from request_metrics import create_metrics_recorder
+
+# Per-request metrics shared by every session of this process (same 'metrics' secrets as the Thai food app)
+@st.cache_resource
+def get_metrics_recorder():
+    return create_metrics_recorder(st.secrets['metrics'] if 'metrics' in st.secrets else {})
+
+# One model per API key for the whole process; the Gemini SDK is imported on first use, not on every rerun
+@st.cache_resource
+def get_model(key):
+    return LazyGeminiModel(key, 'gemini-2.0-flash-lite')
 
 try:
     key = st.secrets['gemini_api_key']
-    genai.configure(api_key=key)
-    model = genai.GenerativeModel('gemini-2.0-flash-lite')
+    model = get_model(key)
     
-    if "chat" not in st.session_state:
-        st.session_state.chat = model.start_chat(history=[])
+    # Full transcript for display; the chat session itself only keeps a summary plus the recent turns
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
     st.title('Gemini Pro Test')
     
-    def role_to_streamlit(role:str) -> str:
-        if role == 'model':
-            return 'assistant'
-        else:
-            return role
+    memory = st.session_state.chat_memory
     
-    for message in st.session_state.chat.history:
-        with st.chat_message(role_to_streamlit(message.role)):
-            st.markdown(message.parts[0].text)
+    # Render one page of the transcript instead of every message on each rerun
+    page_count = memory.page_count(DEFAULT_PAGE_SIZE)
+    page = page_count
+    if page_count > 1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=page_count, step=1)
+        st.caption(f"Showing page {page} of {page_count} ({memory.total_turns} turns)")
+    for _, question, answer in memory.page(page, DEFAULT_PAGE_SIZE):
+        st.chat_message('user').markdown(question)
+        st.chat_message('assistant').markdown(answer)
     
     if prompt := st.chat_input("Text Here"):
         st.chat_message('user').markdown(prompt)
-        response = st.session_state.chat.send_message(prompt)
-        with st.chat_message('assistant'):
-            st.markdown(response.text)
+        # The chat session is created with the first question, so opening the page never waits for the SDK
+        if "chat" not in st.session_state:
+            st.session_state.chat = model.start_chat(history=memory.chat_history())
+            st.session_state.chat_turns = 0
+        # Stream the answer as it arrives; the chat history is updated once the stream is consumed
+        timings = {}
+        # The chat session sends its whole history with every message, so count it in the prompt size
+        sent_texts = [prompt] + [part.text for content in st.session_state.chat.history for part in content.parts]
+        try:
+            with st.chat_message('assistant'):
+                answer = st.write_stream(stream_response_text(lambda: st.session_state.chat.send_message(prompt, stream=True), timings))
+                if timings.get('first_token_ms') is not None:
+                    st.caption(f"First token: {timings['first_token_ms']:.0f} ms · Total: {timings['total_ms']:.0f} ms")
+        except Exception as e:
+            timings['error'] = type(e).__name__
+            raise
+        finally:
+            get_metrics_recorder().record(
+                app='chat',
+                path='gemini',
+                model='gemini-2.0-flash-lite',
+                prompt_chars=sum(map(len, sent_texts)),
+                prompt_tokens=sum(map(estimate_tokens, sent_texts)),
+                usage_prompt_tokens=timings.get('usage_prompt_tokens'),
+                usage_output_tokens=timings.get('usage_output_tokens'),
+                first_token_ms=timings.get('first_token_ms'),
+                total_ms=timings.get('total_ms'),
+                error=timings.get('error')
+            )
+        memory.add(prompt, answer if isinstance(answer, str) else "".join(map(str, answer)))
+        # Gemini resends the whole chat history every turn; once a window of new turns has been sent
+        # on top of the seeded history, restart the session from the compact summary plus the recent turns.
+        # Count the turns sent rather than the history length: the seeded history (summary + window) is already full
+        st.session_state.chat_turns += 1
+        if st.session_state.chat_turns >= max(1, memory.window_turns):
+            st.session_state.chat = model.start_chat(history=memory.chat_history())
+            st.session_state.chat_turns = 0
+    # Latency percentiles of every chat in this process
+    summary = get_metrics_recorder().summary()
+    if summary['count']:
+        st.sidebar.markdown(f"**Latency (last {summary['count']} requests)**")
+        for field, label in (('first_token_ms', 'First token'), ('total_ms', 'Total'), ('prompt_tokens', 'Prompt tokens')):
+            if field in summary:
+                st.sidebar.markdown(f"- {label}: p50 {summary[field]['p50']:,.0f} / p95 {summary[field]['p95']:,.0f}")
+        if summary['error_count']:
+            st.sidebar.markdown(f"- Errors: {summary['error_count']}")
+    # Load the SDK in the background once the page is on screen
+    model.warm_up()
 except Exception as e:
     st.error(f'An error occurred {e}')
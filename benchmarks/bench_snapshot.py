@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.synthetic_data import write_dataset
+from food_snapshot import compile_snapshot
+
+# โค้ดที่รันใน process ใหม่ทุกครั้ง เพื่อวัด cold start จริง (รวมเวลา import pandas)
+_COLD_START_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from food_data_store import FoodDataStore
+snapshot = FoodDataStore({database!r}, {data_dict!r}, snapshot_dir={snapshot!r}).load()
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'seconds': elapsed, 'peak_rss_mb': rss_kb / 1024, 'rows': sum(len(df) for df in snapshot.dataframes.values())}}))
+"""
+
+# Function to measure cold-start load time and peak RSS in a fresh interpreter
+def measure_cold_start(database_dir, data_dict_dir, snapshot_dir=None, repeat=3):
+    script = _COLD_START_SCRIPT.format(repo=REPO_DIR, database=database_dir, data_dict=data_dict_dir, snapshot=snapshot_dir)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    # ใช้ค่ากลางของเวลา เพื่อลดผลของ disk cache ครั้งแรก
+    runs.sort(key=lambda run: run['seconds'])
+    return runs[len(runs) // 2]
+
+# Function to benchmark CSV vs snapshot loading for one dataset
+def bench_dataset(label, database_dir, data_dict_dir, work_dir, repeat):
+    snapshot_dir = os.path.join(work_dir, 'snapshot')
+    compile_snapshot(database_dir, data_dict_dir, snapshot_dir)
+    csv_run = measure_cold_start(database_dir, data_dict_dir, None, repeat)
+    snapshot_run = measure_cold_start(database_dir, data_dict_dir, snapshot_dir, repeat)
+    return [
+        (label, 'csv', csv_run),
+        (label, 'snapshot', snapshot_run),
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="วัดเวลา cold start และหน่วยความจำของการโหลดฐานข้อมูลจาก CSV เทียบกับ snapshot")
+    parser.add_argument("--synthetic-dishes", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="thai_food_bench_")
+    try:
+        results += bench_dataset(
+            "ข้อมูลปัจจุบัน (csv/)",
+            os.path.join(REPO_DIR, "csv", "database"),
+            os.path.join(REPO_DIR, "csv", "data_dict"),
+            os.path.join(work_dir, "current"),
+            args.repeat
+        )
+        synthetic_dir = os.path.join(work_dir, "synthetic")
+        database_dir, data_dict_dir = write_dataset(synthetic_dir, args.synthetic_dishes)
+        results += bench_dataset(
+            f"ข้อมูลจำลอง {args.synthetic_dishes:,} เมนู",
+            database_dir,
+            data_dict_dir,
+            synthetic_dir,
+            args.repeat
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'ชุดข้อมูล':<32}{'รูปแบบ':<10}{'แถว':>12}{'เวลา (วินาที)':>16}{'Peak RSS (MB)':>16}")
+    for label, mode, run in results:
+        print(f"{label:<32}{mode:<10}{run['rows']:>12,}{run['seconds']:>16.3f}{run['peak_rss_mb']:>16.1f}")
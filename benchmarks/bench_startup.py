@@ -0,0 +1,130 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# สคริปต์ Streamlit ที่วัด
+SCRIPTS = ('thai_food_database_app.py', 'app.py')
+
+# งบเวลา (ms): import ทุกโมดูลที่สคริปต์ import ไว้บนสุด และการ rerun หนึ่งครั้งหลังหน้าเว็บเปิดแล้ว
+# import streamlit เองใช้เวลาราว 400 ms จึงรวมอยู่ในงบ import แล้ว
+# ผลที่วัดได้และที่มาของงบอยู่ใน benchmarks/README.md และ benchmarks/startup_results.json
+IMPORT_BUDGET_MS = {
+    'thai_food_database_app.py': 700,
+    'app.py': 700,
+}
+RERUN_BUDGET_MS = {
+    'thai_food_database_app.py': 150,
+    'app.py': 100,
+}
+
+# โค้ดที่รันใน process ใหม่ เพื่อวัดเวลาเปิดหน้าแรกและเวลา rerun ของ Streamlit (ไม่รวม import streamlit.testing)
+_RERUN_SCRIPT = """
+import json, os, sys, time
+os.chdir({repo!r})
+sys.path.insert(0, {repo!r})
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({script!r}, default_timeout=120)
+started = time.perf_counter()
+app.run()
+first = time.perf_counter() - started
+reruns = []
+for _ in range({reruns}):
+    started = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - started)
+reruns.sort()
+print(json.dumps({{'first_run_ms': first * 1000, 'rerun_ms': reruns[len(reruns) // 2] * 1000, 'exceptions': len(app.exception)}}))
+"""
+
+# Function to list the module-level import statements of a script
+def script_imports(path):
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+# Function to run import statements under -X importtime in a fresh interpreter
+# คืนค่าเวลารวม (ms) และรายการโมดูลระดับบนสุดที่ใช้เวลามากที่สุด
+def measure_imports(statements, top=8):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "\n".join(statements)],
+        cwd=REPO_DIR, check=True, capture_output=True, text=True
+    )
+    # โมดูลที่ interpreter โหลดเองตอนเริ่ม (site, encodings) ไม่นับ
+    startup = {name for name, _ in _imported_modules(subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True
+    ).stderr)}
+    modules = [module for module in _imported_modules(result.stderr) if module[0] not in startup]
+    modules.sort(key=lambda module: module[1], reverse=True)
+    return round(sum(ms for _, ms in modules), 1), [(name, round(ms, 1)) for name, ms in modules[:top]]
+
+# Function to parse -X importtime output into [(module, cumulative_ms)] for directly imported modules
+def _imported_modules(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        # โมดูลที่ import โดยตรง (ไม่ใช่ import ซ้อน) ไม่มีช่องว่างนำหน้าชื่อ (import ซ้อนเยื้องทีละ 2 ช่อง)
+        name = name[1:]
+        if not name.startswith(" "):
+            modules.append((name.strip(), int(cumulative) / 1000))
+    return modules
+
+# Function to measure the first page load and a rerun with Streamlit's AppTest in a fresh interpreter
+def measure_reruns(script, reruns=5):
+    code = _RERUN_SCRIPT.format(repo=REPO_DIR, script=os.path.join(REPO_DIR, script), reruns=reruns)
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# Function to measure one script, taking the median of repeated cold imports
+def bench_script(script, repeat, reruns):
+    statements = script_imports(os.path.join(REPO_DIR, script))
+    runs = sorted((measure_imports(statements) for _ in range(repeat)), key=lambda run: run[0])
+    import_ms, heaviest = runs[len(runs) // 2]
+    result = {'script': script, 'import_ms': import_ms, 'heaviest': heaviest}
+    try:
+        result.update(measure_reruns(script, reruns))
+    except (subprocess.CalledProcessError, ValueError) as e:
+        # ไม่มี streamlit.testing หรือสคริปต์ล้มเหลว: รายงานเฉพาะเวลา import
+        result['rerun_error'] = str(e)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="วัดเวลา import (python -X importtime) และเวลา rerun ของสคริปต์ Streamlit เทียบกับงบเวลา")
+    parser.add_argument("--scripts", nargs="+", default=list(SCRIPTS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    results = [bench_script(script, args.repeat, args.reruns) for script in args.scripts]
+    over_budget = []
+    for result in results:
+        script = result['script']
+        print(f"{script}")
+        print(f"  import {result['import_ms']:,.0f} ms (งบ {IMPORT_BUDGET_MS.get(script, '-')} ms)")
+        for name, ms in result['heaviest']:
+            print(f"    {name:<32}{ms:>10,.1f} ms")
+        if 'rerun_ms' in result:
+            print(f"  เปิดหน้าแรก {result['first_run_ms']:,.0f} ms, rerun {result['rerun_ms']:,.1f} ms (งบ {RERUN_BUDGET_MS.get(script, '-')} ms)")
+        else:
+            print(f"  วัดเวลา rerun ไม่ได้: {result.get('rerun_error')}")
+        if script in IMPORT_BUDGET_MS and result['import_ms'] > IMPORT_BUDGET_MS[script]:
+            over_budget.append(f"{script}: import {result['import_ms']:,.0f} ms > {IMPORT_BUDGET_MS[script]} ms")
+        if script in RERUN_BUDGET_MS and result.get('rerun_ms', 0) > RERUN_BUDGET_MS[script]:
+            over_budget.append(f"{script}: rerun {result['rerun_ms']:,.1f} ms > {RERUN_BUDGET_MS[script]} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if over_budget:
+        print("เกินงบเวลา:")
+        for message in over_budget:
+            print(f"- {message}")
+        sys.exit(1)
@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.synthetic_data import write_dataset
+from request_metrics import percentile
+
+# ขนาดชุดข้อมูล (จำนวนแถวของ recipe_ingredients ซึ่งเป็นตารางที่ใหญ่ที่สุด)
+DEFAULT_SIZES = (10 ** 2, 10 ** 4, 10 ** 6)
+INGREDIENTS_PER_DISH = 8
+
+# จำนวน client ที่ส่งคำถามเข้า HTTP API พร้อมกัน
+API_CLIENTS = 8
+
+# ไฟล์ค่าอ้างอิงสำหรับตรวจ regression และค่าที่ยอมให้ช้าลง/ใช้หน่วยความจำมากขึ้นได้
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.5
+
+# ค่าที่ยิ่งน้อยยิ่งดี (ใช้ตรวจ regression); throughput ตรวจแยกเพราะยิ่งมากยิ่งดี
+LOWER_IS_BETTER = (
+    'load_cold_s', 'load_warm_ms', 'index_build_s',
+    'prompt_p50_ms', 'prompt_p95_ms', 'flow_p50_ms', 'flow_p95_ms', 'api_p50_ms', 'api_p95_ms', 'peak_rss_mb',
+)
+HIGHER_IS_BETTER = ('prompt_qps', 'flow_qps', 'api_qps')
+
+# ส่วนต่างขั้นต่ำที่นับเป็น regression ตามหน่วยของค่า (ค่าที่เล็กมาก เช่น rerun 0.1 ms แกว่งเกิน 50% ได้ตามปกติ)
+MIN_REGRESSION_DELTA = {'_ms': 1.0, '_s': 0.05, '_mb': 20.0}
+
+# Function to get the peak resident memory of this process so far (MB)
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Function to build benchmark questions from the dataset, covering every answer path
+def build_questions(dataframes, count):
+    dishes_df = dataframes['dishes_df']
+    ingredients_df = dataframes['ingredients_df']
+    step = max(1, len(dishes_df) // max(1, count))
+    questions = []
+    for i in range(count):
+        dish = dishes_df.iloc[(i * step) % len(dishes_df)]
+        ingredient = ingredients_df.iloc[(i * 7) % len(ingredients_df)]
+        kind = i % 6
+        if kind == 0:
+            questions.append(f"{dish['dish_name']}ใส่อะไรบ้าง")
+        elif kind == 1:
+            questions.append(f"{dish['dish_name']}เผ็ดไหม เหมาะกับเด็กหรือเปล่า")
+        elif kind == 2:
+            questions.append(f"มี{ingredient['ingredient_name']}ทำอะไรได้บ้าง")
+        elif kind == 3:
+            questions.append(f"อาหารภาค{dish['region']}แนะนำอะไรบ้าง")
+        elif kind == 4:
+            # สะกดผิด/ไม่ตรงชื่อ ต้องใช้ embedding index
+            questions.append(f"{str(dish['dish_name'])[:-1]}สูตรโบราณ")
+        else:
+            questions.append("อาหารที่มีแคลอรี่น้อยที่สุดคืออะไร")
+    return questions
+
+# Function to send questions to the HTTP API from client threads; returns per-request latencies (ms)
+def post_questions(port, questions, clients):
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    def post(question):
+        started = time.perf_counter()
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}/ask",
+            data=json.dumps({'question': question}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        return list(executor.map(post, questions))
+
+# Function to run every stage for one dataset size in this process; returns a dict of metrics
+def run_size(rows, questions, work_dir, repeat):
+    from fake_gemini import FakeGeminiModel
+    from food_data_store import FoodDataStore
+    from food_embeddings import EmbeddingIndex, set_embedding_index
+    from food_api import FoodAPIServer
+    from food_prompt import generate_gemini_prompt
+    from food_qa_core import FoodQAService, tables_from_files
+    from food_retrieval import DEFAULT_TOKEN_BUDGET
+    from gemini_client import GeminiClient
+    from response_cache import ResponseCache
+
+    n_dishes = max(1, rows // INGREDIENTS_PER_DISH)
+    database_dir, data_dict_dir = write_dataset(work_dir, n_dishes, ingredients_per_dish=INGREDIENTS_PER_DISH)
+    result = {'rows': rows, 'dishes': n_dishes}
+
+    # 1. โหลด CSV (เทียบเท่า load_csv_from_directories: อ่านไฟล์ + คำนวณ aggregates + index วัตถุดิบ)
+    store = FoodDataStore(database_dir, data_dict_dir)
+    started = time.perf_counter()
+    snapshot = store.load()
+    result['load_cold_s'] = round(time.perf_counter() - started, 3)
+    # rerun ของ Streamlit: ไฟล์ไม่เปลี่ยน ต้องได้ snapshot เดิมทันที
+    started = time.perf_counter()
+    for _ in range(repeat):
+        store.load()
+    result['load_warm_ms'] = round((time.perf_counter() - started) * 1000 / repeat, 3)
+
+    dataframes = tables_from_files(snapshot.dataframes)
+    dataframes['aggregates_df'] = snapshot.aggregates_df
+
+    # embedding index ของ benchmark เก็บในโฟลเดอร์ชั่วคราว ไม่ปนกับ csv/snapshot ของแอป
+    index = EmbeddingIndex(path=os.path.join(work_dir, 'embeddings.npz'))
+    set_embedding_index(index, dataframes['dishes_df'], dataframes['ingredients_df'])
+    started = time.perf_counter()
+    index.update(dataframes['dishes_df'], dataframes['ingredients_df'])
+    result['index_build_s'] = round(time.perf_counter() - started, 3)
+
+    question_list = build_questions(dataframes, questions)
+
+    # 2. สร้าง prompt
+    latencies = []
+    prompt_tokens = []
+    started = time.perf_counter()
+    for question in question_list:
+        question_started = time.perf_counter()
+        prompt = generate_gemini_prompt(question, dataframes, DEFAULT_TOKEN_BUDGET)
+        latencies.append((time.perf_counter() - question_started) * 1000)
+        prompt_tokens.append(len(prompt))
+    elapsed = time.perf_counter() - started
+    result['prompt_qps'] = round(len(question_list) / elapsed, 2)
+    result['prompt_p50_ms'] = round(percentile(latencies, 50), 3)
+    result['prompt_p95_ms'] = round(percentile(latencies, 95), 3)
+    result['prompt_chars_p50'] = percentile(prompt_tokens, 50)
+
+    # 3. ทั้ง flow ผ่าน FoodQAService กับโมเดลจำลอง (ถามชุดคำถามซ้ำ repeat รอบ รอบหลังๆ จะได้จาก cache)
+    model = GeminiClient(
+        FakeGeminiModel(responder=lambda prompt: f"คำตอบจำลอง ({len(prompt)} ตัวอักษร)"),
+        requests_per_minute=10 ** 9
+    )
+    service = FoodQAService(store=store, model=model, cache=ResponseCache(), model_name='fake')
+    service.tables()
+    latencies = []
+    paths = {}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for question in question_list:
+            answer = service.answer(question)
+            latencies.append(answer['total_ms'])
+            paths[answer['path']] = paths.get(answer['path'], 0) + 1
+    elapsed = time.perf_counter() - started
+    result['flow_qps'] = round(len(latencies) / elapsed, 2)
+    result['flow_p50_ms'] = round(percentile(latencies, 50), 3)
+    result['flow_p95_ms'] = round(percentile(latencies, 95), 3)
+    result['flow_paths'] = paths
+
+    # 4. HTTP API: client หลาย thread ส่งคำถามพร้อมกัน (ล้าง cache ก่อน ให้ต้องสร้าง prompt จริง)
+    service.cache = ResponseCache()
+    server = FoodAPIServer(service, port=0, workers=API_CLIENTS)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        started = time.perf_counter()
+        latencies = post_questions(server.port, question_list * repeat, API_CLIENTS)
+        elapsed = time.perf_counter() - started
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        model.close()
+    result['api_qps'] = round(len(latencies) / elapsed, 2)
+    result['api_p50_ms'] = round(percentile(latencies, 50), 3)
+    result['api_p95_ms'] = round(percentile(latencies, 95), 3)
+    result['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return result
+
+# Function to run one size in a fresh interpreter, so peak memory belongs to that size only
+def run_size_subprocess(rows, questions, repeat):
+    command = [sys.executable, os.path.abspath(__file__), "--single", str(rows), "--questions", str(questions), "--repeat", str(repeat)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# Function to compare results against a baseline; returns a list of regression messages
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for result in results:
+        reference = baseline.get(str(result['rows']))
+        if not reference:
+            continue
+        for metric in LOWER_IS_BETTER:
+            floor = next((delta for suffix, delta in MIN_REGRESSION_DELTA.items() if metric.endswith(suffix)), 0.0)
+            if metric in result and metric in reference and result[metric] > max(reference[metric] * (1 + tolerance), reference[metric] + floor):
+                regressions.append(f"{result['rows']:,} แถว {metric}: {result[metric]} > {reference[metric]} (+{tolerance:.0%})")
+        for metric in HIGHER_IS_BETTER:
+            if metric in result and metric in reference and result[metric] < reference[metric] / (1 + tolerance):
+                regressions.append(f"{result['rows']:,} แถว {metric}: {result[metric]} < {reference[metric]} (-{tolerance:.0%})")
+    return regressions
+
+# Function to print the results as a table
+def print_results(results):
+    columns = [
+        ('rows', 'แถว'), ('load_cold_s', 'โหลด (s)'), ('load_warm_ms', 'rerun (ms)'), ('index_build_s', 'index (s)'),
+        ('prompt_p50_ms', 'prompt p50'), ('prompt_p95_ms', 'prompt p95'), ('prompt_qps', 'prompt q/s'),
+        ('flow_p50_ms', 'flow p50'), ('flow_p95_ms', 'flow p95'), ('flow_qps', 'flow q/s'),
+        ('api_p50_ms', 'api p50'), ('api_p95_ms', 'api p95'), ('api_qps', 'api q/s'), ('peak_rss_mb', 'RSS (MB)'),
+    ]
+    print("".join(f"{label:>13}" for _, label in columns))
+    for result in results:
+        print("".join(f"{result.get(key, '-'):>13,}" if isinstance(result.get(key), (int, float)) else f"{'-':>13}" for key, _ in columns))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="วัดประสิทธิภาพการโหลดข้อมูล การสร้าง prompt และ flow การตอบคำถามกับโมเดลจำลอง")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="จำนวนแถวของ recipe_ingredients")
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="บันทึกผลครั้งนี้เป็นค่าอ้างอิง")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="ล้มเหลวถ้าไม่มีค่าอ้างอิงของขนาดที่วัด (ใช้ใน CI)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        work_dir = tempfile.mkdtemp(prefix="thai_food_suite_")
+        try:
+            print(json.dumps(run_size(args.single, args.questions, work_dir, args.repeat)))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        sys.exit(0)
+
+    results = []
+    for rows in args.sizes:
+        print(f"กำลังวัดชุดข้อมูล {rows:,} แถว ...", file=sys.stderr)
+        results.append(run_size_subprocess(rows, args.questions, args.repeat))
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update({str(result['rows']): {key: value for key, value in result.items() if key in LOWER_IS_BETTER + HIGHER_IS_BETTER} for result in results})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"บันทึกค่าอ้างอิงที่ {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        missing = [result['rows'] for result in results if str(result['rows']) not in baseline]
+        if missing and args.check:
+            print(f"ไม่มีค่าอ้างอิงของขนาด {', '.join(f'{rows:,}' for rows in missing)} ใน {args.baseline} (สร้างด้วย --save-baseline)")
+            sys.exit(1)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("พบ regression:")
+            for message in regressions:
+                print(f"- {message}")
+            sys.exit(1)
+        print("ไม่พบ regression เทียบกับค่าอ้างอิง")
+    elif args.check:
+        print(f"ไม่พบไฟล์ค่าอ้างอิง {args.baseline} (สร้างด้วย --save-baseline)")
+        sys.exit(1)
+    else:
+        print(f"ไม่พบไฟล์ค่าอ้างอิง {args.baseline} จึงไม่ได้ตรวจ regression")
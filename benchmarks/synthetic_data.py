@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# คำที่ใช้สร้างชื่ออาหารและวัตถุดิบจำลอง
+DISH_TYPES = ['ต้ม', 'ผัด', 'แกง', 'ยำ', 'ทอด', 'นึ่ง', 'ปิ้ง/ย่าง', 'ตุ๋น', 'น้ำพริก']
+REGIONS = ['กลาง', 'อีสาน', 'เหนือ', 'ใต้']
+MAIN_INGREDIENTS = ['กุ้ง', 'ไก่', 'หมู', 'เนื้อ', 'ปลา', 'ปลาหมึก', 'เต้าหู้', 'ผักรวม', 'เห็ด', 'ไข่']
+INGREDIENT_CATEGORIES = ['เครื่องเทศ', 'เครื่องปรุง', 'ผัก', 'เนื้อสัตว์', 'อาหารทะเล', 'แป้ง', 'ไข่', 'เห็ด']
+RECIPE_UNITS = ['กรัม', 'ช้อนโต๊ะ', 'ช้อนชา', 'เม็ด', 'ใบ', 'กลีบ', 'ลูก', 'ต้น']
+PURCHASE_UNITS = ['กิโลกรัม', 'กิโลกรัม', 'กิโลกรัม', 'ลิตร', 'ขวด 700 มล.', 'ฟอง']
+
+# Function to generate synthetic thai_dishes/ingredients/recipe_ingredients/cooking_steps frames
+def generate_dataset(n_dishes, n_ingredients=None, ingredients_per_dish=8, steps_per_dish=5, seed=0):
+    rng = np.random.default_rng(seed)
+    if n_ingredients is None:
+        n_ingredients = int(min(max(70, n_dishes // 10), 20000))
+
+    dish_ids = np.char.add('D', np.char.zfill(np.arange(1, n_dishes + 1).astype(str), 7))
+    dish_types = rng.choice(DISH_TYPES, n_dishes)
+    mains = rng.choice(MAIN_INGREDIENTS, n_dishes)
+    dishes_df = pd.DataFrame({
+        'dish_id': dish_ids,
+        'dish_name': np.char.add(np.char.add(dish_types.astype(str), mains.astype(str)), np.arange(1, n_dishes + 1).astype(str)),
+        'dish_type': dish_types,
+        'region': rng.choice(REGIONS, n_dishes),
+        'spicy_level': rng.integers(0, 6, n_dishes),
+        'cooking_time_minutes': rng.integers(10, 121, n_dishes),
+        'difficulty_level': rng.integers(1, 6, n_dishes),
+        'description': np.char.add('อาหารจำลองสำหรับทดสอบประสิทธิภาพ รสชาติแบบ', dish_types.astype(str)),
+    })
+
+    ingredient_ids = np.char.add('I', np.char.zfill(np.arange(1, n_ingredients + 1).astype(str), 6))
+    ingredients_df = pd.DataFrame({
+        'ingredient_id': ingredient_ids,
+        'ingredient_name': np.char.add('วัตถุดิบ', np.arange(1, n_ingredients + 1).astype(str)),
+        'category': rng.choice(INGREDIENT_CATEGORIES, n_ingredients),
+        'price_per_unit': rng.integers(10, 500, n_ingredients),
+        'unit': rng.choice(PURCHASE_UNITS, n_ingredients),
+        'source': rng.choice(['ตลาดสด', 'สวนผัก', 'ฟาร์ม'], n_ingredients),
+        'shelf_life_days': rng.integers(1, 366, n_ingredients),
+        'calories_per_100g': rng.integers(5, 900, n_ingredients),
+    })
+
+    n_recipe = n_dishes * ingredients_per_dish
+    recipe_df = pd.DataFrame({
+        'dish_id': np.repeat(dish_ids, ingredients_per_dish),
+        'ingredient_id': ingredient_ids[rng.integers(0, n_ingredients, n_recipe)],
+        'amount': rng.integers(1, 500, n_recipe),
+        'unit': rng.choice(RECIPE_UNITS, n_recipe),
+        'notes': rng.choice(['', 'หั่นชิ้น', 'สับ', 'ซอย'], n_recipe),
+    }).drop_duplicates(['dish_id', 'ingredient_id'])
+
+    n_steps = n_dishes * steps_per_dish
+    cooking_steps_df = pd.DataFrame({
+        'dish_id': np.repeat(dish_ids, steps_per_dish),
+        'step_number': np.tile(np.arange(1, steps_per_dish + 1), n_dishes),
+        'instruction': np.char.add('ขั้นตอนจำลองที่ ', np.tile(np.arange(1, steps_per_dish + 1), n_dishes).astype(str)),
+    })
+
+    return {
+        'thai_dishes.csv': dishes_df,
+        'ingredients.csv': ingredients_df,
+        'recipe_ingredients.csv': recipe_df,
+        'cooking_steps.csv': cooking_steps_df,
+    }
+
+# Function to write a synthetic dataset as csv/database + csv/data_dict under base_dir
+def write_dataset(base_dir, n_dishes, **kwargs):
+    database_dir = os.path.join(base_dir, 'database')
+    data_dict_dir = os.path.join(base_dir, 'data_dict')
+    os.makedirs(database_dir, exist_ok=True)
+    os.makedirs(data_dict_dir, exist_ok=True)
+    for filename, df in generate_dataset(n_dishes, **kwargs).items():
+        df.to_csv(os.path.join(database_dir, filename), index=False, encoding='utf-8')
+        # data dictionary อย่างง่ายจากชื่อคอลัมน์
+        pd.DataFrame({
+            'field_name': df.columns,
+            'data_type': ['numeric' if pd.api.types.is_numeric_dtype(df[col]) else 'string' for col in df.columns],
+            'description': df.columns,
+        }).to_csv(os.path.join(data_dict_dir, filename.replace('.csv', '_data_dict.csv')), index=False, encoding='utf-8')
+    return database_dir, data_dict_dir
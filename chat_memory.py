@@ -0,0 +1,151 @@
+import re
+
+from food_retrieval import estimate_tokens
+
+# จำนวนรอบสนทนาล่าสุดที่เก็บไว้ครบทุกคำ
+DEFAULT_WINDOW_TURNS = 4
+
+# งบประมาณ token ของบทสนทนาที่แนบไปกับ prompt (ความจำย่อ + รอบล่าสุด)
+DEFAULT_MEMORY_TOKENS = 1000
+
+# จำนวนรอบสนทนาที่แสดงต่อหน้า
+DEFAULT_PAGE_SIZE = 10
+
+# จำนวนรอบสนทนาสูงสุดที่เก็บไว้สำหรับแสดงผลและดาวน์โหลด (รอบที่เก่ากว่านี้เหลือเฉพาะในความจำย่อ)
+DEFAULT_MAX_STORED_TURNS = 500
+
+# ความยาวสูงสุดของคำถาม/คำตอบในความจำย่อ (ตัวอักษร)
+SUMMARY_QUESTION_CHARS = 80
+SUMMARY_ANSWER_CHARS = 160
+
+# Function to shorten text to a number of characters, cutting at the end of a sentence/line when possible
+def _shorten(text, limit):
+    text = re.sub(r"[*#`>|]+", "", str(text))
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # ตัดที่ช่องว่างสุดท้าย (ภาษาไทยใช้ช่องว่างแบ่งประโยค)
+    space = cut.rfind(" ")
+    if space > limit // 2:
+        cut = cut[:space]
+    return cut + "…"
+
+# Function to summarize old turns into one line each (local and free, no Gemini call)
+def summarize_turns(turns):
+    return [
+        f"- ถาม: {_shorten(question, SUMMARY_QUESTION_CHARS)} → ตอบ: {_shorten(answer, SUMMARY_ANSWER_CHARS)}"
+        for question, answer in turns
+    ]
+
+# Chat history with a verbatim window of recent turns and a compact summary of older ones
+class ConversationMemory:
+    def __init__(
+        self,
+        window_turns=DEFAULT_WINDOW_TURNS,
+        memory_tokens=DEFAULT_MEMORY_TOKENS,
+        max_stored_turns=DEFAULT_MAX_STORED_TURNS,
+        summarizer=summarize_turns
+    ):
+        self.window_turns = window_turns
+        self.memory_tokens = memory_tokens
+        self.max_stored_turns = max_stored_turns
+        # summarizer: ฟังก์ชันรับ [(question, answer)] แล้วคืนรายการบรรทัดสรุป
+        self.summarizer = summarizer
+        self.turns = []
+        self.summary_lines = []
+        self.total_turns = 0
+        self._summarized = 0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def __iter__(self):
+        return iter(self.turns)
+
+    def add(self, question, answer):
+        self.turns.append((question, answer))
+        self.total_turns += 1
+        self._compact()
+
+    def clear(self):
+        self.turns = []
+        self.summary_lines = []
+        self.total_turns = 0
+        self._summarized = 0
+
+    def _compact(self):
+        # ย่อรอบที่หลุดจากหน้าต่างล่าสุด (ย่อรอบละครั้งเดียว ไม่ย่อซ้ำทุก rerun)
+        old_end = len(self.turns) - self.window_turns
+        if old_end > self._summarized:
+            self.summary_lines.extend(self.summarizer(self.turns[self._summarized:old_end]))
+            self._summarized = old_end
+        # ความจำย่อเกินงบประมาณ: ตัดบรรทัดที่เก่าที่สุดทิ้ง
+        while self.summary_lines and estimate_tokens("\n".join(self.summary_lines)) > self.memory_tokens // 2:
+            self.summary_lines.pop(0)
+        # จำกัดจำนวนรอบที่เก็บไว้แสดงผล (รอบที่ถูกตัดถูกย่อไว้แล้ว)
+        overflow = len(self.turns) - self.max_stored_turns
+        if overflow > 0:
+            del self.turns[:overflow]
+            self._summarized = max(0, self._summarized - overflow)
+
+    @property
+    def recent_turns(self):
+        return self.turns[-self.window_turns:] if self.window_turns else []
+
+    # Function to build the conversation block sent with the prompt, capped at token_budget
+    def context_block(self, token_budget=None):
+        token_budget = self.memory_tokens if token_budget is None else token_budget
+        if not self.turns or token_budget <= 0:
+            return ""
+        # รอบล่าสุดสำคัญที่สุด: เพิ่มจากใหม่ไปเก่าจนเต็มงบประมาณ
+        recent = []
+        used = 0
+        for question, answer in reversed(self.recent_turns):
+            text = f"ผู้ใช้: {question}\nแชทบอท: {answer}"
+            tokens = estimate_tokens(text)
+            if used + tokens > token_budget:
+                # คำตอบยาวเกินงบประมาณ ใช้ฉบับย่อแทน
+                text = f"ผู้ใช้: {question}\nแชทบอท: {_shorten(answer, SUMMARY_ANSWER_CHARS)}"
+                tokens = estimate_tokens(text)
+                if used + tokens > token_budget:
+                    break
+            recent.insert(0, text)
+            used += tokens
+        sections = []
+        summary = []
+        for line in reversed(self.summary_lines):
+            tokens = estimate_tokens(line)
+            if used + tokens > token_budget:
+                break
+            summary.insert(0, line)
+            used += tokens
+        if summary:
+            sections.append("สรุปบทสนทนาก่อนหน้า:\n" + "\n".join(summary))
+        if recent:
+            sections.append("บทสนทนาล่าสุด:\n" + "\n\n".join(recent))
+        return "\n\n".join(sections)
+
+    def page_count(self, page_size=DEFAULT_PAGE_SIZE):
+        return max(1, -(-len(self.turns) // page_size))
+
+    # Function to get the turns of one page (page 1 = oldest), returns [(turn_number, question, answer)]
+    def page(self, page_number, page_size=DEFAULT_PAGE_SIZE):
+        page_number = min(max(1, page_number), self.page_count(page_size))
+        first_number = self.total_turns - len(self.turns) + 1
+        start = (page_number - 1) * page_size
+        return [
+            (first_number + start + offset, question, answer)
+            for offset, (question, answer) in enumerate(self.turns[start:start + page_size])
+        ]
+
+    # Function to rebuild Gemini chat history: summary as the first exchange, then the recent turns verbatim
+    def chat_history(self):
+        history = []
+        if self.summary_lines:
+            history.append({'role': 'user', 'parts': ["สรุปบทสนทนาก่อนหน้า (ใช้เป็นบริบท):\n" + "\n".join(self.summary_lines)]})
+            history.append({'role': 'model', 'parts': ["รับทราบ"]})
+        for question, answer in self.recent_turns:
+            history.append({'role': 'user', 'parts': [question]})
+            history.append({'role': 'model', 'parts': [answer]})
+        return history
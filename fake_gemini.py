@@ -0,0 +1,167 @@
+import threading
+import time
+
+# คำตอบเริ่มต้นของโมเดลจำลอง
+DEFAULT_FAKE_RESPONSE = "นี่คือคำตอบจากโมเดลจำลองสำหรับทดสอบ ไม่ได้เชื่อมต่อกับ Gemini จริง"
+
+# ข้อความบางส่วนของคำตอบ (มีโครงสร้างเหมือน chunk ของ Gemini)
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+# คำตอบทั้งหมดของการเรียกแบบไม่สตรีม
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+# คำตอบแบบสตรีม วนลูปได้เป็น chunk และมี .text เมื่ออ่านครบแล้ว
+class FakeStreamResponse:
+    def __init__(self, chunks, chunk_delay, first_chunk_delay, on_complete=None, error=None, error_after=0):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._first_chunk_delay = first_chunk_delay
+        self._on_complete = on_complete
+        # error: exception ที่จะ raise หลังส่งไปแล้ว error_after chunk (จำลองการเชื่อมต่อหลุดกลางคำตอบ)
+        self._error = error
+        self._error_after = error_after
+        self._received = []
+
+    def __iter__(self):
+        for index, chunk in enumerate(self._chunks):
+            if self._error is not None and index == self._error_after:
+                raise self._error
+            delay = self._first_chunk_delay if index == 0 else self._chunk_delay
+            if delay:
+                time.sleep(delay)
+            self._received.append(chunk)
+            yield FakeChunk(chunk)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    @property
+    def text(self):
+        return "".join(self._received)
+
+# ส่วนของข้อความในประวัติการสนทนา
+class FakePart:
+    def __init__(self, text):
+        self.text = text
+
+# ข้อความหนึ่งรายการในประวัติการสนทนา (role = 'user' หรือ 'model')
+class FakeContent:
+    def __init__(self, role, text):
+        self.role = role
+        self.parts = [FakePart(text)]
+
+# Local stand-in for genai.GenerativeModel used in tests and benchmarks
+class FakeGeminiModel:
+    def __init__(self, responder=None, chunk_size=20, chunk_delay=0.0, first_chunk_delay=0.0, latency=0.0, errors=None, stream_error=None, stream_error_after=1):
+        # responder: ฟังก์ชันรับ prompt แล้วคืนข้อความคำตอบ
+        self.responder = responder or (lambda prompt: DEFAULT_FAKE_RESPONSE)
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.first_chunk_delay = first_chunk_delay
+        self.latency = latency
+        # errors: exception ที่จะ raise ตามลำดับการเรียก (None = ตอบปกติ) ใช้จำลอง 429/5xx
+        self.errors = list(errors or [])
+        # stream_error: exception ที่ stream ครั้งแรกจะ raise หลังส่งไปแล้ว stream_error_after chunk
+        self.stream_error = stream_error
+        self.stream_error_after = stream_error_after
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _split(self, text):
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            if self.latency:
+                time.sleep(self.latency)
+            raise error
+        text = self.responder(prompt)
+        if stream:
+            with self._lock:
+                stream_error, self.stream_error = self.stream_error, None
+            return FakeStreamResponse(
+                self._split(text), self.chunk_delay, self.first_chunk_delay or self.latency,
+                error=stream_error, error_after=self.stream_error_after
+            )
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(text)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+# Local stand-in for genai.ChatSession
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        # เหมือน Gemini: รับประวัติเป็น dict {'role', 'parts'} ได้ด้วย
+        self.history = [
+            FakeContent(item['role'], item['parts'][0]) if isinstance(item, dict) else item
+            for item in (history or [])
+        ]
+
+    def send_message(self, content, stream=False, **kwargs):
+        self.history.append(FakeContent('user', content))
+        response = self.model.generate_content(content, stream=stream)
+        if stream:
+            # เหมือน Gemini: ประวัติจะมีคำตอบเมื่ออ่าน stream ครบแล้ว
+            response._on_complete = lambda text: self.history.append(FakeContent('model', text))
+        else:
+            self.history.append(FakeContent('model', response.text))
+        return response
+
+# การเรียกฟังก์ชันหนึ่งครั้งในคำตอบของโมเดล (โครงสร้างเหมือน FunctionCall ของ Gemini)
+class FakeFunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+# ส่วนของคำตอบที่เป็นข้อความหรือการเรียกฟังก์ชัน
+class FakeToolPart:
+    def __init__(self, text="", function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+# คำตอบหนึ่งตัวเลือกของโมเดล
+class FakeCandidate:
+    def __init__(self, content):
+        self.content = content
+
+# คำตอบแบบ function calling: candidates[0].content.parts เหมือน GenerateContentResponse
+class FakeToolResponse:
+    def __init__(self, parts):
+        content = FakeContent('model', "")
+        content.parts = parts
+        self.candidates = [FakeCandidate(content)]
+
+    @property
+    def text(self):
+        return "".join(part.text for part in self.candidates[0].content.parts)
+
+# Scripted stand-in for function calling: each call returns the next step of the script
+# script: รายการขั้นตอน แต่ละขั้นเป็นข้อความ (ตอบ) หรือ [(ชื่อฟังก์ชัน, args), ...] (เรียกเครื่องมือ)
+# ถ้ามีคำขอเกินจำนวนขั้นตอน จะตอบด้วย final_text
+class ScriptedToolModel:
+    def __init__(self, script, final_text=DEFAULT_FAKE_RESPONSE):
+        self.script = list(script)
+        self.final_text = final_text
+        # คำขอทั้งหมดที่ได้รับ: (contents, kwargs) ใช้ตรวจว่าผลของเครื่องมือถูกส่งกลับไปครบ
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with self._lock:
+            self.requests.append((list(contents), kwargs))
+            step = self.script.pop(0) if self.script else self.final_text
+        mode = kwargs.get('tool_config', {}).get('function_calling_config', {}).get('mode')
+        if isinstance(step, str) or mode == 'NONE':
+            return FakeToolResponse([FakeToolPart(step if isinstance(step, str) else self.final_text)])
+        return FakeToolResponse([FakeToolPart(function_call=FakeFunctionCall(name, args)) for name, args in step])
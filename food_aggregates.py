@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from food_units import quantity_columns
+
+# คอลัมน์ของตารางสรุปต่อจาน
+AGGREGATE_COLUMNS = [
+    'dish_id',
+    'dish_name',
+    'total_calories',
+    'estimated_cost',
+    'ingredient_count',
+    'total_grams',
+    'unconverted_count',
+    'uncosted_count',
+]
+
+# Function to read a numeric column as float array (NaN when the column is missing)
+def _numeric_column(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='float64')
+
+# Function to compute per-dish aggregates with a single merge/groupby
+def compute_dish_aggregates(dishes_df, ingredients_df, recipe_df, dish_ids=None):
+    recipe = recipe_df if dish_ids is None else recipe_df[recipe_df['dish_id'].isin(dish_ids)]
+
+    # ปริมาณเป็นกรัมและเป็นสัดส่วนของหน่วยที่ซื้อ (ตารางจาก FoodDataStore แปลงไว้แล้วตอนโหลด)
+    if 'grams' not in recipe.columns or 'purchase_units' not in recipe.columns:
+        recipe = recipe.assign(**quantity_columns(recipe, ingredients_df))
+    ingredient_columns = [c for c in ('ingredient_id', 'price_per_unit', 'calories_per_100g') if c in ingredients_df.columns]
+    merged = recipe[['dish_id', 'ingredient_id', 'grams', 'purchase_units']].merge(
+        ingredients_df[ingredient_columns],
+        on='ingredient_id',
+        how='left'
+    )
+
+    # คำนวณแคลอรี่และต้นทุนของทุกแถวแบบ vectorized
+    grams = merged['grams'].to_numpy(dtype='float64')
+    calories_per_100g = _numeric_column(merged, 'calories_per_100g')
+    price = _numeric_column(merged, 'price_per_unit')
+
+    merged = merged.assign(
+        calories=grams / 100.0 * calories_per_100g,
+        cost=merged['purchase_units'].to_numpy(dtype='float64') * price,
+        unconverted=np.isnan(grams)
+    )
+    # แถวที่คิดต้นทุนไม่ได้ (หน่วยที่ซื้อไม่มีน้ำหนัก เช่น ขวด/กระป๋อง หรือไม่มีราคา) ถูกข้ามตอน sum จึงต้องนับไว้
+    merged['uncosted'] = merged['cost'].isna()
+
+    aggregates = merged.groupby('dish_id', sort=False, observed=True).agg(
+        total_calories=('calories', 'sum'),
+        estimated_cost=('cost', 'sum'),
+        ingredient_count=('ingredient_id', 'nunique'),
+        total_grams=('grams', 'sum'),
+        unconverted_count=('unconverted', 'sum'),
+        uncosted_count=('uncosted', 'sum')
+    ).reset_index()
+
+    # ใส่ชื่ออาหาร และให้อาหารที่ไม่มีสูตรยังอยู่ในตาราง (ค่าเป็น 0)
+    dishes = dishes_df[['dish_id', 'dish_name']]
+    if dish_ids is not None:
+        dishes = dishes[dishes['dish_id'].isin(dish_ids)]
+    aggregates = dishes.merge(aggregates, on='dish_id', how='left')
+    aggregates[['total_calories', 'estimated_cost', 'total_grams']] = (
+        aggregates[['total_calories', 'estimated_cost', 'total_grams']].fillna(0.0).round(1)
+    )
+    count_columns = ['ingredient_count', 'unconverted_count', 'uncosted_count']
+    aggregates[count_columns] = aggregates[count_columns].fillna(0).astype('int32')
+    return aggregates[AGGREGATE_COLUMNS]
+
+# Function to hash a whole table (order-sensitive)
+def _table_hash(df):
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+# Function to hash rows grouped by a key column so only changed keys are recomputed
+def _row_hashes(df, key):
+    row_hashes = pd.util.hash_pandas_object(df, index=False)
+    return row_hashes.groupby(df[key].to_numpy(), sort=False).sum()
+
+# Function to list keys whose rows changed, were added or were removed between two hash series
+def _changed_keys(old, new):
+    joined = pd.concat([old.rename('old'), new.rename('new')], axis=1)
+    return joined.index[joined['old'] != joined['new']]
+
+# Index of per-dish aggregates, rebuilt incrementally when the source tables change
+class DishAggregateIndex:
+    def __init__(self):
+        self.aggregates = None
+        # จำนวนจานที่คำนวณใหม่ในการ update ครั้งล่าสุด (None = คำนวณใหม่ทั้งหมด)
+        self.last_recomputed = None
+        self._sources = None
+        self._dishes_hash = None
+        self._ingredient_hashes = None
+        self._recipe_hashes = None
+
+    def update(self, dishes_df, ingredients_df, recipe_df):
+        # ถ้าเป็น DataFrame ชุดเดิมไม่ต้องคำนวณใหม่
+        sources = (dishes_df, ingredients_df, recipe_df)
+        if self.aggregates is not None and self._sources is not None and all(a is b for a, b in zip(sources, self._sources)):
+            return self.aggregates
+
+        # ตารางที่ไม่เปลี่ยน (DataFrame เดิมจาก FoodDataStore) ใช้ hash เดิม ไม่ต้อง hash ใหม่
+        previous = self._sources or (None, None, None)
+        dishes_hash = self._dishes_hash if dishes_df is previous[0] else _table_hash(dishes_df)
+        ingredient_hashes = self._ingredient_hashes if ingredients_df is previous[1] else _row_hashes(ingredients_df, 'ingredient_id')
+        recipe_hashes = self._recipe_hashes if recipe_df is previous[2] else _row_hashes(recipe_df, 'dish_id')
+
+        if self.aggregates is None:
+            self.aggregates = compute_dish_aggregates(dishes_df, ingredients_df, recipe_df)
+            self.last_recomputed = None
+        else:
+            changed = _changed_keys(self._recipe_hashes, recipe_hashes)
+            changed_ingredients = _changed_keys(self._ingredient_hashes, ingredient_hashes)
+            if len(changed_ingredients) > 0:
+                # ราคา/แคลอรี่ของวัตถุดิบเปลี่ยน คำนวณใหม่เฉพาะจานที่ใช้วัตถุดิบนั้น
+                using = recipe_df.loc[recipe_df['ingredient_id'].isin(changed_ingredients), 'dish_id']
+                changed = changed.union(pd.Index(np.asarray(using.unique())))
+            if dishes_hash != self._dishes_hash:
+                # อาหารใหม่ที่ยังไม่มีในตารางสรุป
+                changed = changed.union(pd.Index(dishes_df['dish_id']).difference(self.aggregates['dish_id']))
+            if len(changed) > 0 or dishes_hash != self._dishes_hash:
+                kept = self.aggregates[~self.aggregates['dish_id'].isin(changed)]
+                recomputed = compute_dish_aggregates(dishes_df, ingredients_df, recipe_df, dish_ids=changed)
+                combined = pd.concat([kept, recomputed], ignore_index=True).drop(columns='dish_name')
+                # เรียงตามลำดับใน dishes_df ใช้ชื่ออาหารล่าสุด และตัดจานที่ถูกลบออก
+                order = dishes_df[['dish_id', 'dish_name']].merge(combined, on='dish_id', how='inner')
+                self.aggregates = order[AGGREGATE_COLUMNS].reset_index(drop=True)
+            self.last_recomputed = len(changed)
+
+        self._sources = sources
+        self._dishes_hash = dishes_hash
+        self._ingredient_hashes = ingredient_hashes
+        self._recipe_hashes = recipe_hashes
+        return self.aggregates
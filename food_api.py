@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from food_batch import read_questions, run_batch
+from food_config import EXAMPLE_QUESTIONS, GEMINI_MODEL_NAME, create_gemini_client, load_settings
+from food_data_store import FoodDataStore
+from food_qa_core import FoodQAService
+from food_retrieval import DEFAULT_TOKEN_BUDGET
+from request_metrics import create_metrics_recorder
+from response_cache import ResponseCache
+
+# ค่าเริ่มต้นของ HTTP server
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# จำนวนคำถามที่ประมวลผลพร้อมกัน (การเรียก Gemini ถูกจำกัดอีกชั้นด้วย GeminiClient)
+DEFAULT_WORKERS = 8
+
+# ขนาด body สูงสุดของ request (byte)
+MAX_BODY_BYTES = 64 * 1024
+
+# ข้อความสถานะ HTTP ที่ใช้
+_HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Function to create the shared service from the Streamlit secrets file and environment
+# fake_model: ใช้โมเดลจำลองแทน Gemini (ทดสอบ/วัดประสิทธิภาพโดยไม่ใช้โควตา)
+# use_tools: None = ใช้ค่า gemini.function_calling ใน secrets
+def create_service(settings=None, fake_model=None, database_dir=None, data_dict_dir=None, app='api', use_tools=None):
+    settings = load_settings() if settings is None else settings
+    gemini_settings = settings.get('gemini', {})
+    cache_settings = settings.get('cache', {})
+    model = fake_model
+    if model is None:
+        api_key = os.environ.get('GEMINI_API_KEY') or gemini_settings.get('api_key')
+        if api_key:
+            model = create_gemini_client(api_key, gemini_settings)
+    store = None
+    if database_dir is not None:
+        store = FoodDataStore(database_dir, data_dict_dir or os.path.join(os.path.dirname(database_dir), 'data_dict'))
+    return FoodQAService(
+        store=store,
+        model=model,
+        cache=ResponseCache(
+            max_entries=int(cache_settings.get('max_entries', 1000)),
+            ttl_seconds=float(cache_settings.get('ttl_seconds', 24 * 60 * 60)),
+            db_path=cache_settings.get('sqlite_path')
+        ),
+        metrics=create_metrics_recorder(settings.get('metrics', {})),
+        model_name=GEMINI_MODEL_NAME,
+        app=app,
+        use_tools=bool(gemini_settings.get('function_calling', False)) if use_tools is None else use_tools
+    )
+
+# Function to validate one request payload ({"question": ..., "conversation": ..., "token_budget": ...})
+def _parse_question(payload):
+    if not isinstance(payload, dict) or not str(payload.get('question') or '').strip():
+        raise ValueError("ต้องมีฟิลด์ 'question'")
+    token_budget = payload.get('token_budget')
+    return str(payload['question']).strip(), str(payload.get('conversation') or ''), int(token_budget) if token_budget else None
+
+# Minimal asyncio HTTP/1.1 server: POST /ask, GET /health, GET /metrics
+class FoodAPIServer:
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS):
+        self.service = service
+        self.host = host
+        self.port = port
+        # คำถามทำงานใน thread pool (pandas/Gemini SDK เป็นแบบ blocking) event loop รับ connection ต่อได้
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="food-api")
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 ให้ระบบเลือกพอร์ตว่าง
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        try:
+            # keep-alive: รับหลาย request ต่อ connection จนกว่า client จะปิด
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': "request ใหญ่เกินไป"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload, content_type = await self._route(method, urlsplit(target).path, body)
+                close = headers.get('connection', '').lower() == 'close'
+                await self._respond(writer, status, payload, content_type, close)
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 200, {'status': 'ok'}, 'application/json'
+        if path == '/metrics':
+            metrics = self.service.metrics
+            return 200, metrics.prometheus_text() if metrics is not None else "", 'text/plain; version=0.0.4; charset=utf-8'
+        if path != '/ask':
+            return 404, {'error': "ไม่พบ endpoint"}, 'application/json'
+        if method != 'POST':
+            return 405, {'error': "ใช้ POST"}, 'application/json'
+        try:
+            question, conversation, token_budget = _parse_question(json.loads(body or b'{}'))
+        except (ValueError, TypeError) as e:
+            return 400, {'error': str(e)}, 'application/json'
+        try:
+            result = await self.service.answer_async(question, conversation, token_budget, self.executor)
+        except Exception as e:
+            return 500, {'error': str(e)}, 'application/json'
+        return 200, result, 'application/json'
+
+    async def _respond(self, writer, status, payload, content_type='application/json', close=False):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        head = (
+            f"HTTP/1.1 {status} {_HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ถาม-ตอบเรื่องอาหารไทยแบบไม่มีหน้าเว็บ: HTTP API หรือประมวลผลคำถามจากไฟล์ JSONL")
+    parser.add_argument("--database-dir", help="โฟลเดอร์ CSV ฐานข้อมูล (ค่าเริ่มต้น csv/database)")
+    parser.add_argument("--data-dict-dir", help="โฟลเดอร์ data dictionary (ค่าเริ่มต้น csv/data_dict)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--fake-model", action="store_true", help="ใช้โมเดลจำลองแทน Gemini")
+    parser.add_argument("--function-calling", action="store_true", default=None, help="ให้ Gemini เรียกฟังก์ชันค้นข้อมูลแทนการแนบตารางใน prompt")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="เปิด HTTP API (POST /ask)")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    batch_parser = subparsers.add_parser("batch", help="ตอบคำถามทุกบรรทัดในไฟล์ JSONL")
+    batch_parser.add_argument("input", nargs="?", help="ไฟล์คำถาม JSONL")
+    batch_parser.add_argument("--examples", action="store_true", help="ใช้ตัวอย่างคำถามของแอป")
+    batch_parser.add_argument("--output", help="ไฟล์ผลลัพธ์ JSONL (ค่าเริ่มต้น stdout) รันซ้ำจะทำต่อจากคำถามที่ยังไม่เสร็จ")
+    batch_parser.add_argument("--restart", action="store_true", help="เริ่มใหม่ทั้งหมด ไม่ข้ามคำถามที่ตอบแล้วใน --output")
+    batch_parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    fake_model = None
+    if args.fake_model:
+        from fake_gemini import FakeGeminiModel
+        fake_model = FakeGeminiModel()
+    service = create_service(fake_model=fake_model, database_dir=args.database_dir, data_dict_dir=args.data_dict_dir, app='api' if args.command == 'serve' else 'batch', use_tools=args.function_calling)
+
+    if args.command == "serve":
+        # อ่านไฟล์ CSV ที่ถูกแก้ไขใหม่ระหว่างที่ server ทำงาน (คำถามที่กำลังตอบใช้ข้อมูลชุดเดิมจนจบ)
+        service.store.load()
+        service.store.watch()
+        server = FoodAPIServer(service, args.host, args.port, args.workers)
+
+        async def main():
+            await server.start()
+            print(f"พร้อมรับคำถามที่ http://{server.host}:{server.port}/ask", file=sys.stderr)
+            await server.serve_forever()
+
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+    else:
+        items = []
+        if args.examples:
+            items += [{'id': f"example-{number}", 'question': question} for number, question in enumerate(EXAMPLE_QUESTIONS, start=1)]
+        if args.input:
+            items += read_questions(args.input)
+        if not items:
+            parser.error("ต้องระบุไฟล์คำถามหรือ --examples")
+        summary = run_batch(
+            service,
+            items,
+            output_path=args.output,
+            output=None if args.output else sys.stdout,
+            workers=args.workers,
+            token_budget=args.token_budget,
+            resume=not args.restart
+        )
+        print(
+            f"ตอบคำถามแล้ว {summary['answered']} ข้อ (ข้ามที่ตอบแล้ว {summary['skipped']}, ผิดพลาด {summary['errors']}) "
+            f"จาก {summary['groups']} กลุ่มข้อมูล ใน {summary['seconds']} วินาที",
+            file=sys.stderr
+        )
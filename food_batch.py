@@ -0,0 +1,130 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from food_retrieval import RetrievalContextCache
+from food_schema import select_columns
+
+# จำนวนคำถามที่ประมวลผลพร้อมกัน (การเรียก Gemini ถูกจำกัดอีกชั้นด้วย GeminiClient)
+DEFAULT_BATCH_WORKERS = 4
+
+# Function to read batch questions from a JSONL file
+# แต่ละบรรทัดเป็น {"id": ..., "question": ...} หรือข้อความคำถามอย่างเดียว (id = เลขบรรทัด)
+def read_questions(path):
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            payload = json.loads(line)
+            if isinstance(payload, str):
+                payload = {'question': payload}
+            payload.setdefault('id', number)
+            items.append(payload)
+    return items
+
+# Function to read the status of every id in an output file: {id: True (answered) / False (last result was an error)}
+def result_status(output_path):
+    status = {}
+    if not output_path or not os.path.exists(output_path):
+        return status
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # บรรทัดสุดท้ายที่เขียนไม่ครบตอนโปรแกรมหยุด
+                continue
+            status[str(result.get('id'))] = not result.get('error')
+    return status
+
+# Function to read the ids already answered without error in an output file (for resuming a run)
+def completed_ids(output_path):
+    return {key for key, answered in result_status(output_path).items() if answered}
+
+# Function to order questions so that those sharing the same retrieved rows run together
+# คืนค่า [(group_key, [item, ...])] ตามลำดับที่กลุ่มปรากฏครั้งแรก
+def group_by_context(items, dataframes, context_cache, token_budget):
+    groups = {}
+    for item in items:
+        key = context_cache.group_key(item['question'], dataframes, item.get('token_budget') or token_budget, select_columns(item['question']))
+        groups.setdefault(key, []).append(item)
+    return list(groups.items())
+
+# Function to answer a batch of questions with a bounded worker pool, appending each result as soon as it is ready
+# output_path ที่มีผลลัพธ์อยู่แล้วจะข้ามคำถามที่ตอบสำเร็จแล้ว (resume=False เพื่อเริ่มใหม่ทั้งหมด)
+def run_batch(service, items, output_path=None, output=None, workers=DEFAULT_BATCH_WORKERS, token_budget=None, resume=True, progress=None):
+    if output is None and output_path is None:
+        raise ValueError("ต้องระบุ output_path หรือ output สำหรับเขียนผลลัพธ์")
+    started = time.perf_counter()
+    token_budget = token_budget or service.token_budget
+    status = result_status(output_path) if resume else {}
+    pending = []
+    invalid = []
+    for item in items:
+        if not str(item.get('question') or '').strip():
+            # คำถามที่ไม่ถูกต้องจะไม่มีวันตอบได้ ถ้าบันทึก error ไว้แล้วไม่ต้องเขียนซ้ำตอน resume
+            if str(item['id']) not in status:
+                invalid.append(item)
+        elif not status.get(str(item['id'])):
+            pending.append(item)
+    summary = {'total': len(items), 'skipped': len(items) - len(pending) - len(invalid), 'answered': 0, 'errors': len(invalid)}
+
+    # โหลดฐานข้อมูลครั้งเดียวก่อนเริ่ม แล้วจัดกลุ่มคำถามที่ใช้ข้อมูลชุดเดียวกันใน prompt
+    dataframes, _ = service.tables()
+    context_cache = RetrievalContextCache()
+    groups = group_by_context(pending, dataframes, context_cache, token_budget)
+    remaining = {key: len(group) for key, group in groups}
+    summary['groups'] = len(groups)
+
+    def answer(item):
+        try:
+            result = service.answer(
+                str(item['question']).strip(),
+                str(item.get('conversation') or ''),
+                item.get('token_budget') or token_budget,
+                dataframes,
+                context_cache
+            )
+        except Exception as e:
+            result = {'question': item.get('question'), 'error': type(e).__name__, 'message': str(e)}
+        result['id'] = item['id']
+        return result
+
+    close_output = False
+    if output is None and output_path is not None:
+        output = open(output_path, 'a' if resume else 'w', encoding='utf-8')
+        close_output = True
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="food-batch")
+    try:
+        for item in invalid:
+            output.write(json.dumps({'id': item['id'], 'question': item.get('question'), 'error': 'ValueError', 'message': "ต้องมีฟิลด์ 'question'"}, ensure_ascii=False) + "\n")
+        futures = {}
+        for key, group in groups:
+            for item in group:
+                futures[executor.submit(answer, item)] = key
+        for future in as_completed(futures):
+            result = future.result()
+            # เขียนทันทีที่ได้คำตอบ ถ้าโปรแกรมหยุดกลางทางจะเริ่มต่อจากคำถามที่ยังไม่เสร็จได้
+            output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            if result.get('error'):
+                summary['errors'] += 1
+            else:
+                summary['answered'] += 1
+            key = futures[future]
+            remaining[key] -= 1
+            if not remaining[key]:
+                context_cache.release(key)
+            if progress is not None:
+                progress(result)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if close_output:
+            output.close()
+    summary['context_builds'] = context_cache.builds
+    summary['context_reuses'] = context_cache.hits
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    return summary
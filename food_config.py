@@ -0,0 +1,51 @@
+import os
+
+from gemini_client import DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_RETRIES, DEFAULT_REQUESTS_PER_MINUTE, GeminiClient, LazyGeminiModel
+
+# ชื่อโมเดล Gemini ที่ใช้
+GEMINI_MODEL_NAME = 'gemini-2.0-flash-lite'
+
+# ข้อความนำหน้าเมื่อเรียก Gemini ไม่สำเร็จ (คำตอบที่ผิดพลาดจะไม่ถูกเก็บใน cache)
+GEMINI_ERROR_PREFIX = "เกิดข้อผิดพลาดในการเรียกใช้ Gemini API"
+
+# คำตอบเมื่อไม่มี Gemini API key และตอบจากฐานข้อมูลโดยตรงไม่ได้
+NO_MODEL_ANSWER = "กรุณากำหนด Gemini API Key ที่ถูกต้องใน secrets หรือกรอก API Key ชั่วคราวในช่องทางด้านซ้าย เพื่อให้ระบบสามารถตอบคำถามของคุณได้"
+
+# ตัวอย่างคำถามที่แสดงในหน้าแอป (ใช้เป็นชุดคำถามตั้งต้นของโหมด batch ด้วย)
+EXAMPLE_QUESTIONS = [
+    "วิธีทำต้มยำกุ้งมีอะไรบ้าง?",
+    "แคลอรี่ของผัดไทยต่อจานเท่าไหร่?",
+    "ส่วนผสมของแกงเขียวหวานไก่มีอะไรบ้าง?",
+    "อยากทำต้มข่าไก่ต้องใช้วัตถุดิบอะไรบ้าง?",
+    "ราคาในการทำผัดไทยสำหรับ 4 คนประมาณเท่าไหร่?",
+    "แกงมัสมั่นใช้งบประมาณเท่าไหร่?",
+    "ผัดไทยทำยังไง?",
+    "อธิบายขั้นตอนการทำต้มยำกุ้ง",
+    "อาหารไทยที่มีแคลอรี่น้อยที่สุดคืออะไร?",
+]
+
+# ไฟล์ตั้งค่าเดียวกับ Streamlit (ใช้เมื่อรันแบบไม่มีหน้าเว็บ)
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+# Function to read the Streamlit secrets file without Streamlit (returns {} when missing)
+def load_settings(path=SECRETS_PATH):
+    if not os.path.exists(path):
+        return {}
+    import tomllib
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+# Function to create a Gemini model wrapped in the shared rate-limited client
+# SDK ของ Gemini ถูก import เมื่อเรียกใช้ครั้งแรก (หรือเมื่อเรียก client.model.warm_up())
+def create_gemini_client(api_key, settings=None, model_name=GEMINI_MODEL_NAME):
+    settings = settings or {}
+    return GeminiClient(
+        LazyGeminiModel(api_key, model_name),
+        max_concurrency=int(settings.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)),
+        requests_per_minute=float(settings.get('requests_per_minute', DEFAULT_REQUESTS_PER_MINUTE)),
+        max_retries=int(settings.get('max_retries', DEFAULT_MAX_RETRIES))
+    )
+
+# Function to get the model name used in response cache keys (answers from function calling are cached separately)
+def cache_model_name(model_name, use_tools=False):
+    return f"{model_name}+tools" if use_tools else model_name
@@ -0,0 +1,247 @@
+import glob
+import hashlib
+import os
+import threading
+
+from food_aggregates import DishAggregateIndex
+from food_ingest import ingest_csv
+from food_ingredient_index import get_ingredient_index
+from food_units import normalize_recipe
+
+# โฟลเดอร์เริ่มต้นของไฟล์ CSV
+DATABASE_DIR = os.path.join("csv", "database")
+DATA_DICT_DIR = os.path.join("csv", "data_dict")
+
+# ความถี่ในการตรวจไฟล์ CSV ที่เปลี่ยน (วินาที)
+DEFAULT_WATCH_INTERVAL = 2.0
+
+# Function to read one CSV with the explicit dtypes of a known table
+def read_table(file_path, dtypes=None):
+    return ingest_csv(file_path, dtypes=dtypes)[0]
+
+# Function to build file signature (mtime + size) used to detect changes
+def file_signature(file_path):
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Loaded database shared by every session; treat the dataframes as read-only
+class DataSnapshot:
+    def __init__(self, dataframes, data_dicts, errors, signatures):
+        self.dataframes = dataframes
+        self.data_dicts = data_dicts
+        self.errors = errors
+        self.signatures = signatures
+        digest = hashlib.sha1(repr(sorted(signatures.items())).encode('utf-8'))
+        self.version = digest.hexdigest()
+        # IngestReport ของไฟล์ที่อ่านจาก CSV (ไฟล์ที่อ่านจาก snapshot ไม่มีรายงาน)
+        self.reports = {}
+        # ไฟล์ที่ถูกอ่านใหม่ (หรือถูกลบ) เมื่อเทียบกับ snapshot ก่อนหน้า
+        self.changed_files = []
+        self.aggregates_df = None
+        self.ingredient_index = None
+        self._aggregate_sources = None
+
+    # Function to return aggregates only when the given frames are this snapshot's frames
+    def aggregates_for(self, dishes_df, ingredients_df, recipe_df):
+        if self._aggregate_sources is None:
+            return None
+        if all(a is b for a, b in zip((dishes_df, ingredients_df, recipe_df), self._aggregate_sources)):
+            return self.aggregates_df
+        return None
+
+# Process-level store: each CSV is parsed once and re-parsed only when its mtime/size changes
+class FoodDataStore:
+    def __init__(self, database_dir=DATABASE_DIR, data_dict_dir=DATA_DICT_DIR, snapshot_dir=None):
+        self.database_dir = database_dir
+        self.data_dict_dir = data_dict_dir
+        # ถ้ากำหนด snapshot_dir จะอ่านจาก Parquet snapshot ก่อน (เมื่อใหม่กว่าไฟล์ CSV)
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        self._files = {}
+        self._snapshot = None
+        self._aggregate_index = DishAggregateIndex()
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+
+    def _list_files(self):
+        files = []
+        for directory, is_dict in ((self.data_dict_dir, True), (self.database_dir, False)):
+            if os.path.exists(directory):
+                for file_path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+                    files.append((file_path, is_dict))
+        return files
+
+    def _signatures(self, files):
+        signatures = {}
+        for file_path, _ in files:
+            try:
+                signatures[file_path] = file_signature(file_path)
+            except OSError:
+                continue
+        return signatures
+
+    # Function to get the snapshot currently served (None before the first load)
+    def current(self):
+        return self._snapshot
+
+    # Function to get the snapshot of the current files, re-parsing only files whose signature changed
+    # ระหว่างที่ thread อื่นกำลังโหลดไฟล์ใหม่ คืน snapshot เดิมทันที (คำถามที่กำลังตอบใช้ข้อมูลชุดเดิมจนจบ)
+    def load(self):
+        files = self._list_files()
+        signatures = self._signatures(files)
+        current = self._snapshot
+        if current is not None and signatures == current.signatures:
+            return current
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            # thread อื่นอาจโหลดเสร็จไปแล้วระหว่างรอ lock
+            if self._snapshot is not None and signatures == self._snapshot.signatures:
+                return self._snapshot
+            return self._reload(files, signatures)
+        finally:
+            self._lock.release()
+
+    def _reload(self, files, signatures):
+        manifest = None
+        if self.snapshot_dir is not None:
+            from food_snapshot import read_manifest
+            manifest = read_manifest(self.snapshot_dir)
+
+        dataframes = {}
+        data_dicts = {}
+        errors = {}
+        reports = {}
+        changed = []
+        for file_path, is_dict in files:
+            if file_path not in signatures:
+                continue
+            filename = os.path.basename(file_path)
+            cached = self._files.get(file_path)
+            if cached is not None and cached[0] == signatures[file_path]:
+                df, report = cached[1], cached[2]
+            else:
+                changed.append(filename)
+                try:
+                    df = self._read_snapshot(file_path, manifest)
+                    report = None
+                    if df is None:
+                        # data dictionary เป็นข้อความล้วน ไม่ต้องแปลงเป็นตัวเลข
+                        df, report = ingest_csv(file_path, dtypes='str' if is_dict else None)
+                except Exception as e:
+                    errors[filename] = str(e)
+                    self._files.pop(file_path, None)
+                    continue
+                self._files[file_path] = (signatures[file_path], df, report)
+            if report is not None:
+                reports[filename] = report
+            if is_dict:
+                data_dicts[filename] = df
+            else:
+                dataframes[filename] = df
+
+        # ลบไฟล์ที่ถูกลบออกจากโฟลเดอร์แล้ว
+        for file_path in list(self._files):
+            if file_path not in signatures:
+                del self._files[file_path]
+                changed.append(os.path.basename(file_path))
+
+        snapshot = DataSnapshot(dataframes, data_dicts, errors, signatures)
+        snapshot.reports = reports
+        snapshot.changed_files = changed
+        self._attach_quantities(snapshot)
+        self._attach_aggregates(snapshot)
+        self._attach_ingredient_index(snapshot)
+        # สลับ snapshot เมื่อทุกอย่างพร้อมแล้วเท่านั้น ผู้อ่านจะเห็นชุดเดิมหรือชุดใหม่ทั้งชุด ไม่เห็นครึ่งๆ กลางๆ
+        self._snapshot = snapshot
+        return snapshot
+
+    # Function to watch the csv folders and reload changed files in a background thread
+    # on_reload: ฟังก์ชันรับ snapshot ใหม่ เรียกหลังสลับ snapshot แล้ว
+    def watch(self, interval=DEFAULT_WATCH_INTERVAL, on_reload=None):
+        with self._watch_lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return self._watcher
+            self._stop_watching.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval, on_reload), name="csv-watcher", daemon=True)
+            self._watcher.start()
+            return self._watcher
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def _watch_loop(self, interval, on_reload):
+        seen = None
+        while not self._stop_watching.wait(interval):
+            try:
+                signatures = self._signatures(self._list_files())
+                current = self._snapshot
+                if current is not None and signatures == current.signatures:
+                    seen = None
+                    continue
+                # รอให้ไฟล์หยุดเปลี่ยนหนึ่งรอบก่อน (โปรแกรมแก้ไขไฟล์อาจยังเขียนไม่เสร็จ)
+                if signatures != seen:
+                    seen = signatures
+                    continue
+                seen = None
+                with self._lock:
+                    snapshot = self._reload(self._list_files(), signatures)
+                if on_reload is not None:
+                    on_reload(snapshot)
+            except Exception:
+                # อ่านไฟล์ไม่สำเร็จ (เช่น ไฟล์ถูกลบระหว่างอ่าน) ลองใหม่รอบหน้า
+                seen = None
+
+    def _read_snapshot(self, file_path, manifest):
+        if not manifest:
+            return None
+        from food_snapshot import read_snapshot_table
+        return read_snapshot_table(file_path, manifest, self.snapshot_dir)
+
+    def _attach_quantities(self, snapshot):
+        # แปลงปริมาณในสูตรเป็นกรัมและสัดส่วนของหน่วยที่ซื้อตอนโหลด (ไฟล์ไม่เปลี่ยนได้ตารางตัวเดิม)
+        recipe_df = snapshot.dataframes.get('recipe_ingredients.csv')
+        if recipe_df is None:
+            return
+        try:
+            snapshot.dataframes['recipe_ingredients.csv'] = normalize_recipe(recipe_df, snapshot.dataframes.get('ingredients.csv'))
+        except Exception as e:
+            snapshot.errors['quantities'] = str(e)
+
+    def _attach_aggregates(self, snapshot):
+        dishes_df = snapshot.dataframes.get('thai_dishes.csv')
+        ingredients_df = snapshot.dataframes.get('ingredients.csv')
+        recipe_df = snapshot.dataframes.get('recipe_ingredients.csv')
+        if dishes_df is None or ingredients_df is None or recipe_df is None:
+            return
+        try:
+            snapshot.aggregates_df = self._aggregate_index.update(dishes_df, ingredients_df, recipe_df)
+            snapshot._aggregate_sources = (dishes_df, ingredients_df, recipe_df)
+        except Exception as e:
+            snapshot.errors['aggregates'] = str(e)
+
+    def _attach_ingredient_index(self, snapshot):
+        # สร้าง index วัตถุดิบ -> อาหาร ตอนโหลด เพื่อให้คำถาม "มี X ทำอะไรได้" ไม่ต้องรอสร้าง
+        try:
+            snapshot.ingredient_index = get_ingredient_index(snapshot.dataframes.get('recipe_ingredients.csv'))
+        except Exception as e:
+            snapshot.errors['ingredient_index'] = str(e)
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+# Function to get the process-wide data store
+def get_data_store():
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            # ใช้ snapshot ใน csv/snapshot ถ้ามีการสร้างไว้ (python food_snapshot.py)
+            from food_snapshot import SNAPSHOT_DIR
+            _default_store = FoodDataStore(snapshot_dir=SNAPSHOT_DIR)
+        return _default_store
+
+# Function to get the process-wide store's current snapshot without creating the store (None = not loaded yet)
+def loaded_snapshot():
+    store = _default_store
+    return store.current() if store is not None else None
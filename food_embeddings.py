@@ -0,0 +1,257 @@
+import hashlib
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from food_retrieval import normalize_text
+from identity_memo import IdentityMemo
+
+# ไฟล์เก็บ embedding index (อยู่ในโฟลเดอร์ snapshot ที่ไม่ได้ commit)
+EMBEDDING_INDEX_PATH = os.path.join("csv", "snapshot", "embeddings.npz")
+
+# ขนาด vector และช่วงความยาว n-gram ของตัวอักษรสำหรับ embedder แบบออฟไลน์
+DEFAULT_DIMENSIONS = 1024
+DEFAULT_NGRAM_RANGE = (2, 3)
+
+# คะแนน cosine ขั้นต่ำที่ถือว่าเกี่ยวข้องกับคำถาม
+# วัดกับ csv/database: ชื่ออาหารที่พิมพ์ตกวรรณยุกต์/สระ ได้ 0.54-0.71 คำถามที่ไม่เกี่ยวกับอาหารในฐานข้อมูลได้ไม่เกิน 0.35
+DEFAULT_MIN_SCORE = 0.4
+
+# Offline embedder: hashed character n-grams (ภาษาไทยไม่มีการเว้นวรรคระหว่างคำ จึงใช้ n-gram ของตัวอักษรแทนคำ)
+class HashingEmbedder:
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, ngram_range=DEFAULT_NGRAM_RANGE):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        # ชื่อใช้ตรวจว่า index ที่บันทึกไว้สร้างจาก embedder แบบเดียวกัน
+        self.name = f"hashing-{dimensions}-{ngram_range[0]}-{ngram_range[1]}"
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        low, high = self.ngram_range
+        for row, text in enumerate(texts):
+            text = normalize_text(text)
+            for n in range(low, high + 1):
+                for i in range(len(text) - n + 1):
+                    # ใช้ crc32 แทน hash() เพราะ hash ของ str เปลี่ยนทุกครั้งที่เปิดโปรแกรม
+                    matrix[row, zlib.crc32(text[i:i + n].encode('utf-8')) % self.dimensions] += 1.0
+        return matrix
+
+# Embedder backed by the Gemini embedding API (needs network and an API key)
+class GeminiEmbedder:
+    def __init__(self, model_name="models/text-embedding-004", batch_size=100):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.name = f"gemini-{model_name}"
+
+    def embed(self, texts):
+        import google.generativeai as genai
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            result = genai.embed_content(model=self.model_name, content=list(texts[start:start + self.batch_size]))
+            vectors.extend(result['embedding'])
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+# Function to scale each row to unit length so a dot product is the cosine similarity
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+# เอกสารที่เป็นชื่ออย่างเดียว ผลการค้นหารวมเข้ากับเอกสารเต็มของแถวเดียวกัน (kind ของผลลัพธ์)
+NAME_KINDS = {'dish_name': 'dish'}
+
+# Function to build the text embedded for every dish and ingredient row
+# key: "dish:<id>" (ชื่อ ประเภท ภูมิภาค คำอธิบาย), "dish_name:<id>" (ชื่ออย่างเดียว), "ingredient:<id>"
+# ชื่ออาหาร embed แยกจากคำอธิบาย เพื่อให้ชื่อที่สะกดผิดยังใกล้กับชื่อจริง ไม่ถูกคำอธิบายยาวๆ กลบ
+def index_documents(dishes_df, ingredients_df):
+    documents = {}
+    if dishes_df is not None and 'dish_id' in dishes_df.columns:
+        columns = [c for c in ('dish_name', 'dish_type', 'region', 'description') if c in dishes_df.columns]
+        for row in dishes_df[['dish_id'] + columns].itertuples(index=False):
+            documents[f"dish:{row[0]}"] = " ".join(str(value) for value in row[1:] if value == value)
+            if 'dish_name' in columns and row[1] == row[1]:
+                documents[f"dish_name:{row[0]}"] = str(row[1])
+    if ingredients_df is not None and 'ingredient_id' in ingredients_df.columns:
+        columns = [c for c in ('ingredient_name', 'category') if c in ingredients_df.columns]
+        for row in ingredients_df[['ingredient_id'] + columns].itertuples(index=False):
+            documents[f"ingredient:{row[0]}"] = " ".join(str(value) for value in row[1:] if value == value)
+    return documents
+
+# Function to read the result kind of every key ("dish_name:" นับเป็น "dish") as one array, so search can mask without a Python loop
+def _key_kinds(keys):
+    kinds = [key.split(":", 1)[0] for key in keys]
+    return np.array([NAME_KINDS.get(kind, kind) for kind in kinds], dtype=object)
+
+# Function to hash a document text (detects rows that changed since the index was built)
+def _text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+# Embedding index over dishes and ingredients: one contiguous float32 matrix, searched with top-k cosine
+class EmbeddingIndex:
+    def __init__(self, embedder=None, path=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path
+        self.keys = []
+        self.hashes = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.kinds = _key_kinds([])
+        self._positions = {}
+        self._sources = None
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load(self, path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['embedder']) != self.embedder.name:
+                    return False
+                keys = [str(key) for key in data['keys']]
+                hashes = [str(value) for value in data['hashes']]
+                matrix = np.ascontiguousarray(data['matrix'], dtype=np.float32)
+        except (OSError, KeyError, ValueError):
+            return False
+        with self._lock:
+            self.keys, self.hashes, self.matrix = keys, hashes, matrix
+            self.kinds = _key_kinds(keys)
+            self._positions = {key: i for i, key in enumerate(keys)}
+        return True
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # เขียนไฟล์ชั่วคราวก่อนแล้วค่อยแทนที่ เพื่อไม่ให้อ่านไฟล์ที่เขียนไม่ครบ
+        temp_path = path + ".tmp.npz"
+        np.savez(
+            temp_path,
+            embedder=np.array(self.embedder.name),
+            keys=np.array(self.keys, dtype=str),
+            hashes=np.array(self.hashes, dtype=str),
+            matrix=self.matrix,
+        )
+        os.replace(temp_path, path)
+
+    # Function to sync the index with the dataframes; only new or changed rows are embedded again
+    def update(self, dishes_df, ingredients_df):
+        with self._lock:
+            if self._sources is not None and self._sources[0] is dishes_df and self._sources[1] is ingredients_df:
+                return False
+            documents = index_documents(dishes_df, ingredients_df)
+            keys = list(documents)
+            hashes = [_text_hash(documents[key]) for key in keys]
+            changed = [
+                i for i, (key, text_hash) in enumerate(zip(keys, hashes))
+                if key not in self._positions or self.hashes[self._positions[key]] != text_hash
+            ]
+            modified = bool(changed) or keys != self.keys
+            if modified:
+                new_vectors = _normalize_rows(self.embedder.embed([documents[keys[i]] for i in changed])) if changed else None
+                if new_vectors is not None and self.matrix.size and new_vectors.shape[1] != self.matrix.shape[1]:
+                    # embedder เปลี่ยนขนาด vector จึงต้องสร้างใหม่ทั้งหมด
+                    changed = list(range(len(keys)))
+                    new_vectors = _normalize_rows(self.embedder.embed([documents[key] for key in keys]))
+                    self._positions = {}
+                dimensions = new_vectors.shape[1] if new_vectors is not None else self.matrix.shape[1]
+                matrix = np.empty((len(keys), dimensions), dtype=np.float32)
+                if changed:
+                    matrix[changed] = new_vectors
+                changed_set = set(changed)
+                kept = [i for i in range(len(keys)) if i not in changed_set]
+                if kept:
+                    matrix[kept] = self.matrix[[self._positions[keys[i]] for i in kept]]
+                self.keys, self.hashes, self.matrix = keys, hashes, matrix
+                self.kinds = _key_kinds(keys)
+                self._positions = {key: i for i, key in enumerate(keys)}
+                self.save()
+            self._sources = (dishes_df, ingredients_df)
+            return modified
+
+    # Function to find the k rows most similar to the query; returns [(kind, id, score)]
+    # แถวที่มีทั้งเอกสารเต็มและเอกสารชื่อ ใช้คะแนนที่สูงกว่า และนับเป็นผลลัพธ์เดียว
+    def search(self, query, k=5, kind=None, min_score=0.0):
+        with self._lock:
+            matrix, keys, kinds = self.matrix, self.keys, self.kinds
+        if not keys or not matrix.size:
+            return []
+        query_vector = _normalize_rows(self.embedder.embed([query]))[0]
+        scores = matrix @ query_vector
+        if kind is not None:
+            scores = np.where(kinds == kind, scores, -1.0)
+        # แต่ละแถวมีได้สองเอกสาร จึงหา 2k อันดับแรกก่อนรวมผลของแถวเดียวกัน
+        candidates = min(2 * k, len(keys))
+        # argpartition หา top-k โดยไม่ต้องเรียงทั้ง matrix
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        seen = set()
+        for i in top:
+            if scores[i] < min_score or scores[i] < 0 or len(results) >= k:
+                break
+            row = (kinds[i], keys[i].split(":", 1)[1])
+            if row not in seen:
+                seen.add(row)
+                results.append((row[0], row[1], float(scores[i])))
+        return results
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+# index ต่อชุดข้อมูล: ตารางชุดเดิม (object เดิม) ได้ index เดิม
+# session ที่สลับระหว่างข้อมูลตัวอย่าง ไฟล์ที่อัปโหลด และ CSV จึงไม่ต้อง embed ใหม่ทุกคำถาม
+_indexes = IdentityMemo(4)
+
+# Function to get the process-wide embedding index (persisted to csv/snapshot)
+def get_embedding_index():
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = EmbeddingIndex(path=EMBEDDING_INDEX_PATH)
+        return _default_index
+
+# Function to check whether the tables are the loaded tables of the process-wide FoodDataStore
+def _is_store_data(dishes_df, ingredients_df):
+    from food_data_store import loaded_snapshot
+    snapshot = loaded_snapshot()
+    if snapshot is None:
+        return False
+    tables = snapshot.dataframes.values()
+    return any(df is dishes_df for df in tables) and any(df is ingredients_df for df in tables)
+
+# Function to get the embedding index of the given tables
+# เฉพาะตารางของ FoodDataStore ใช้ index ที่บันทึกลง csv/snapshot ข้อมูลตัวอย่าง/ไฟล์ที่อัปโหลดใช้ index ในหน่วยความจำ
+def index_for(dishes_df, ingredients_df):
+    return _indexes.get(
+        [dishes_df, ingredients_df],
+        lambda: get_embedding_index() if _is_store_data(dishes_df, ingredients_df) else EmbeddingIndex()
+    )
+
+# Function to use the given index for the given tables (e.g. benchmarks keep theirs outside csv/snapshot)
+def set_embedding_index(index, dishes_df, ingredients_df):
+    _indexes.put([dishes_df, ingredients_df], index)
+
+# Function to find dishes and ingredients semantically close to the question
+def semantic_matches(question, dataframes, k=5, min_score=DEFAULT_MIN_SCORE, index=None):
+    dishes_df = dataframes.get('dishes_df')
+    ingredients_df = dataframes.get('ingredients_df')
+    if dishes_df is None and ingredients_df is None:
+        return [], []
+    index = index or index_for(dishes_df, ingredients_df)
+    index.update(dishes_df, ingredients_df)
+    dish_ids = [row_id for _, row_id, _ in index.search(question, k=k, kind='dish', min_score=min_score)]
+    ingredient_ids = [row_id for _, row_id, _ in index.search(question, k=k, kind='ingredient', min_score=min_score)]
+    return _as_column_ids(dish_ids, dishes_df, 'dish_id'), _as_column_ids(ingredient_ids, ingredients_df, 'ingredient_id')
+
+# Function to convert ids read from index keys (always str) back to the dtype of the id column
+# ข้อมูลตัวอย่างใช้ id เป็นตัวเลข ถ้าไม่แปลงกลับจะจับคู่กับแถวในตารางไม่ได้
+def _as_column_ids(ids, df, col):
+    if not ids or df is None or col not in df.columns:
+        return ids
+    try:
+        return list(pd.Series(ids, dtype='object').astype(df[col].dtype))
+    except (TypeError, ValueError):
+        return ids
@@ -0,0 +1,214 @@
+import io
+import os
+import re
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# ชนิดข้อมูลของตารางที่รู้จัก (ID เป็น category, ตัวเลขเป็น int32/float32)
+KNOWN_TABLE_DTYPES = {
+    'thai_dishes.csv': {
+        'dish_id': 'category',
+        'dish_name': 'str',
+        'dish_type': 'category',
+        'region': 'category',
+        'spicy_level': 'int32',
+        'cooking_time_minutes': 'int32',
+        'difficulty_level': 'int32',
+        'description': 'str',
+    },
+    'ingredients.csv': {
+        'ingredient_id': 'category',
+        'ingredient_name': 'str',
+        'category': 'category',
+        'price_per_unit': 'float32',
+        'unit': 'category',
+        'source': 'category',
+        'shelf_life_days': 'int32',
+        'calories_per_100g': 'float32',
+    },
+    'recipe_ingredients.csv': {
+        'dish_id': 'category',
+        'ingredient_id': 'category',
+        # ปริมาณมีทั้งตัวเลขและเศษส่วน (เช่น 1/2) จึงเก็บเป็นข้อความ แล้วแปลงใน food_units
+        'amount': 'str',
+        'unit': 'category',
+        'notes': 'str',
+    },
+    'cooking_steps.csv': {
+        'dish_id': 'category',
+        'step_number': 'int32',
+        'instruction': 'str',
+    },
+}
+
+# จำนวนแถวต่อ chunk เมื่ออ่านไฟล์ขนาดใหญ่ และขนาดไฟล์ที่เริ่มอ่านแบบแบ่ง chunk
+INGEST_CHUNK_ROWS = 50000
+CHUNKED_INGEST_BYTES = 16 * 1024 * 1024
+
+# ข้อความเตือนของ pandas เมื่อข้ามบรรทัดที่จำนวนคอลัมน์ไม่ตรงกับ header
+_SKIPPED_LINE_PATTERN = re.compile(r"Skipping line (\d+)")
+# ข้อความเตือนเมื่อแถวแรกของข้อมูลมีคอลัมน์เกิน header (pandas ตัดคอลัมน์ที่เกินทิ้งโดยไม่บอกเลขบรรทัด)
+_TRUNCATED_ROW_PATTERN = re.compile(r"Length of header or names does not match length of data")
+
+# Per-file result of an ingest: rows kept, lines skipped and parse time
+class IngestReport:
+    def __init__(self, filename):
+        self.filename = filename
+        self.rows = 0
+        self.columns = 0
+        self.skipped_lines = []
+        self.truncated_rows = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.parse_seconds = 0.0
+        self.typed = False
+
+    @property
+    def skipped_rows(self):
+        return len(self.skipped_lines)
+
+    # Function to describe the report in one line (ใช้แสดงใน sidebar)
+    def summary(self):
+        text = f"{self.rows:,} แถว {self.columns} คอลัมน์ ใน {self.parse_seconds * 1000:,.0f} ms"
+        if self.skipped_lines:
+            shown = ", ".join(str(line) for line in self.skipped_lines[:5])
+            more = " ..." if len(self.skipped_lines) > 5 else ""
+            text += f" (ข้าม {self.skipped_rows} แถวที่จำนวนคอลัมน์ไม่ตรง: บรรทัด {shown}{more})"
+        if self.truncated_rows:
+            text += f" (ตัดคอลัมน์เกินของ {self.truncated_rows} แถว)"
+        return text
+
+# Function to apply numeric conversion only to columns that are fully numeric
+def coerce_numeric_columns(df):
+    for col in df.columns:
+        if df[col].dtype != object and not pd.api.types.is_string_dtype(df[col]):
+            continue
+        converted = pd.to_numeric(df[col], errors='coerce')
+        # แปลงเฉพาะคอลัมน์ที่ทุกค่าที่ไม่ว่างเป็นตัวเลข (ไม่ทำให้ข้อความหาย)
+        if converted.notna().sum() == df[col].notna().sum():
+            df[col] = converted
+    return df
+
+# Function to get the size of a path or file-like object (None when unknown)
+def _source_size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    size = getattr(source, 'size', None)
+    if size is not None:
+        return size
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer().nbytes
+    return None
+
+# Function to rewind a file-like object so it can be parsed again
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+# Function to parse a CSV with the C parser, in chunks for large sources, recording skipped lines
+def _parse(source, dtypes, chunk_rows, report):
+    options = {
+        # utf-8-sig อ่านไฟล์ที่มี BOM จาก Excel ได้ด้วย
+        'encoding': 'utf-8-sig',
+        'on_bad_lines': 'warn',
+        'dtype': dtypes,
+        # ไม่ให้คอลัมน์แรกกลายเป็น index เมื่อแถวแรกมีคอลัมน์เกิน (ไม่เช่นนั้นทุกคอลัมน์จะเลื่อนไปหนึ่งช่อง)
+        # หมายเหตุ: แถวที่เกินซึ่งตกเป็นแถวแรกของ chunk ถัดไป pandas ตัดทิ้งเงียบ ๆ โดยไม่เตือน
+        'index_col': False,
+    }
+    if dtypes is None:
+        options['low_memory'] = False
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        if chunk_rows:
+            with pd.read_csv(source, chunksize=chunk_rows, **options) as reader:
+                df = _collect_chunks(reader, report)
+        else:
+            df = pd.read_csv(source, **options)
+            report.chunks = 1
+    for warning in caught:
+        if issubclass(warning.category, pd.errors.ParserWarning):
+            message = str(warning.message)
+            report.skipped_lines.extend(int(line) for line in _SKIPPED_LINE_PATTERN.findall(message))
+            if _TRUNCATED_ROW_PATTERN.search(message):
+                report.truncated_rows += 1
+    return df
+
+# Function to consume parsed chunks as they are read, keeping only the columns' data (not whole chunks)
+# คอลัมน์ category เก็บเป็น code int32 เทียบกับหมวดหมู่รวมที่สะสมไว้ จึงไม่ต้องเก็บข้อความซ้ำทุก chunk
+# ตอนท้ายรวมทีละคอลัมน์ หน่วยความจำสูงสุดจึงประมาณขนาดตารางบวกหนึ่งคอลัมน์ ไม่ใช่สองเท่าของตาราง
+def _collect_chunks(reader, report):
+    columns = None
+    pieces = {}
+    categories = {}
+    for chunk in reader:
+        report.chunks += 1
+        if columns is None:
+            columns = list(chunk.columns)
+            pieces = {col: [] for col in columns}
+            categories = {col: {} for col in columns if isinstance(chunk[col].dtype, pd.CategoricalDtype)}
+        for col in columns:
+            series = chunk[col]
+            if col in categories:
+                mapping = categories[col]
+                # code ของ chunk -> code ในหมวดหมู่รวม (ตำแหน่งสุดท้ายคือค่าว่าง code -1)
+                remap = np.array([mapping.setdefault(value, len(mapping)) for value in series.cat.categories] + [-1], dtype='int32')
+                pieces[col].append(remap[series.cat.codes.to_numpy()])
+            else:
+                # copy แยกคอลัมน์ออกจาก block ของ chunk เพื่อให้ chunk ถูกคืนหน่วยความจำได้ทันที
+                pieces[col].append(series.copy())
+        del chunk, series
+    if columns is None:
+        return pd.DataFrame()
+
+    data = {}
+    for col in columns:
+        parts = pieces.pop(col)
+        if col in categories:
+            data[col] = pd.Categorical.from_codes(np.concatenate(parts), categories=pd.Index(list(categories[col])))
+        else:
+            # chunk ที่อนุมานชนิดได้ต่างกัน (เช่น int กับ float) concat จะเลือกชนิดที่รองรับทั้งหมดให้
+            data[col] = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        del parts
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+# Function to ingest one CSV (path or uploaded file) into a typed dataframe plus an IngestReport
+def ingest_csv(source, filename=None, dtypes=None, chunk_rows=None):
+    if filename is None:
+        filename = os.path.basename(source) if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', 'upload.csv')
+    filename = os.path.basename(str(filename))
+    report = IngestReport(filename)
+    report.bytes = _source_size(source) or 0
+    if chunk_rows is None and report.bytes >= CHUNKED_INGEST_BYTES:
+        chunk_rows = INGEST_CHUNK_ROWS
+
+    if dtypes is None:
+        dtypes = KNOWN_TABLE_DTYPES.get(filename)
+    started = time.perf_counter()
+    df = None
+    if dtypes:
+        try:
+            df = _parse(source, dtypes, chunk_rows, report)
+            report.typed = True
+        except (ValueError, TypeError):
+            # ข้อมูลไม่ตรงกับชนิดที่กำหนด (เช่น มีค่าว่างในคอลัมน์ int) ใช้การอนุมานแทน
+            report.skipped_lines = []
+            report.truncated_rows = 0
+            _rewind(source)
+    if df is None:
+        # ให้ parser ของ pandas อนุมานชนิดข้อมูลในรอบเดียว แล้วแปลงเฉพาะคอลัมน์ข้อความที่เป็นตัวเลขล้วน
+        df = coerce_numeric_columns(_parse(source, None, chunk_rows, report))
+    report.parse_seconds = time.perf_counter() - started
+    report.rows = len(df)
+    report.columns = len(df.columns)
+    return df, report
+
+# Function to ingest an uploaded file object (streamlit UploadedFile or raw bytes)
+def ingest_upload(uploaded_file, filename=None, dtypes=None):
+    if isinstance(uploaded_file, (bytes, bytearray)):
+        uploaded_file = io.BytesIO(uploaded_file)
+    _rewind(uploaded_file)
+    return ingest_csv(uploaded_file, filename or getattr(uploaded_file, 'name', None), dtypes)
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from identity_memo import IdentityMemo
+
+# Function to build CSR-style postings from parallel key/value code arrays (values must already be sorted)
+def _postings(keys, values, n_keys):
+    # stable sort ทำให้ค่าในแต่ละ key ยังเรียงจากน้อยไปมากตามเดิม
+    order = np.argsort(keys, kind='stable')
+    indices = np.ascontiguousarray(values[order], dtype=np.int32)
+    indptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=indptr[1:])
+    return indptr, indices
+
+# Inverted index ingredient_id -> dish_ids, stored as sorted int32 arrays (one per ingredient)
+class IngredientDishIndex:
+    def __init__(self, recipe_df):
+        pairs = recipe_df[['dish_id', 'ingredient_id']].dropna()
+        dish_codes, dish_ids = pd.factorize(pairs['dish_id'])
+        ingredient_codes, ingredient_ids = pd.factorize(pairs['ingredient_id'])
+        # แปลงเป็นข้อความหลัง factorize (ทำกับค่าที่ไม่ซ้ำเท่านั้น)
+        self.dish_ids = pd.Index(np.asarray(dish_ids).astype(str))
+        self.ingredient_ids = pd.Index(np.asarray(ingredient_ids).astype(str))
+        # ตัดคู่ที่ซ้ำ (วัตถุดิบเดียวกันอยู่ในสูตรเดียวกันหลายแถว)
+        pair_codes = np.sort(dish_codes.astype(np.int64) * len(self.ingredient_ids) + ingredient_codes)
+        first = np.ones(len(pair_codes), dtype=bool)
+        first[1:] = pair_codes[1:] != pair_codes[:-1]
+        pair_codes = pair_codes[first]
+        dish_codes = (pair_codes // max(1, len(self.ingredient_ids))).astype(np.int32)
+        ingredient_codes = (pair_codes % max(1, len(self.ingredient_ids))).astype(np.int32)
+
+        self._ingredient_positions = {ingredient_id: i for i, ingredient_id in enumerate(self.ingredient_ids)}
+        self._dish_indptr, self._dish_postings = _postings(ingredient_codes, dish_codes, len(self.ingredient_ids))
+        self._recipe_indptr, self._recipe_postings = _postings(dish_codes, ingredient_codes, len(self.dish_ids))
+        self.ingredient_counts = np.diff(self._recipe_indptr).astype(np.int32)
+        self._empty = np.zeros(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.dish_ids)
+
+    def _dish_codes(self, ingredient_id):
+        position = self._ingredient_positions.get(str(ingredient_id))
+        if position is None:
+            return self._empty
+        return self._dish_postings[self._dish_indptr[position]:self._dish_indptr[position + 1]]
+
+    # Function to get dish codes that use every / any / none of the given ingredients
+    def query_codes(self, all_of=(), any_of=(), none_of=()):
+        if all_of:
+            # ตัดกันจากรายการที่สั้นที่สุดก่อน เพื่อให้ชุดผลลัพธ์เล็กลงเร็วที่สุด
+            lists = sorted((self._dish_codes(i) for i in all_of), key=len)
+            result = lists[0]
+            for codes in lists[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, codes, assume_unique=True)
+        else:
+            result = None
+        if any_of:
+            union = np.unique(np.concatenate([self._dish_codes(i) for i in any_of]))
+            result = union if result is None else np.intersect1d(result, union, assume_unique=True)
+        if result is None:
+            result = np.arange(len(self.dish_ids), dtype=np.int32)
+        if none_of and len(result):
+            excluded = np.unique(np.concatenate([self._dish_codes(i) for i in none_of]))
+            result = np.setdiff1d(result, excluded, assume_unique=True)
+        return result
+
+    # Function to get dish ids that use every / any / none of the given ingredients
+    def query(self, all_of=(), any_of=(), none_of=()):
+        return [self.dish_ids[code] for code in self.query_codes(all_of, any_of, none_of)]
+
+    # Function to count, for every dish, how many of the given ingredients it uses
+    def _match_counts(self, have):
+        lists = [self._dish_codes(i) for i in set(map(str, have))]
+        lists = [codes for codes in lists if len(codes)]
+        if not lists:
+            return None
+        return np.bincount(np.concatenate(lists), minlength=len(self.dish_ids))
+
+    def _ranked(self, candidates, primary, secondary, matched, missing, none_of, limit):
+        if none_of and len(candidates):
+            candidates = np.setdiff1d(candidates, self.query_codes(any_of=none_of), assume_unique=True)
+        order = np.lexsort((secondary[candidates], primary[candidates]))
+        if limit is not None:
+            order = order[:limit]
+        return [(self.dish_ids[code], int(matched[code]), int(missing[code])) for code in candidates[order]]
+
+    # Function to rank dishes cookable from the given ingredients, missing at most k others
+    # คืนค่า [(dish_id, matched_count, missing_count)] เรียงจากขาดน้อยที่สุด แล้วใช้วัตถุดิบที่มีมากที่สุด
+    def missing_at_most(self, have, k, none_of=(), limit=None):
+        matched = self._match_counts(have)
+        if matched is None:
+            return []
+        missing = self.ingredient_counts - matched
+        candidates = np.flatnonzero((matched > 0) & (missing <= k))
+        return self._ranked(candidates, missing, -matched, matched, missing, none_of, limit)
+
+    # Function to rank dishes by how many of the given ingredients they use (pantry far smaller than the recipes)
+    # คืนค่าแบบเดียวกับ missing_at_most แต่เรียงจากใช้วัตถุดิบที่มีมากที่สุด แล้วขาดน้อยที่สุด
+    def best_matches(self, have, none_of=(), limit=None):
+        matched = self._match_counts(have)
+        if matched is None:
+            return []
+        missing = self.ingredient_counts - matched
+        return self._ranked(np.flatnonzero(matched > 0), -matched, missing, matched, missing, none_of, limit)
+
+    # Function to list the ingredients of a dish that are not in the given set
+    def missing_ingredients(self, dish_id, have):
+        code = self.dish_ids.get_indexer([str(dish_id)])[0]
+        if code < 0:
+            return []
+        have = set(map(str, have))
+        codes = self._recipe_postings[self._recipe_indptr[code]:self._recipe_indptr[code + 1]]
+        return [self.ingredient_ids[c] for c in codes if self.ingredient_ids[c] not in have]
+
+# ใช้ index เดิมซ้ำเมื่อเป็น recipe_df ชุดเดิม
+_index_memo = IdentityMemo(4)
+
+# Function to get the ingredient index of a recipe dataframe, building it once per dataframe
+def get_ingredient_index(recipe_df):
+    if recipe_df is None or 'dish_id' not in recipe_df.columns or 'ingredient_id' not in recipe_df.columns:
+        return None
+    return _index_memo.get([recipe_df], lambda: IngredientDishIndex(recipe_df))
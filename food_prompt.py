@@ -0,0 +1,94 @@
+from food_retrieval import DEFAULT_TOKEN_BUDGET, build_retrieval_context, estimate_tokens
+from food_schema import schema_header, select_columns
+
+# ส่วนของ context ที่เป็นข้อมูลจากฐานข้อมูล (ใช้นับ token ที่ลดได้)
+_DATA_SECTIONS = ('dishes_data', 'ingredients_data', 'recipe_data', 'cooking_steps_data', 'aggregates_data')
+
+# Function to generate prompt for Gemini
+# conversation: บทสนทนาก่อนหน้าที่ย่อแล้ว (จาก ConversationMemory.context_block) ใช้ตอบคำถามต่อเนื่อง
+# context_cache: RetrievalContextCache สำหรับใช้ข้อมูลส่วนฐานข้อมูลร่วมกันระหว่างคำถาม (ไม่บังคับ)
+# timings: ถ้าให้มาจะเติม context_tokens และ context_tokens_saved (token ที่ลดได้เทียบกับการแนบทุกคอลัมน์แบบตาราง)
+def generate_gemini_prompt(question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, conversation=None, context_cache=None, timings=None):
+    # ดึงเฉพาะแถวที่เกี่ยวข้องกับคำถาม และเฉพาะคอลัมน์ที่คำถามต้องใช้
+    columns = select_columns(question)
+    context, matched = build_retrieval_context(question, dataframes, token_budget, context_cache, columns)
+
+    # คำอธิบายคอลัมน์จาก data dictionary (สร้างครั้งเดียวต่อชุดคอลัมน์)
+    schema = schema_header(dataframes.get('data_dict_df'), context.get('columns'))
+    schema_section = "รูปแบบข้อมูล: แต่ละตารางขึ้นต้นด้วยชื่อคอลัมน์ ตามด้วยข้อมูลแถวละบรรทัด คั่นคอลัมน์ด้วย |\n"
+    if schema:
+        schema_section += "คำอธิบายคอลัมน์:\n" + schema + "\n"
+
+    if timings is not None:
+        context_tokens = estimate_tokens(schema_section) + sum(estimate_tokens(context[key]) for key in _DATA_SECTIONS if key in context)
+        timings['context_tokens'] = context_tokens
+        timings['context_tokens_saved'] = max(0, context.get('full_tokens', 0) - context_tokens)
+
+    if matched:
+        header = "ข้อมูลในฐานข้อมูลที่เกี่ยวข้องกับคำถาม:"
+    else:
+        header = "ไม่พบชื่ออาหารหรือวัตถุดิบที่ตรงกับคำถาม จึงแนบเฉพาะข้อมูลสรุปของฐานข้อมูล:"
+
+    conversation_section = ""
+    if conversation:
+        conversation_section = "บทสนทนาก่อนหน้า (ใช้เพื่อเข้าใจคำถามที่ต่อเนื่องจากคำถามก่อน):\n" + conversation + "\n\n"
+
+    prompt = """
+คุณเป็นผู้เชี่ยวชาญด้านอาหารไทยที่มีข้อมูลเกี่ยวกับอาหารไทย วัตถุดิบ และสูตรอาหาร
+กรุณาตอบคำถามต่อไปนี้โดยใช้ข้อมูลที่ให้มา:
+
+คำถาม: {question}
+
+{conversation_section}{header}
+{schema_section}
+1. ข้อมูลอาหารไทย (dishes_df):
+{dishes_data}
+
+2. ข้อมูลวัตถุดิบ (ingredients_df):
+{ingredients_data}
+
+3. ข้อมูลส่วนผสมในสูตรอาหาร (recipe_df):
+{recipe_data}
+""".format(
+        question=question,
+        conversation_section=conversation_section,
+        header=header,
+        schema_section=schema_section,
+        dishes_data=context['dishes_data'],
+        ingredients_data=context['ingredients_data'],
+        recipe_data=context['recipe_data']
+    )
+
+    section = 4
+
+    # เพิ่มข้อมูลวิธีทำถ้ามี
+    if 'cooking_steps_data' in context:
+        prompt += """
+{section}. ข้อมูลวิธีทำอาหาร (cooking_steps_df):
+{cooking_steps_data}
+""".format(section=section, cooking_steps_data=context['cooking_steps_data'])
+        section += 1
+
+    # เพิ่มตัวเลขสรุปต่อจานที่คำนวณไว้ล่วงหน้า
+    if 'aggregates_data' in context:
+        prompt += """
+{section}. ข้อมูลสรุปต่อจานที่คำนวณไว้แล้ว (aggregates_df):
+total_calories = แคลอรี่รวมทั้งสูตร (kcal), estimated_cost = ต้นทุนวัตถุดิบโดยประมาณทั้งสูตร (บาท),
+total_grams = น้ำหนักวัตถุดิบรวมหลังแปลงหน่วยเป็นกรัม, unconverted_count = จำนวนวัตถุดิบที่แปลงหน่วยไม่ได้,
+uncosted_count = จำนวนวัตถุดิบที่คิดต้นทุนไม่ได้ (ถ้ามากกว่า 0 estimated_cost ยังไม่รวมวัตถุดิบเหล่านั้น)
+{aggregates_data}
+""".format(section=section, aggregates_data=context['aggregates_data'])
+
+    prompt += """
+คำแนะนำเพิ่มเติม:
+1. ตอบคำถามให้ครบถ้วนตามข้อมูลที่มีในฐานข้อมูล
+2. หากมีการคำนวณ (เช่น แคลอรี่, ราคา) ให้อธิบายวิธีคำนวณด้วย
+3. หากข้อมูลในฐานข้อมูลไม่เพียงพอ ให้บอกอย่างสุภาพว่าไม่มีข้อมูลเพียงพอ
+4. ตอบในรูปแบบที่อ่านง่าย มีการจัดย่อหน้าและหัวข้ออย่างเหมาะสม
+5. ตอบเป็นภาษาไทยเสมอ
+"""
+
+    if 'aggregates_data' in context:
+        prompt += "6. คำถามเรื่องแคลอรี่หรือราคา ให้ใช้ตัวเลขใน aggregates_df เป็นหลัก (ปรับตามจำนวนคนหรือจำนวนจานถ้าถูกถาม)\n"
+
+    return prompt
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+from food_aggregates import DishAggregateIndex
+from food_config import GEMINI_ERROR_PREFIX, GEMINI_MODEL_NAME, NO_MODEL_ANSWER, cache_model_name
+from food_data_store import get_data_store
+from food_prompt import generate_gemini_prompt
+from food_query_engine import answer_locally
+from food_retrieval import DEFAULT_TOKEN_BUDGET, estimate_tokens
+from food_schema import combine_data_dicts, table_for_file
+from food_tools import run_tool_loop
+from food_units import normalize_recipe
+from gemini_client import GeminiClient
+from gemini_streaming import stream_response_text
+from request_metrics import usage_counts
+from response_cache import dataframes_version
+
+# Function to pick the tables the pipeline needs out of {filename: dataframe}
+# คืนค่า dict แบบเดียวกับที่ generate_gemini_prompt/answer_locally ใช้ (ไม่มีตารางที่จำเป็นคืน None)
+# data_dicts: ไฟล์ data dictionary ใช้สร้างคำอธิบายคอลัมน์ใน prompt (data_dict_df)
+def tables_from_files(dataframes, data_dicts=None):
+    tables = {}
+    for filename, df in dataframes.items():
+        table = table_for_file(filename)
+        if table is not None:
+            tables[table] = df
+    if not all(key in tables for key in ('dishes_df', 'ingredients_df', 'recipe_df')):
+        return None
+    tables['recipe_df'] = normalize_recipe(tables['recipe_df'], tables['ingredients_df'])
+    data_dict_df = combine_data_dicts(data_dicts)
+    if data_dict_df is not None:
+        tables['data_dict_df'] = data_dict_df
+    return tables
+
+# Function to build the prompt while recording its build time and size in timings
+def build_prompt(question, dataframes, token_budget, conversation, timings, context_cache=None):
+    started = time.perf_counter()
+    prompt = generate_gemini_prompt(question, dataframes, token_budget, conversation, context_cache, timings)
+    timings['prompt_build_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    timings['prompt_chars'] = len(prompt)
+    timings['prompt_tokens'] = estimate_tokens(prompt)
+    return prompt
+
+# Function to get response from Gemini
+# timings จะถูกเติมเวลาสร้าง prompt, ขนาด prompt, เวลาเรียก API และ error (ถ้ามี)
+# use_tools: ให้ Gemini เรียกฟังก์ชันค้นข้อมูล (food_tools) แทนการแนบตารางใน prompt
+def get_gemini_response(model, question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, conversation=None, timings=None, context_cache=None, use_tools=False):
+    timings = {} if timings is None else timings
+    try:
+        if use_tools:
+            return run_tool_loop(model, question, dataframes, conversation, timings)
+
+        # สร้าง prompt
+        prompt = build_prompt(question, dataframes, token_budget, conversation, timings, context_cache)
+
+        # ส่งไปยัง Gemini API
+        started = time.perf_counter()
+        response = model.generate_content(prompt)
+        timings['api_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        timings.update(usage_counts(response))
+
+        # แปลงผลลัพธ์เป็นข้อความ
+        return response.text
+    except Exception as e:
+        timings['error'] = type(e).__name__
+        return f"{GEMINI_ERROR_PREFIX}: {str(e)}\n\nกรุณาตรวจสอบ API Key และการเชื่อมต่ออินเทอร์เน็ต"
+
+# Function to stream response from Gemini chunk by chunk
+# timings จะถูกเติมเวลาสร้าง prompt, ขนาด prompt, first_token_ms, total_ms และ error (ถ้ามี)
+# use_tools: รอบเรียกฟังก์ชันสตรีมไม่ได้ จึงส่งคำตอบสุดท้ายทั้งก้อนเมื่อได้รับครบ
+def get_gemini_response_stream(model, question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, timings=None, conversation=None, use_tools=False):
+    timings = {} if timings is None else timings
+    try:
+        if use_tools:
+            started = time.perf_counter()
+            text = run_tool_loop(model, question, dataframes, conversation, timings)
+            timings['first_token_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            yield text
+            return
+
+        # สร้าง prompt
+        prompt = build_prompt(question, dataframes, token_budget, conversation, timings)
+
+        # ส่งไปยัง Gemini API แบบสตรีม แล้วส่งต่อข้อความทีละส่วน
+        yield from stream_response_text(lambda: model.generate_content(prompt, stream=True), timings)
+    except Exception as e:
+        timings['error'] = type(e).__name__
+        yield f"\n\n{GEMINI_ERROR_PREFIX}: {str(e)}\n\nกรุณาตรวจสอบ API Key และการเชื่อมต่ออินเทอร์เน็ต"
+
+# Load/prompt/answer pipeline without any UI; one instance serves every request of the process
+class FoodQAService:
+    def __init__(
+        self,
+        store=None,
+        model=None,
+        cache=None,
+        metrics=None,
+        model_name=GEMINI_MODEL_NAME,
+        token_budget=DEFAULT_TOKEN_BUDGET,
+        app='api',
+        use_tools=False
+    ):
+        self.store = store if store is not None else get_data_store()
+        # model: GeminiClient (หรือโมเดลจำลอง) ใช้ร่วมกันทุก request; None = ตอบได้เฉพาะจากฐานข้อมูล
+        self.model = model
+        self.cache = cache
+        self.metrics = metrics
+        self.model_name = model_name
+        self.token_budget = token_budget
+        self.app = app
+        # use_tools: ตอบด้วย function calling (prompt ขนาดคงที่) แทนการแนบตาราง
+        self.use_tools = use_tools
+        self._aggregate_index = DishAggregateIndex()
+        self._tables = None
+        self._lock = threading.Lock()
+
+    # Function to get (tables, data_version) of the current snapshot, rebuilt only when the CSV files change
+    def tables(self):
+        snapshot = self.store.load()
+        with self._lock:
+            if self._tables is not None and self._tables[0] is snapshot:
+                return self._tables[1], self._tables[2]
+            tables = tables_from_files(snapshot.dataframes, snapshot.data_dicts)
+            if tables is None:
+                raise ValueError("ไม่พบไฟล์ thai_dishes, ingredients หรือ recipe_ingredients ในโฟลเดอร์ csv")
+            data_version = dataframes_version(tables)
+            aggregates_df = snapshot.aggregates_for(tables['dishes_df'], tables['ingredients_df'], tables['recipe_df'])
+            if aggregates_df is None:
+                aggregates_df = self._aggregate_index.update(tables['dishes_df'], tables['ingredients_df'], tables['recipe_df'])
+            tables['aggregates_df'] = aggregates_df
+            self._tables = (snapshot, tables, data_version)
+            return tables, data_version
+
+    # Function to answer one question: local engine, then the response cache, then the model
+    # คืนค่า dict: question, answer, path (local/cache/gemini/none), intent และเวลา/ขนาด prompt/error (ถ้ามี)
+    def answer(self, question, conversation="", token_budget=None, dataframes=None, context_cache=None):
+        started = time.perf_counter()
+        token_budget = token_budget or self.token_budget
+        if dataframes is None:
+            dataframes, data_version = self.tables()
+        else:
+            data_version = dataframes_version(dataframes)
+        timings = {}
+        intent, answer = answer_locally(question, dataframes)
+        path = 'local'
+        if answer is None:
+            if self.model is None:
+                answer = NO_MODEL_ANSWER
+                path = 'none'
+            else:
+                cache_key = None
+                if self.cache is not None:
+                    cache_key = self.cache.make_key(question, data_version, cache_model_name(self.model_name, self.use_tools), token_budget, conversation)
+                    answer = self.cache.get(cache_key)
+                    path = 'cache'
+                if answer is None:
+                    answer = get_gemini_response(self.model, question, dataframes, token_budget, conversation, timings, context_cache, self.use_tools)
+                    path = 'gemini'
+                    if cache_key is not None and 'error' not in timings:
+                        self.cache.set(cache_key, answer)
+        result = {'question': question, 'answer': answer, 'path': path, 'intent': intent}
+        result.update(timings)
+        result['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        if self.metrics is not None:
+            self.metrics.record(
+                app=self.app,
+                path=path,
+                intent=intent,
+                model=self.model_name if path == 'gemini' else None,
+                prompt_build_ms=timings.get('prompt_build_ms'),
+                prompt_chars=timings.get('prompt_chars'),
+                prompt_tokens=timings.get('prompt_tokens'),
+                context_tokens_saved=timings.get('context_tokens_saved'),
+                tool_calls=timings.get('tool_calls'),
+                usage_prompt_tokens=timings.get('usage_prompt_tokens'),
+                usage_output_tokens=timings.get('usage_output_tokens'),
+                total_ms=result['total_ms'],
+                error=timings.get('error')
+            )
+        return result
+
+    # Function to answer from an asyncio event loop without blocking it (runs in the given executor)
+    async def answer_async(self, question, conversation="", token_budget=None, executor=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: self.answer(question, conversation, token_budget))
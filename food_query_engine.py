@@ -0,0 +1,325 @@
+import re
+
+import pandas as pd
+
+from food_ingredient_index import get_ingredient_index
+from food_retrieval import normalize_text
+
+# สมมติว่าสูตรในฐานข้อมูลเป็นปริมาณสำหรับ 2 ที่ (ใช้เมื่อผู้ใช้ถามราคาหรือแคลอรี่ตามจำนวนคน)
+RECIPE_SERVINGS = 2
+
+# จำนวนรายการที่แสดงในคำตอบแบบจัดอันดับ
+TOP_N = 5
+
+# คำสำคัญสำหรับจำแนกประเภทคำถาม
+INGREDIENT_KEYWORDS = ('ส่วนผสม', 'วัตถุดิบ', 'ใส่อะไร')
+STEP_KEYWORDS = ('วิธีทำ', 'ขั้นตอน', 'ทำยังไง', 'ทำอย่างไร', 'ทำไง', 'สูตร')
+CALORIE_KEYWORDS = ('แคลอรี่', 'แคล', 'พลังงาน', 'kcal')
+COST_KEYWORDS = ('ราคา', 'งบประมาณ', 'ต้นทุน', 'ค่าใช้จ่าย', 'กี่บาท')
+LOWEST_KEYWORDS = ('น้อยที่สุด', 'ต่ำที่สุด', 'ถูกที่สุด', 'ประหยัดที่สุด')
+HIGHEST_KEYWORDS = ('มากที่สุด', 'สูงที่สุด', 'แพงที่สุด')
+COOK_WITH_KEYWORDS = ('ทำอะไร', 'ทำอาหาร', 'อาหารอะไร', 'เมนูอะไร')
+
+# คำขยายท้ายชื่อวัตถุดิบที่ผู้ใช้มักไม่พิมพ์ เช่น "กุ้ง" แทน "กุ้งสด"
+INGREDIENT_SUFFIXES = ('สด', 'แห้ง', 'ดิบ')
+
+# คำที่อยู่หน้าชื่อวัตถุดิบเมื่อผู้ใช้ไม่ต้องการวัตถุดิบนั้น เช่น "ไม่ใส่กุ้ง"
+EXCLUDE_KEYWORDS = ('ไม่ใส่', 'ไม่เอา', 'ไม่มี', 'ไม่กิน', 'ยกเว้น', 'แพ้')
+
+# คอลัมน์ที่นับแถวที่ไม่ได้รวมอยู่ในค่ารวมแต่ละค่า (ค่ารวมไม่ครบเมื่อคอลัมน์ใดเกิน 0)
+INCOMPLETE_COUNT_COLUMNS = {
+    'total_calories': ('unconverted_count',),
+    'estimated_cost': ('unconverted_count', 'uncosted_count'),
+}
+
+# Function to check whether any keyword appears in the text
+def _has_any(text, keywords):
+    return any(keyword in text for keyword in keywords)
+
+# Function to find every dish whose full name appears in the question, as [(dish_id, dish_name)] in question order
+# ชื่อยาวก่อน และตัดส่วนที่ตรงแล้วออก เพื่อให้ "ผัดไทยกุ้งสด" ไม่ถูกนับเป็น "ผัดไทย" อีกจาน
+def _find_dishes(question_text, dishes_df):
+    if dishes_df is None or 'dish_name' not in dishes_df.columns:
+        return []
+    names = {}
+    for dish_id, name in zip(dishes_df['dish_id'], dishes_df['dish_name']):
+        name_text = normalize_text(name)
+        if name_text:
+            names.setdefault(name_text, (dish_id, name))
+    found = []
+    remaining = question_text
+    for name_text in sorted(names, key=len, reverse=True):
+        position = remaining.find(name_text)
+        if position < 0:
+            continue
+        found.append((position, names[name_text]))
+        remaining = remaining[:position] + " " * len(name_text) + remaining[position + len(name_text):]
+    return [dish for _, dish in sorted(found, key=lambda item: item[0])]
+
+# Function to find ingredient names in the question; returns (wanted_ids, excluded_ids, names by id)
+def _find_ingredients(question_text, ingredients_df):
+    if ingredients_df is None or 'ingredient_name' not in ingredients_df.columns:
+        return [], [], {}
+    names = {}
+    aliases = {}
+    for ingredient_id, name in zip(ingredients_df['ingredient_id'], ingredients_df['ingredient_name']):
+        name_text = normalize_text(name)
+        if name_text:
+            names[name_text] = (str(ingredient_id), name)
+            for suffix in INGREDIENT_SUFFIXES:
+                if name_text.endswith(suffix) and len(name_text) > len(suffix) + 1:
+                    aliases.setdefault(name_text[:-len(suffix)], (str(ingredient_id), name))
+    for alias, entry in aliases.items():
+        names.setdefault(alias, entry)
+    matches, found = [], {}
+    remaining = question_text
+    # ชื่อยาวก่อน เพื่อให้ "พริกขี้หนูสด" ไม่ถูกนับเป็น "พริก"
+    for name_text in sorted(names, key=len, reverse=True):
+        position = remaining.find(name_text)
+        if position < 0:
+            continue
+        ingredient_id, name = names[name_text]
+        if ingredient_id not in found:
+            matches.append((position, position + len(name_text), ingredient_id))
+        found[ingredient_id] = name
+        remaining = remaining[:position] + " " * len(name_text) + remaining[position + len(name_text):]
+
+    # ไล่ตามลำดับที่ผู้ใช้พิมพ์: "ไม่ใส่พริกไทยกับน้ำปลา" ตัดทั้งพริกไทยและน้ำปลา
+    wanted, excluded = [], []
+    excluding = False
+    previous_end = 0
+    for position, end, ingredient_id in sorted(matches):
+        gap = question_text[previous_end:position]
+        if gap.endswith(EXCLUDE_KEYWORDS):
+            excluding = True
+        elif gap.strip(' ,') not in ('', 'และ', 'กับ', 'หรือ'):
+            excluding = False
+        (excluded if excluding else wanted).append(ingredient_id)
+        previous_end = end
+    return wanted, excluded, found
+
+# Function to read number of servings from the question, e.g. "สำหรับ 4 คน"
+def _find_servings(question_text):
+    match = re.search(r'(\d+)(?:คน|ที่|จาน)', question_text)
+    return int(match.group(1)) if match else None
+
+# Function to classify a question into a locally answerable intent
+def classify_intent(question, dataframes):
+    text = normalize_text(question)
+    dishes = _find_dishes(text, dataframes.get('dishes_df'))
+    params = {'servings': _find_servings(text)}
+    if len(dishes) > 1:
+        # คำถามที่พูดถึงหลายจาน (เช่น เปรียบเทียบ) ส่งให้ Gemini พร้อมข้อมูลของทุกจาน
+        params['dish_ids'] = [dish_id for dish_id, _ in dishes]
+        params['dish_names'] = [name for _, name in dishes]
+        return 'open', params
+    if dishes:
+        params['dish_id'], params['dish_name'] = dishes[0]
+        # แคลอรี่/ราคาก่อน เพราะคำถามเหล่านี้มักมีคำกว้าง ๆ ด้วย เช่น "ราคาวัตถุดิบของ..." หรือ "แคลอรี่ของสูตร..."
+        if _has_any(text, CALORIE_KEYWORDS):
+            return 'dish_calories', params
+        if _has_any(text, COST_KEYWORDS):
+            return 'dish_cost', params
+        if _has_any(text, INGREDIENT_KEYWORDS):
+            return 'ingredients', params
+        if _has_any(text, STEP_KEYWORDS):
+            return 'steps', params
+        return 'open', params
+
+    # คำถามแบบ "มีกุ้ง ตะไคร้ มะนาว ทำอะไรได้บ้าง"
+    if _has_any(text, COOK_WITH_KEYWORDS):
+        wanted, excluded, names = _find_ingredients(text, dataframes.get('ingredients_df'))
+        if wanted:
+            params.update({'have': wanted, 'exclude': excluded, 'ingredient_names': names})
+            return 'cook_with', params
+
+    # คำถามจัดอันดับทั้งฐานข้อมูล เช่น "อาหารที่มีแคลอรี่น้อยที่สุด"
+    if _has_any(text, CALORIE_KEYWORDS) and _has_any(text, LOWEST_KEYWORDS):
+        return 'lowest_calories', params
+    if _has_any(text, CALORIE_KEYWORDS) and _has_any(text, HIGHEST_KEYWORDS):
+        return 'highest_calories', params
+    if _has_any(text, ('ถูกที่สุด', 'ประหยัดที่สุด')) or (_has_any(text, COST_KEYWORDS) and _has_any(text, LOWEST_KEYWORDS)):
+        return 'cheapest', params
+    if _has_any(text, ('แพงที่สุด',)) or (_has_any(text, COST_KEYWORDS) and _has_any(text, HIGHEST_KEYWORDS)):
+        return 'most_expensive', params
+    return 'open', params
+
+# Function to format a number without trailing zeros
+def _format_number(value):
+    if pd.isna(value):
+        return "-"
+    value = float(value)
+    return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}".rstrip('0').rstrip('.')
+
+# Function to get aggregate row of a dish
+def _aggregate_row(dataframes, dish_id):
+    aggregates_df = dataframes.get('aggregates_df')
+    if aggregates_df is None:
+        return None
+    rows = aggregates_df[aggregates_df['dish_id'] == dish_id]
+    return None if rows.empty else rows.iloc[0]
+
+# Function to answer "what are the ingredients of X"
+def _answer_ingredients(dataframes, params):
+    recipe_df = dataframes.get('recipe_df')
+    ingredients_df = dataframes.get('ingredients_df')
+    if recipe_df is None or ingredients_df is None:
+        return None
+    rows = recipe_df[recipe_df['dish_id'] == params['dish_id']]
+    if rows.empty:
+        return None
+    rows = rows.merge(ingredients_df[['ingredient_id', 'ingredient_name']], on='ingredient_id', how='left')
+    servings = params.get('servings')
+    if servings and 'amount_value' in rows.columns and 'grams' in rows.columns:
+        # ปรับปริมาณทุกแถวตามจำนวนที่ด้วยการคูณครั้งเดียว (amount_value/grams แปลงไว้แล้วตอนโหลด)
+        scaled = rows[['amount_value', 'grams']].to_numpy(dtype='float64') * (servings / RECIPE_SERVINGS)
+        rows = rows.assign(amount_value=scaled[:, 0], grams=scaled[:, 1])
+        lines = [f"**ส่วนผสมของ{params['dish_name']}สำหรับ {servings} ที่** ({len(rows)} รายการ)", ""]
+    else:
+        servings = None
+        lines = [f"**ส่วนผสมของ{params['dish_name']}** ({len(rows)} รายการ)", ""]
+    for row in rows.itertuples(index=False):
+        name = row.ingredient_name if isinstance(row.ingredient_name, str) else str(row.ingredient_id)
+        unit = row.unit if isinstance(row.unit, str) else ''
+        amount = row.amount
+        if servings and not pd.isna(row.amount_value):
+            amount = _format_number(row.amount_value)
+        line = f"- {name} {amount} {unit}".rstrip()
+        if servings and not pd.isna(row.grams) and unit.strip() != 'กรัม':
+            line += f" (ประมาณ {_format_number(round(row.grams, 1))} กรัม)"
+        notes = getattr(row, 'notes', None)
+        if isinstance(notes, str) and notes.strip():
+            line += f" ({notes})"
+        lines.append(line)
+    if servings:
+        lines += ["", f"- ปรับจากสูตรในฐานข้อมูล (ถือว่าเป็นสูตรสำหรับ {RECIPE_SERVINGS} ที่) เป็น {servings} ที่"]
+    return "\n".join(lines)
+
+# Function to answer "how to cook X"
+def _answer_steps(dataframes, params):
+    cooking_steps_df = dataframes.get('cooking_steps_df')
+    if cooking_steps_df is None or 'dish_id' not in cooking_steps_df.columns:
+        return None
+    rows = cooking_steps_df[cooking_steps_df['dish_id'] == params['dish_id']]
+    if rows.empty:
+        return None
+    if 'step_number' in rows.columns:
+        rows = rows.sort_values('step_number')
+    lines = [f"**วิธีทำ{params['dish_name']}**", ""]
+    for number, instruction in enumerate(rows['instruction'], start=1):
+        lines.append(f"{number}. {instruction}")
+    return "\n".join(lines)
+
+# Function to count the rows left out of a dish's total for the given aggregate column
+def _missing_count(row, column):
+    return max(int(row[c]) for c in INCOMPLETE_COUNT_COLUMNS[column] if c in row.index)
+
+# Function to build the note about servings and unconverted units
+def _scale_note(row, servings, column):
+    notes = []
+    if servings:
+        notes.append(f"คำนวณจากสูตรในฐานข้อมูล (ถือว่าเป็นสูตรสำหรับ {RECIPE_SERVINGS} ที่) แล้วปรับเป็น {servings} ที่")
+    else:
+        notes.append(f"เป็นค่ารวมทั้งสูตรในฐานข้อมูล (ประมาณ {RECIPE_SERVINGS} ที่)")
+    if row['unconverted_count'] > 0:
+        notes.append(f"มีวัตถุดิบ {row['unconverted_count']} รายการที่แปลงหน่วยไม่ได้ จึงไม่ได้นับรวม")
+    if column == 'estimated_cost' and row.get('uncosted_count', 0) > 0:
+        notes.append(f"มีวัตถุดิบ {row['uncosted_count']} รายการที่คิดต้นทุนไม่ได้ (หน่วยที่ซื้อ เช่น ขวด/กระป๋อง ไม่มีน้ำหนัก หรือไม่มีราคา) จึงไม่ได้นับรวม")
+    notes.append("ปริมาณที่เป็นช้อน/เม็ด/ใบ ถูกแปลงเป็นกรัมด้วยค่าประมาณ")
+    return "\n".join(f"- {note}" for note in notes)
+
+# Function to answer calorie/cost of one dish from the aggregates
+def _answer_dish_total(dataframes, params, column, label, unit):
+    row = _aggregate_row(dataframes, params['dish_id'])
+    if row is None:
+        return None
+    servings = params.get('servings')
+    factor = servings / RECIPE_SERVINGS if servings else 1.0
+    total = row[column] * factor
+    missing = _missing_count(row, column)
+    if missing > 0:
+        # ค่ารวมไม่ครบทุกวัตถุดิบ จึงบอกเป็นค่าต่ำสุด ไม่ใช่ยอดรวมทั้งสูตร
+        counted = max(int(row['ingredient_count']) - missing, 0)
+        headline = f"**{label}ของ{params['dish_name']}**: อย่างน้อย {_format_number(total)} {unit} (คิดได้ {counted} จาก {row['ingredient_count']} รายการ)"
+    else:
+        headline = f"**{label}ของ{params['dish_name']}**: ประมาณ {_format_number(total)} {unit}"
+    lines = [
+        headline,
+        "",
+        _scale_note(row, servings, column),
+    ]
+    if not servings and missing == 0:
+        lines.insert(1, f"(ประมาณ {_format_number(row[column] / RECIPE_SERVINGS)} {unit} ต่อที่)")
+    return "\n".join(lines)
+
+# Function to answer ranking questions over all dishes
+def _answer_ranking(dataframes, column, ascending, label, unit):
+    aggregates_df = dataframes.get('aggregates_df')
+    if aggregates_df is None or aggregates_df.empty:
+        return None
+    # ไม่นับจานที่ไม่มีสูตรหรือค่ารวมไม่ครบ (แปลงหน่วยไม่ได้/คิดต้นทุนไม่ได้) เพื่อไม่ให้อันดับคลาดเคลื่อน
+    complete = aggregates_df['ingredient_count'] > 0
+    for count_column in INCOMPLETE_COUNT_COLUMNS[column]:
+        if count_column in aggregates_df.columns:
+            complete &= aggregates_df[count_column] == 0
+    candidates = aggregates_df[complete]
+    if candidates.empty:
+        return None
+    ranked = candidates.sort_values(column, ascending=ascending).head(TOP_N)
+    lines = [f"**{label}** (คำนวณจากสูตรในฐานข้อมูล ทั้งสูตร)", ""]
+    for rank, row in enumerate(ranked.itertuples(index=False), start=1):
+        lines.append(f"{rank}. {row.dish_name} - {_format_number(getattr(row, column))} {unit}")
+    return "\n".join(lines)
+
+# Function to answer "what can I cook with X, Y and Z" from the ingredient index
+def _answer_cook_with(dataframes, params):
+    index = get_ingredient_index(dataframes.get('recipe_df'))
+    dishes_df = dataframes.get('dishes_df')
+    ingredients_df = dataframes.get('ingredients_df')
+    if index is None or dishes_df is None:
+        return None
+    have, exclude = params['have'], params['exclude']
+    ranked = index.best_matches(have, none_of=exclude, limit=TOP_N)
+    if not ranked:
+        return None
+    dish_names = dict(zip(dishes_df['dish_id'].astype(str), dishes_df['dish_name']))
+    ingredient_names = dict(zip(ingredients_df['ingredient_id'].astype(str), ingredients_df['ingredient_name']))
+    have_text = ", ".join(params['ingredient_names'][i] for i in have)
+    lines = [f"**อาหารที่ทำได้จาก{have_text}**"]
+    if exclude:
+        lines[0] += " (ไม่ใช้" + ", ".join(params['ingredient_names'][i] for i in exclude) + ")"
+    lines.append("")
+    for rank, (dish_id, matched, missing) in enumerate(ranked, start=1):
+        line = f"{rank}. {dish_names.get(dish_id, dish_id)} - ใช้วัตถุดิบที่มี {matched}/{len(have)} อย่าง"
+        if missing:
+            needed = [ingredient_names.get(i, i) for i in index.missing_ingredients(dish_id, have)]
+            line += f", ต้องเพิ่มอีก {missing} อย่าง: " + ", ".join(needed)
+        else:
+            line += ", มีวัตถุดิบครบแล้ว"
+        lines.append(line)
+    return "\n".join(lines)
+
+# Function to answer a question locally from the dataframes; returns (intent, answer) or (intent, None)
+def answer_locally(question, dataframes):
+    intent, params = classify_intent(question, dataframes)
+    if intent == 'ingredients':
+        answer = _answer_ingredients(dataframes, params)
+    elif intent == 'steps':
+        answer = _answer_steps(dataframes, params)
+    elif intent == 'dish_calories':
+        answer = _answer_dish_total(dataframes, params, 'total_calories', 'แคลอรี่', 'กิโลแคลอรี่')
+    elif intent == 'dish_cost':
+        answer = _answer_dish_total(dataframes, params, 'estimated_cost', 'ต้นทุนวัตถุดิบ', 'บาท')
+    elif intent == 'cook_with':
+        answer = _answer_cook_with(dataframes, params)
+    elif intent == 'lowest_calories':
+        answer = _answer_ranking(dataframes, 'total_calories', True, 'อาหารที่มีแคลอรี่น้อยที่สุด', 'กิโลแคลอรี่')
+    elif intent == 'highest_calories':
+        answer = _answer_ranking(dataframes, 'total_calories', False, 'อาหารที่มีแคลอรี่มากที่สุด', 'กิโลแคลอรี่')
+    elif intent == 'cheapest':
+        answer = _answer_ranking(dataframes, 'estimated_cost', True, 'อาหารที่ต้นทุนวัตถุดิบถูกที่สุด', 'บาท')
+    elif intent == 'most_expensive':
+        answer = _answer_ranking(dataframes, 'estimated_cost', False, 'อาหารที่ต้นทุนวัตถุดิบแพงที่สุด', 'บาท')
+    else:
+        answer = None
+    return intent, answer
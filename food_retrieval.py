@@ -0,0 +1,401 @@
+import re
+import threading
+from difflib import SequenceMatcher
+
+from identity_memo import IdentityMemo
+
+# งบประมาณ token สำหรับส่วนข้อมูลใน prompt (ปรับได้ตามขนาด context ของโมเดล)
+DEFAULT_TOKEN_BUDGET = 6000
+
+# ค่าประมาณจำนวนตัวอักษรต่อ token สำหรับข้อความภาษาไทยปนอังกฤษ
+CHARS_PER_TOKEN = 3
+
+# จำนวนอาหารที่ประมาณขนาดพร้อมกันหนึ่งรอบ ระหว่างเลือกอาหารให้พอดีงบประมาณ token
+BUDGET_CHUNK_SIZE = 64
+
+# ความยาวขั้นต่ำของชื่อที่จะใช้จับคู่แบบใกล้เคียง (ป้องกันคำสั้นๆ จับคู่ผิด)
+MIN_FUZZY_NAME_LENGTH = 4
+
+# คำนำหน้าภูมิภาคที่ผู้ใช้มักพิมพ์
+REGION_PREFIXES = ("ภาค", "อาหาร")
+
+# Function to estimate number of tokens of a text
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+# Function to normalize text before matching
+def normalize_text(text):
+    return re.sub(r"\s+", "", str(text)).lower()
+
+# Function to check whether a normalized name appears in the question (exact or close enough)
+def _name_score(name, question):
+    if not name:
+        return 0.0
+    if name in question:
+        return 1.0
+    if len(name) < MIN_FUZZY_NAME_LENGTH:
+        return 0.0
+    # ใช้ส่วนที่ตรงกันยาวที่สุด เช่น "แกงมัสมั่น" กับ "แกงมัสมั่นไก่"
+    match = SequenceMatcher(None, name, question, autojunk=False).find_longest_match(0, len(name), 0, len(question))
+    if match.size >= MIN_FUZZY_NAME_LENGTH and match.size >= 0.7 * len(name):
+        return match.size / len(name)
+    return 0.0
+
+# Names of one table column, normalized once, with an n-gram index to find candidate names quickly
+# ชื่อที่จับคู่แบบใกล้เคียงได้ต้องมีส่วนที่ตรงกับคำถามยาวอย่างน้อย MIN_FUZZY_NAME_LENGTH ตัวอักษร
+# จึงต้องมี n-gram ขนาดนั้นร่วมกับคำถามอย่างน้อยหนึ่งตัว ชื่อที่ไม่มี n-gram ร่วมเลยข้ามได้โดยไม่ต้องเทียบ
+class _NameTable:
+    def __init__(self, df, id_col, name_col):
+        self.ids = df[id_col].tolist()
+        self.names = [str(name) for name in df[name_col].tolist()]
+        self.texts = [normalize_text(name) for name in self.names]
+        # ชื่อสั้นกว่า n-gram จับคู่ได้เฉพาะแบบตรงทั้งชื่อ
+        self.short_names = {}
+        self.grams = {}
+        n = MIN_FUZZY_NAME_LENGTH
+        for position, text in enumerate(self.texts):
+            if not text:
+                continue
+            if len(text) < n:
+                self.short_names.setdefault(text, []).append(position)
+                continue
+            for gram in {text[i:i + n] for i in range(len(text) - n + 1)}:
+                self.grams.setdefault(gram, []).append(position)
+
+    # Function to list positions of names that may match the question, in table order
+    def candidates(self, question):
+        n = MIN_FUZZY_NAME_LENGTH
+        positions = set()
+        for i in range(len(question) - n + 1):
+            positions.update(self.grams.get(question[i:i + n], ()))
+        for size in range(1, n):
+            for i in range(len(question) - size + 1):
+                positions.update(self.short_names.get(question[i:i + size], ()))
+        return sorted(positions)
+
+# ตารางชื่อต่อ DataFrame (สร้างครั้งเดียว ใช้ซ้ำทุกคำถาม)
+_name_tables = IdentityMemo(8)
+
+# Function to match names in a column against the question
+def _match_names(df, id_col, name_col, question):
+    if df is None or id_col not in df.columns or name_col not in df.columns:
+        return []
+    table = _name_tables.get([df], lambda: _NameTable(df, id_col, name_col), key=(id_col, name_col))
+    scored = []
+    for position in table.candidates(question):
+        score = _name_score(table.texts[position], question)
+        if score > 0:
+            name = table.names[position]
+            scored.append((score, len(name), table.ids[position], name))
+    # คะแนนสูงและชื่อยาวก่อน เพื่อให้ "ต้มยำกุ้ง" มาก่อน "กุ้ง"
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [(row_id, name) for _, _, row_id, name in scored]
+
+# Function to match a categorical column (dish_type, region) against the question
+def _match_category(df, col, question, prefixes=()):
+    if df is None or col not in df.columns:
+        return []
+    matched = []
+    for value in df[col].dropna().unique():
+        value_text = normalize_text(value)
+        if not value_text:
+            continue
+        candidates = [prefix + value_text for prefix in prefixes] if prefixes else [value_text]
+        if any(candidate in question for candidate in candidates):
+            matched.append(value)
+    return matched
+
+# Function to resolve a question to relevant dish and ingredient ids
+def find_relevant_ids(question, dataframes):
+    dishes_df = dataframes.get('dishes_df')
+    ingredients_df = dataframes.get('ingredients_df')
+    recipe_df = dataframes.get('recipe_df')
+
+    text = normalize_text(question)
+    dish_ids = []
+    ingredient_ids = []
+
+    # 1. จับคู่ชื่ออาหาร แล้วตัดชื่อที่พบออกจากคำถาม เพื่อไม่ให้ "ต้ม" ใน "ต้มยำกุ้ง" ไปจับ dish_type
+    residual = text
+    for dish_id, name in _match_names(dishes_df, 'dish_id', 'dish_name', text):
+        if dish_id not in dish_ids:
+            dish_ids.append(dish_id)
+        residual = residual.replace(normalize_text(name), " ")
+
+    # 2. จับคู่ชื่อวัตถุดิบจากส่วนที่เหลือของคำถาม
+    for ingredient_id, name in _match_names(ingredients_df, 'ingredient_id', 'ingredient_name', residual):
+        if ingredient_id not in ingredient_ids:
+            ingredient_ids.append(ingredient_id)
+        residual = residual.replace(normalize_text(name), " ")
+
+    # 3. ถ้าไม่พบชื่อใดเลย (เช่น สะกดผิด หรือเรียกชื่อต่างไป) ค้นหาด้วย embedding index
+    #    ผลลัพธ์เรียงตามความใกล้เคียง จึงมาก่อนอาหารที่ตรงแค่ประเภทหรือภูมิภาค
+    if not dish_ids and not ingredient_ids:
+        from food_embeddings import semantic_matches
+        try:
+            dish_ids, ingredient_ids = semantic_matches(question, dataframes)
+        except Exception:
+            # embedder ใช้งานไม่ได้ (เช่น เรียก API ไม่สำเร็จ) ใช้ข้อมูลสรุปแทน
+            dish_ids, ingredient_ids = [], []
+
+    # 4. จับคู่ประเภทอาหารและภูมิภาค
+    if dishes_df is not None:
+        dish_types = _match_category(dishes_df, 'dish_type', residual)
+        regions = _match_category(dishes_df, 'region', residual, prefixes=REGION_PREFIXES)
+        mask = None
+        for col, values in (('dish_type', dish_types), ('region', regions)):
+            if values:
+                matched = dishes_df[col].isin(values)
+                mask = matched if mask is None else mask | matched
+        if mask is not None:
+            for dish_id in dishes_df.loc[mask, 'dish_id']:
+                if dish_id not in dish_ids:
+                    dish_ids.append(dish_id)
+
+    # 5. ถ้าไม่พบชื่ออาหารแต่พบวัตถุดิบ ให้ดึงอาหารที่ใช้วัตถุดิบนั้น
+    if not dish_ids and ingredient_ids and recipe_df is not None:
+        using = recipe_df.loc[recipe_df['ingredient_id'].isin(ingredient_ids), 'dish_id']
+        for dish_id in using.drop_duplicates():
+            dish_ids.append(dish_id)
+
+    return dish_ids, ingredient_ids
+
+# Function to format a float without trailing zeros (2 decimals are enough for prices/calories)
+def _format_float(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+# Function to render a dataframe as dense delimited text: a header line, then one line per row separated by |
+def _render_rows(df):
+    if df is None or df.empty:
+        return "ไม่มีข้อมูล"
+    return df.to_csv(sep='|', index=False, lineterminator='\n', float_format=_format_float).rstrip('\n')
+
+# Function to estimate the tokens of the same rows rendered as a padded table with every column (df.to_string)
+# ใช้รายงานว่าการเลือกคอลัมน์และรูปแบบแบบย่อลด token ไปเท่าไหร่ (คำนวณจากความกว้างคอลัมน์ ไม่ต้อง render จริง)
+def _padded_tokens(df):
+    if df is None or df.empty:
+        return 0
+    width = sum(max(len(str(col)), int(df[col].astype(str).str.len().fillna(0).max())) + 2 for col in df.columns)
+    return (len(df) + 1) * width // CHARS_PER_TOKEN + 1
+
+# Function to estimate the rendered characters of the rows of a table, summed per key (e.g. per dish_id)
+def _row_chars(df, key, table, columns):
+    projected = _project(df, table, columns)
+    if projected is None or projected.empty:
+        return {}
+    # ความยาวข้อความของทุกคอลัมน์ + ตัวคั่น | และขึ้นบรรทัดใหม่
+    lengths = None
+    for col in projected.columns:
+        col_lengths = projected[col].astype(str).str.len().fillna(0)
+        lengths = col_lengths if lengths is None else lengths + col_lengths
+    lengths = lengths + len(projected.columns)
+    return lengths.groupby(df[key].to_numpy()).sum().to_dict()
+
+# Function to keep only the chosen columns of a table (columns from food_schema.select_columns; None = every column)
+# คืน None เมื่อตารางนี้ไม่ต้องแนบ
+def _project(df, table, columns):
+    if df is None or columns is None or columns.get(table) is None:
+        return df
+    wanted = columns[table]
+    if not wanted:
+        return None
+    return df[[col for col in df.columns if col in wanted]]
+
+# Function to turn a column selection into a hashable part of a cache key
+def _columns_key(columns):
+    if columns is None:
+        return None
+    return tuple(sorted(columns.items()))
+
+# Function to render one prompt section and record its columns and unpruned size in the context
+def _add_section(context, key, table, df, columns):
+    projected = _project(df, table, columns)
+    if df is not None and projected is None:
+        context[key] = "ไม่ได้แนบ (ไม่เกี่ยวกับคำถาม)"
+        context['full_tokens'] += _padded_tokens(df)
+        return
+    context[key] = _render_rows(projected)
+    if projected is not None:
+        context['columns'][table] = list(projected.columns)
+        context['full_tokens'] += _padded_tokens(df)
+
+# Function to build compact summary of the whole catalog (used when nothing matches)
+def build_summary_context(dataframes, token_budget=DEFAULT_TOKEN_BUDGET):
+    dishes_df = dataframes.get('dishes_df')
+    ingredients_df = dataframes.get('ingredients_df')
+
+    sections = {}
+    if dishes_df is not None:
+        columns = [c for c in ('dish_id', 'dish_name', 'dish_type', 'region') if c in dishes_df.columns]
+        sections['dishes_data'] = ('dishes_df', dishes_df, columns)
+    if ingredients_df is not None:
+        columns = [c for c in ('ingredient_id', 'ingredient_name', 'category') if c in ingredients_df.columns]
+        sections['ingredients_data'] = ('ingredients_df', ingredients_df, columns)
+    aggregates_df = dataframes.get('aggregates_df')
+    if aggregates_df is not None:
+        # ตัวเลขที่คำนวณไว้แล้วช่วยตอบคำถามภาพรวม เช่น อาหารที่แคลอรี่น้อยที่สุด
+        sections['aggregates_data'] = ('aggregates_df', aggregates_df, ['dish_id', 'dish_name', 'total_calories', 'estimated_cost'])
+
+    # แบ่งงบประมาณให้แต่ละตารางเท่าๆ กัน แล้วตัดแถวที่เกินออก
+    per_section = max(1, token_budget // max(1, len(sections)))
+    context = {'columns': {}, 'full_tokens': 0}
+    for key, (table, df, columns) in sections.items():
+        text = _render_rows(df[columns])
+        rows = df
+        if estimate_tokens(text) > per_section:
+            row_tokens = max(1, estimate_tokens(text) // max(1, len(df)))
+            keep = max(1, per_section // row_tokens)
+            rows = df.head(keep)
+            text = _render_rows(rows[columns]) + f"\n... (แสดง {keep} จาก {len(df)} รายการ)"
+        context[key] = text
+        context['columns'][table] = columns
+        context['full_tokens'] += _padded_tokens(rows[columns])
+    context.setdefault('dishes_data', "ไม่มีข้อมูล")
+    context.setdefault('ingredients_data', "ไม่มีข้อมูล")
+    context['recipe_data'] = "ไม่ได้แนบ (ไม่พบชื่ออาหารหรือวัตถุดิบในคำถาม)"
+    if dataframes.get('cooking_steps_df') is not None:
+        context['cooking_steps_data'] = "ไม่ได้แนบ (ไม่พบชื่ออาหารหรือวัตถุดิบในคำถาม)"
+    return context
+
+# Function to build prompt context limited to rows relevant to the question
+# context_cache: RetrievalContextCache ที่ใช้ร่วมกันระหว่างคำถามที่อ้างถึงแถวเดียวกัน (เช่น ตอนประมวลผลเป็นชุด)
+# columns: คอลัมน์ที่คำถามต้องใช้ (food_schema.select_columns) None = ทุกคอลัมน์
+def build_retrieval_context(question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, context_cache=None, columns=None):
+    if context_cache is not None:
+        return context_cache.get(question, dataframes, token_budget, columns)
+    dish_ids, ingredient_ids = find_relevant_ids(question, dataframes)
+    return build_context_for_ids(dish_ids, ingredient_ids, dataframes, token_budget, columns)
+
+# Function to build prompt context from already matched dish/ingredient ids
+# context['columns'] = คอลัมน์ที่แนบจริงของแต่ละตาราง, context['full_tokens'] = ขนาดโดยประมาณถ้าแนบทุกคอลัมน์แบบตาราง
+def build_context_for_ids(dish_ids, ingredient_ids, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, columns=None):
+    dishes_df = dataframes.get('dishes_df')
+    ingredients_df = dataframes.get('ingredients_df')
+    recipe_df = dataframes.get('recipe_df')
+    cooking_steps_df = dataframes.get('cooking_steps_df')
+    aggregates_df = dataframes.get('aggregates_df')
+    if cooking_steps_df is not None and 'dish_id' not in cooking_steps_df.columns:
+        cooking_steps_df = None
+
+    dish_ids = list(dish_ids)
+    ingredient_ids = list(ingredient_ids)
+    if not dish_ids and not ingredient_ids:
+        return build_summary_context(dataframes, token_budget), False
+
+    # เพิ่มอาหารทีละจานตามลำดับความเกี่ยวข้องจนกว่าจะเต็มงบประมาณ token (นับเฉพาะคอลัมน์ที่แนบจริง)
+    # ประมาณขนาดจากความยาวของแต่ละแถว ทีละชุดของอาหาร แทนการ render และค้นทั้งตารางทีละจาน
+    selected = []
+    included_ingredients = set(ingredient_ids)
+    used_chars = 0
+    if ingredients_df is not None and ingredient_ids:
+        used_chars += sum(_row_chars(ingredients_df[ingredients_df['ingredient_id'].isin(ingredient_ids)], 'ingredient_id', 'ingredients_df', columns).values())
+    full = False
+    for start in range(0, len(dish_ids), BUDGET_CHUNK_SIZE):
+        chunk = dish_ids[start:start + BUDGET_CHUNK_SIZE]
+        dish_chars = {}
+        if dishes_df is not None:
+            dish_chars = _row_chars(dishes_df[dishes_df['dish_id'].isin(chunk)], 'dish_id', 'dishes_df', columns)
+        recipe_chars, dish_ingredients, ingredient_chars = {}, {}, {}
+        if recipe_df is not None:
+            chunk_recipe = recipe_df[recipe_df['dish_id'].isin(chunk)]
+            recipe_chars = _row_chars(chunk_recipe, 'dish_id', 'recipe_df', columns)
+            for dish_id, ingredient_id in zip(chunk_recipe['dish_id'], chunk_recipe['ingredient_id']):
+                dish_ingredients.setdefault(dish_id, set()).add(ingredient_id)
+            if ingredients_df is not None:
+                ingredient_chars = _row_chars(ingredients_df[ingredients_df['ingredient_id'].isin(chunk_recipe['ingredient_id'])], 'ingredient_id', 'ingredients_df', columns)
+        steps_chars, aggregate_chars = {}, {}
+        if cooking_steps_df is not None:
+            steps_chars = _row_chars(cooking_steps_df[cooking_steps_df['dish_id'].isin(chunk)], 'dish_id', 'cooking_steps_df', columns)
+        if aggregates_df is not None:
+            aggregate_chars = _row_chars(aggregates_df[aggregates_df['dish_id'].isin(chunk)], 'dish_id', 'aggregates_df', columns)
+        for dish_id in chunk:
+            new_ingredients = dish_ingredients.get(dish_id, set()) - included_ingredients
+            cost = dish_chars.get(dish_id, 0) + recipe_chars.get(dish_id, 0) + steps_chars.get(dish_id, 0) + aggregate_chars.get(dish_id, 0)
+            cost += sum(ingredient_chars.get(ingredient_id, 0) for ingredient_id in new_ingredients)
+            if selected and (used_chars + cost) // CHARS_PER_TOKEN > token_budget:
+                full = True
+                break
+            selected.append(dish_id)
+            included_ingredients |= new_ingredients
+            used_chars += cost
+        if full:
+            break
+
+    context = {'columns': {}, 'full_tokens': 0}
+    recipe_rows = None
+    if recipe_df is not None:
+        recipe_rows = recipe_df[recipe_df['dish_id'].isin(selected)]
+        _add_section(context, 'recipe_data', 'recipe_df', recipe_rows, columns)
+    else:
+        context['recipe_data'] = "ไม่มีข้อมูล"
+
+    if dishes_df is not None:
+        _add_section(context, 'dishes_data', 'dishes_df', dishes_df[dishes_df['dish_id'].isin(selected)], columns)
+    else:
+        context['dishes_data'] = "ไม่มีข้อมูล"
+
+    # วัตถุดิบ = วัตถุดิบในสูตรของอาหารที่เลือก + วัตถุดิบที่ถูกถามถึงโดยตรง
+    wanted = list(ingredient_ids)
+    if recipe_rows is not None:
+        wanted += list(recipe_rows['ingredient_id'].unique())
+    if ingredients_df is not None:
+        _add_section(context, 'ingredients_data', 'ingredients_df', ingredients_df[ingredients_df['ingredient_id'].isin(wanted)], columns)
+    else:
+        context['ingredients_data'] = "ไม่มีข้อมูล"
+
+    if aggregates_df is not None:
+        _add_section(context, 'aggregates_data', 'aggregates_df', aggregates_df[aggregates_df['dish_id'].isin(selected)], columns)
+
+    if cooking_steps_df is not None:
+        _add_section(context, 'cooking_steps_data', 'cooking_steps_df', cooking_steps_df[cooking_steps_df['dish_id'].isin(selected)], columns)
+    elif dataframes.get('cooking_steps_df') is not None:
+        context['cooking_steps_data'] = "ไม่มีข้อมูล"
+
+    if len(selected) < len(dish_ids):
+        context['dishes_data'] += f"\n... (แสดง {len(selected)} จาก {len(dish_ids)} รายการที่เกี่ยวข้อง เนื่องจากจำกัดขนาดข้อมูล)"
+
+    return context, True
+
+# Retrieval contexts keyed by the matched ids, so questions about the same rows render the context once
+# ใช้กับ dataframes ชุดเดียวตลอดอายุของ cache (สร้างใหม่เมื่อข้อมูลเปลี่ยน)
+class RetrievalContextCache:
+    def __init__(self):
+        self.builds = 0
+        self.hits = 0
+        self._ids = {}
+        self._contexts = {}
+        self._lock = threading.Lock()
+
+    # Function to get the group key of a question: the rows its context is built from
+    # columns อยู่ใน key ด้วย คำถามที่แถวเดียวกันแต่ใช้คอลัมน์ต่างกันจึงเป็นคนละกลุ่ม
+    def group_key(self, question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, columns=None):
+        with self._lock:
+            ids = self._ids.get(question)
+        if ids is None:
+            dish_ids, ingredient_ids = find_relevant_ids(question, dataframes)
+            ids = (tuple(dish_ids), tuple(ingredient_ids))
+            with self._lock:
+                self._ids[question] = ids
+        return ids + (token_budget, _columns_key(columns))
+
+    def get(self, question, dataframes, token_budget=DEFAULT_TOKEN_BUDGET, columns=None):
+        key = self.group_key(question, dataframes, token_budget, columns)
+        with self._lock:
+            entry = self._contexts.get(key)
+            if entry is None:
+                entry = self._contexts[key] = [threading.Lock(), None]
+        # คำถามในกลุ่มเดียวกันที่มาพร้อมกันรอให้ thread แรกสร้างเสร็จ ไม่สร้างซ้ำ
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = build_context_for_ids(key[0], key[1], dataframes, token_budget, columns)
+                self.builds += 1
+            else:
+                self.hits += 1
+        return entry[1]
+
+    # Function to drop the context of a group once every question in it has been answered
+    def release(self, key):
+        with self._lock:
+            self._contexts.pop(key, None)
@@ -0,0 +1,111 @@
+import pandas as pd
+
+from food_query_engine import CALORIE_KEYWORDS, COST_KEYWORDS, INGREDIENT_KEYWORDS, STEP_KEYWORDS
+from food_retrieval import normalize_text
+from identity_memo import IdentityMemo
+
+# คอลัมน์ที่แนบเสมอเมื่อเลือกคอลัมน์ตามคำถาม (ใช้เชื่อมตารางและบอกชื่อ) ค่าว่าง = ไม่แนบตารางนั้น
+KEY_COLUMNS = {
+    'dishes_df': ('dish_id', 'dish_name', 'dish_type', 'region'),
+    'ingredients_df': ('ingredient_id', 'ingredient_name'),
+    'recipe_df': ('dish_id', 'ingredient_id', 'amount', 'unit'),
+    'aggregates_df': ('dish_id', 'dish_name'),
+    'cooking_steps_df': (),
+}
+
+# คำสำคัญในคำถาม -> คอลัมน์ที่ต้องแนบเพิ่ม (None = ทุกคอลัมน์ของตารางนั้น)
+TOPIC_COLUMNS = (
+    (CALORIE_KEYWORDS, {'ingredients_df': ('calories_per_100g',), 'recipe_df': ('grams',), 'aggregates_df': ('total_calories', 'total_grams', 'unconverted_count')}),
+    (COST_KEYWORDS + ('ถูก', 'แพง', 'ประหยัด'), {'ingredients_df': ('price_per_unit', 'unit'), 'recipe_df': ('grams', 'purchase_units'), 'aggregates_df': ('estimated_cost', 'unconverted_count', 'uncosted_count')}),
+    (INGREDIENT_KEYWORDS, {'ingredients_df': ('category',), 'recipe_df': ('notes',)}),
+    (STEP_KEYWORDS, {'recipe_df': ('notes',), 'cooking_steps_df': None}),
+    (('เผ็ด',), {'dishes_df': ('spicy_level',)}),
+    (('นาน', 'เวลา', 'นาที', 'เร็ว'), {'dishes_df': ('cooking_time_minutes',)}),
+    (('ยาก', 'ง่าย', 'มือใหม่'), {'dishes_df': ('difficulty_level',)}),
+    (('เก็บ', 'อายุ'), {'ingredients_df': ('shelf_life_days',)}),
+    (('แหล่ง', 'ที่มา', 'ซื้อ'), {'ingredients_df': ('source',)}),
+    (('คืออะไร', 'อธิบาย', 'รสชาติ', 'แนะนำ', 'เป็นยังไง', 'เป็นอย่างไร'), {'dishes_df': ('description',)}),
+)
+
+# คำอธิบายคอลัมน์ที่คำนวณตอนโหลด (ไม่มีในไฟล์ data dictionary)
+DERIVED_DESCRIPTIONS = (
+    ('recipe_df', 'amount_value', "ปริมาณเป็นตัวเลข"),
+    ('recipe_df', 'grams', "ปริมาณแปลงเป็นกรัมแล้ว (ว่าง = แปลงหน่วยไม่ได้)"),
+    ('recipe_df', 'purchase_units', "สัดส่วนของหน่วยที่ซื้อใน ingredients_df ต้นทุน = purchase_units * price_per_unit"),
+)
+
+# Function to map a CSV filename to the table name used in the prompt (None = not a known table)
+def table_for_file(filename):
+    name = str(filename).lower()
+    if 'thai_dishes' in name:
+        return 'dishes_df'
+    if 'ingredients' in name and 'recipe' not in name:
+        return 'ingredients_df'
+    if 'recipe' in name:
+        return 'recipe_df'
+    if 'cooking' in name or 'steps' in name:
+        return 'cooking_steps_df'
+    return None
+
+# Function to pick the columns a question needs, from the keywords it contains
+# คืนค่า {table: (columns...) หรือ None} ; คืน None เมื่อไม่พบคำสำคัญ (แนบทุกคอลัมน์)
+def select_columns(question):
+    text = normalize_text(question)
+    columns = None
+    for keywords, topic in TOPIC_COLUMNS:
+        if not any(keyword in text for keyword in keywords):
+            continue
+        if columns is None:
+            columns = dict(KEY_COLUMNS)
+        for table, extra in topic.items():
+            if extra is None or columns[table] is None:
+                columns[table] = None
+            else:
+                columns[table] = columns[table] + tuple(c for c in extra if c not in columns[table])
+    return columns
+
+# จำผลของ combine_data_dicts / schema_header ไว้ (สร้างครั้งเดียวต่อ data dictionary ชุดเดิม)
+_schema_memo = IdentityMemo(64)
+
+# Function to combine the data dictionary files into one table: table, field_name, description
+# คืน None เมื่อไม่มี data dictionary ที่ใช้ได้
+def combine_data_dicts(data_dicts):
+    if not data_dicts:
+        return None
+    items = sorted(data_dicts.items())
+    sources = tuple(df for _, df in items)
+
+    def build():
+        frames = []
+        for filename, df in items:
+            table = table_for_file(filename)
+            if table is None or 'field_name' not in df.columns or 'description' not in df.columns:
+                continue
+            frame = df[['field_name', 'description']].dropna()
+            frames.append(frame.assign(table=table)[['table', 'field_name', 'description']])
+        if not frames:
+            return None
+        frames.append(pd.DataFrame(list(DERIVED_DESCRIPTIONS), columns=['table', 'field_name', 'description']))
+        return pd.concat(frames, ignore_index=True)
+
+    return _schema_memo.get(sources, build, key=('data_dicts',) + tuple(filename for filename, _ in items))
+
+# Function to build the compact schema header for the columns actually attached to the prompt
+# columns: {table: [column, ...]} จาก context['columns'] ; คอลัมน์ที่ไม่มีใน data dictionary ไม่ต้องอธิบาย
+def schema_header(data_dict_df, columns):
+    if data_dict_df is None or not columns:
+        return ""
+    frozen = tuple(sorted((table, tuple(cols)) for table, cols in columns.items()))
+
+    def build():
+        descriptions = {}
+        for table, field, description in zip(data_dict_df['table'], data_dict_df['field_name'], data_dict_df['description']):
+            descriptions[(table, str(field).strip())] = str(description).strip()
+        lines = []
+        for table, cols in frozen:
+            described = [f"{col}={descriptions[(table, col)]}" for col in cols if (table, col) in descriptions]
+            if described:
+                lines.append(f"{table}: " + "; ".join(described))
+        return "\n".join(lines)
+
+    return _schema_memo.get([data_dict_df], build, key=('header', frozen))
@@ -0,0 +1,106 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import pandas as pd
+
+from food_data_store import DATA_DICT_DIR, DATABASE_DIR, file_signature, read_table
+
+# โฟลเดอร์เก็บ snapshot แบบ columnar (Parquet) ของไฟล์ CSV
+SNAPSHOT_DIR = os.path.join("csv", "snapshot")
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Function to check whether Parquet support (pyarrow) is installed
+def snapshot_supported():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+# Function to build manifest key of a CSV (path relative to the snapshot folder)
+def _manifest_key(csv_path, snapshot_dir):
+    return os.path.relpath(os.path.abspath(csv_path), os.path.abspath(snapshot_dir)).replace(os.sep, '/')
+
+# Function to read the snapshot manifest (empty dict when there is none)
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+# Function to compile csv/database and csv/data_dict into a typed Parquet snapshot with a schema manifest
+def compile_snapshot(database_dir=DATABASE_DIR, data_dict_dir=DATA_DICT_DIR, snapshot_dir=SNAPSHOT_DIR):
+    if not snapshot_supported():
+        raise RuntimeError("ต้องติดตั้ง pyarrow เพื่อสร้าง snapshot แบบ Parquet")
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tables = {}
+    for directory, is_dict in ((data_dict_dir, True), (database_dir, False)):
+        for csv_path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            signature = file_signature(csv_path)
+            df = read_table(csv_path, dtypes='str' if is_dict else None)
+            group = os.path.basename(os.path.normpath(directory))
+            parquet_name = f"{group}__{os.path.splitext(os.path.basename(csv_path))[0]}.parquet"
+            df.to_parquet(os.path.join(snapshot_dir, parquet_name), index=False)
+            tables[_manifest_key(csv_path, snapshot_dir)] = {
+                'parquet': parquet_name,
+                'rows': int(len(df)),
+                'columns': {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+                'source_mtime_ns': signature[0],
+                'source_size': signature[1],
+            }
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': time.time(),
+        'tables': tables,
+    }
+    # เขียนไฟล์ชั่วคราวก่อนแล้วค่อยแทนที่ เพื่อไม่ให้ตัวโหลดอ่าน manifest ที่เขียนไม่ครบ
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_path)
+    return manifest
+
+# Function to read a table from the snapshot if it is up to date with its CSV (None otherwise)
+def read_snapshot_table(csv_path, manifest, snapshot_dir=SNAPSHOT_DIR):
+    entry = manifest.get('tables', {}).get(_manifest_key(csv_path, snapshot_dir)) if manifest else None
+    if entry is None:
+        return None
+    parquet_path = os.path.join(snapshot_dir, entry['parquet'])
+    try:
+        signature = file_signature(csv_path)
+        # ใช้ snapshot เฉพาะเมื่อ CSV ไม่ถูกแก้ไขหลังจากสร้าง snapshot
+        if (signature[0], signature[1]) != (entry['source_mtime_ns'], entry['source_size']):
+            return None
+        if os.stat(parquet_path).st_mtime_ns < signature[0]:
+            return None
+        return pd.read_parquet(parquet_path)
+    except (OSError, ValueError, ImportError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="สร้าง snapshot แบบ Parquet จากไฟล์ CSV ของฐานข้อมูลอาหารไทย")
+    parser.add_argument("--database-dir", default=DATABASE_DIR)
+    parser.add_argument("--data-dict-dir", default=DATA_DICT_DIR)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    manifest = compile_snapshot(args.database_dir, args.data_dict_dir, args.snapshot_dir)
+    elapsed = time.perf_counter() - started
+    for csv_path, entry in manifest['tables'].items():
+        print(f"{csv_path} -> {entry['parquet']} ({entry['rows']} แถว)")
+    print(f"สร้าง snapshot เสร็จใน {elapsed:.2f} วินาที")
@@ -0,0 +1,313 @@
+import time
+
+import pandas as pd
+
+from food_aggregates import compute_dish_aggregates
+from food_ingredient_index import get_ingredient_index
+from food_query_engine import RECIPE_SERVINGS
+from food_retrieval import estimate_tokens, normalize_text
+from food_units import QUANTITY_COLUMNS, normalize_recipe
+from identity_memo import IdentityMemo
+from request_metrics import usage_counts
+
+# จำนวนครั้งที่โมเดลเรียกเครื่องมือได้สูงสุดต่อคำถาม (ครบแล้วต้องตอบจากผลที่ได้)
+DEFAULT_MAX_TOOL_CALLS = 6
+
+# จำนวนรายการสูงสุดที่เครื่องมือคืนต่อครั้ง (ผลลัพธ์มีขนาดคงที่ไม่ว่าฐานข้อมูลจะใหญ่แค่ไหน)
+TOOL_RESULT_LIMIT = 10
+
+# คำอธิบายเครื่องมือสำหรับ function calling ของ Gemini (JSON schema)
+TOOL_DECLARATIONS = [
+    {
+        'name': 'find_dish',
+        'description': "ค้นหาอาหารจากชื่อ (ตรงทั้งชื่อหรือบางส่วน) คืน dish_id, dish_name, dish_type, region",
+        'parameters': {
+            'type': 'object',
+            'properties': {'name': {'type': 'string', 'description': "ชื่ออาหารหรือบางส่วนของชื่อ เช่น ผัดไทย"}},
+            'required': ['name'],
+        },
+    },
+    {
+        'name': 'list_ingredients',
+        'description': "รายการวัตถุดิบของอาหารหนึ่งจาน พร้อมปริมาณ หน่วย ปริมาณเป็นกรัม (grams) สัดส่วนของหน่วยที่ซื้อ (purchase_units) และหมายเหตุ ปรับตามจำนวนที่",
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'dish_id': {'type': 'string', 'description': "dish_id จาก find_dish"},
+                'servings': {'type': 'integer', 'description': "จำนวนที่ (ไม่ระบุ = ทั้งสูตร %d ที่)" % RECIPE_SERVINGS},
+            },
+            'required': ['dish_id'],
+        },
+    },
+    {
+        'name': 'dish_totals',
+        'description': "แคลอรี่รวม (kcal) และต้นทุนวัตถุดิบ (บาท) ของอาหารหนึ่งจาน ปรับตามจำนวนที่ (uncosted_count > 0 = ต้นทุนยังไม่รวมวัตถุดิบบางรายการ)",
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'dish_id': {'type': 'string', 'description': "dish_id จาก find_dish"},
+                'servings': {'type': 'integer', 'description': "จำนวนที่ (ไม่ระบุ = ทั้งสูตร %d ที่)" % RECIPE_SERVINGS},
+            },
+            'required': ['dish_id'],
+        },
+    },
+    {
+        'name': 'search_by_ingredient',
+        'description': "ค้นหาอาหารที่ใช้วัตถุดิบที่ระบุ เรียงจากใช้วัตถุดิบที่ระบุมากที่สุด",
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'ingredients': {'type': 'array', 'items': {'type': 'string'}, 'description': "ชื่อวัตถุดิบที่มี"},
+                'exclude': {'type': 'array', 'items': {'type': 'string'}, 'description': "ชื่อวัตถุดิบที่ต้องไม่มีในสูตร"},
+            },
+            'required': ['ingredients'],
+        },
+    },
+]
+
+# prompt ของโหมด function calling: ไม่แนบข้อมูลตาราง ขนาดคงที่ไม่ขึ้นกับจำนวนอาหารในฐานข้อมูล
+TOOL_PROMPT = """
+คุณเป็นผู้เชี่ยวชาญด้านอาหารไทย ตอบคำถามโดยใช้ข้อมูลจากฐานข้อมูลผ่านเครื่องมือที่มีให้
+- ใช้ find_dish เพื่อหา dish_id ก่อนเรียกเครื่องมืออื่นที่ต้องใช้ dish_id
+- คำถามเรื่องแคลอรี่หรือราคา ให้ใช้ dish_totals และบอกจำนวนที่ที่ใช้คำนวณ
+- ถ้าเครื่องมือไม่พบข้อมูล ให้บอกอย่างสุภาพว่าไม่มีข้อมูลในฐานข้อมูล ห้ามเดาตัวเลข
+- ตอบเป็นภาษาไทย อ่านง่าย มีหัวข้อและย่อหน้าอย่างเหมาะสม
+
+{conversation_section}คำถาม: {question}
+"""
+
+# จำชื่อที่ normalize แล้วของแต่ละตาราง (สร้างครั้งเดียวต่อ DataFrame)
+_names_memo = IdentityMemo(8)
+
+# Function to get the normalized names of a table column, computed once per dataframe
+def _normalized_names(df, column):
+    return _names_memo.get([df], lambda: df[column].astype(str).str.replace(r"\s+", "", regex=True).str.lower(), key=column)
+
+# Function to select the rows whose id column holds one of the given ids
+# โมเดลส่ง id เป็นข้อความเสมอ แต่ข้อมูลตัวอย่างใช้ id เป็นตัวเลข จึงแปลง id เป็นชนิดของคอลัมน์ก่อนเทียบ
+def _id_mask(series, ids):
+    dtype = series.cat.categories.dtype if isinstance(series.dtype, pd.CategoricalDtype) else series.dtype
+    if pd.api.types.is_numeric_dtype(dtype):
+        ids = pd.to_numeric(pd.Series([str(i) for i in ids], dtype='object'), errors='coerce').dropna()
+    else:
+        ids = [str(i) for i in ids]
+    return series.isin(ids)
+
+# Function to convert a pandas/numpy value into a plain JSON value for a function response
+def _plain(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+# Function to convert function call arguments (proto MapComposite / RepeatedComposite) into plain Python values
+def _plain_args(value):
+    if hasattr(value, 'items'):
+        return {str(key): _plain_args(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) or (hasattr(value, '__iter__') and not isinstance(value, (str, bytes))):
+        return [_plain_args(item) for item in value]
+    return value
+
+# Typed query functions over the loaded dataframes, called by the model through function calling
+class FoodTools:
+    def __init__(self, dataframes):
+        self.dataframes = dataframes
+        self.calls = []
+
+    def _table(self, key):
+        df = self.dataframes.get(key)
+        if df is None:
+            raise ValueError(f"ไม่มีตาราง {key}")
+        return df
+
+    # Function to find dishes by (part of) their name; exact matches first
+    def find_dish(self, name):
+        dishes_df = self._table('dishes_df')
+        text = normalize_text(name)
+        if not text:
+            raise ValueError("ต้องระบุชื่ออาหาร")
+        names = _normalized_names(dishes_df, 'dish_name')
+        exact = names == text
+        rows = dishes_df[exact] if exact.any() else dishes_df[names.str.contains(text, regex=False)]
+        columns = [c for c in ('dish_id', 'dish_name', 'dish_type', 'region') if c in rows.columns]
+        found = [{c: _plain(v) for c, v in zip(columns, row)} for row in rows[columns].head(TOOL_RESULT_LIMIT).itertuples(index=False)]
+        return {'dishes': found, 'total_matches': int(len(rows))}
+
+    # Function to list the ingredients of one dish with amounts, scaled to the given servings
+    def list_ingredients(self, dish_id, servings=None):
+        recipe_df = normalize_recipe(self._table('recipe_df'), self._table('ingredients_df'))
+        ingredients_df = self._table('ingredients_df')
+        servings = int(servings) if servings else RECIPE_SERVINGS
+        if servings <= 0:
+            raise ValueError("จำนวนที่ต้องมากกว่า 0")
+        rows = recipe_df[_id_mask(recipe_df['dish_id'], [dish_id])]
+        if rows.empty:
+            return {'dish_id': str(dish_id), 'ingredients': [], 'servings': servings}
+        rows = rows.merge(ingredients_df[['ingredient_id', 'ingredient_name']], on='ingredient_id', how='left')
+        if servings != RECIPE_SERVINGS:
+            # ปริมาณที่แปลงไว้ตอนโหลดปรับตามจำนวนที่ด้วยการคูณครั้งเดียว
+            scaled = rows[list(QUANTITY_COLUMNS)].to_numpy(dtype='float64') * (servings / RECIPE_SERVINGS)
+            rows = rows.assign(**{c: scaled[:, i] for i, c in enumerate(QUANTITY_COLUMNS)})
+            # เขียน amount ใหม่จากค่าที่ปรับแล้ว ไม่ให้โมเดลเห็นปริมาณสองค่าที่ไม่ตรงกัน (ข้อความที่ไม่ใช่ตัวเลข เช่น "ตามชอบ" คงไว้)
+            rows = rows.assign(amount=[
+                amount if pd.isna(value) else f"{round(value, 2):g}"
+                for amount, value in zip(rows['amount'], rows['amount_value'])
+            ])
+        columns = [c for c in ('ingredient_id', 'ingredient_name', 'amount', 'unit') + QUANTITY_COLUMNS + ('notes',) if c in rows.columns]
+        items = [{c: _plain(v) for c, v in zip(columns, row)} for row in rows[columns].itertuples(index=False)]
+        return {'dish_id': str(dish_id), 'ingredients': items, 'servings': servings}
+
+    # Function to compute total calories and ingredient cost of one dish, scaled to the given servings
+    def dish_totals(self, dish_id, servings=None):
+        dish_id = str(dish_id)
+        aggregates_df = self.dataframes.get('aggregates_df')
+        if aggregates_df is not None:
+            rows = aggregates_df[_id_mask(aggregates_df['dish_id'], [dish_id])]
+        else:
+            dishes_df = self._table('dishes_df')
+            recipe_df = self._table('recipe_df')
+            rows = compute_dish_aggregates(dishes_df[_id_mask(dishes_df['dish_id'], [dish_id])], self._table('ingredients_df'), recipe_df[_id_mask(recipe_df['dish_id'], [dish_id])])
+        if rows.empty:
+            return {'dish_id': dish_id, 'error': "ไม่พบอาหารนี้"}
+        row = rows.iloc[0]
+        servings = int(servings) if servings else RECIPE_SERVINGS
+        if servings <= 0:
+            raise ValueError("จำนวนที่ต้องมากกว่า 0")
+        factor = servings / RECIPE_SERVINGS
+        return {
+            'dish_id': dish_id,
+            'dish_name': _plain(row['dish_name']),
+            'servings': servings,
+            'total_calories': _plain(row['total_calories'] * factor),
+            'estimated_cost': _plain(row['estimated_cost'] * factor),
+            'unconverted_count': _plain(row['unconverted_count']),
+            # มากกว่า 0 = estimated_cost ยังไม่รวมวัตถุดิบที่คิดต้นทุนไม่ได้
+            'uncosted_count': _plain(row.get('uncosted_count', 0)),
+        }
+
+    def _ingredient_ids(self, names):
+        ingredients_df = self._table('ingredients_df')
+        names_index = _normalized_names(ingredients_df, 'ingredient_name')
+        ids, unknown = [], []
+        for name in names:
+            text = normalize_text(name)
+            matched = ingredients_df.loc[names_index == text, 'ingredient_id'] if text else []
+            if not len(matched) and text:
+                matched = ingredients_df.loc[names_index.str.contains(text, regex=False), 'ingredient_id']
+            if len(matched):
+                ids += [str(i) for i in matched]
+            else:
+                unknown.append(str(name))
+        return ids, unknown
+
+    # Function to search dishes that use the given ingredients (and none of the excluded ones)
+    def search_by_ingredient(self, ingredients, exclude=None):
+        if isinstance(ingredients, str):
+            ingredients = [ingredients]
+        if not ingredients:
+            raise ValueError("ต้องระบุวัตถุดิบอย่างน้อยหนึ่งอย่าง")
+        index = get_ingredient_index(self._table('recipe_df'))
+        if index is None:
+            raise ValueError("ไม่มีข้อมูลส่วนผสม")
+        have, unknown = self._ingredient_ids(ingredients)
+        none_of, _ = self._ingredient_ids(exclude or [])
+        ranked = index.best_matches(have, none_of=none_of, limit=TOOL_RESULT_LIMIT) if have else []
+        dishes_df = self._table('dishes_df')
+        rows = dishes_df[_id_mask(dishes_df['dish_id'], [dish_id for dish_id, _, _ in ranked])]
+        names = dict(zip(rows['dish_id'].astype(str), rows['dish_name']))
+        dishes = [
+            {'dish_id': dish_id, 'dish_name': _plain(names.get(dish_id)), 'matched_ingredients': matched, 'missing_ingredients': missing}
+            for dish_id, matched, missing in ranked
+        ]
+        return {'dishes': dishes, 'unknown_ingredients': unknown}
+
+    # Function to run one tool call by name; errors are returned to the model instead of raised
+    def call(self, name, args):
+        self.calls.append(name)
+        functions = {
+            'find_dish': self.find_dish,
+            'list_ingredients': self.list_ingredients,
+            'dish_totals': self.dish_totals,
+            'search_by_ingredient': self.search_by_ingredient,
+        }
+        if name not in functions:
+            return {'error': f"ไม่มีเครื่องมือชื่อ {name}"}
+        try:
+            return functions[name](**_plain_args(args or {}))
+        except (TypeError, ValueError, KeyError) as e:
+            return {'error': str(e)}
+
+# Function to read the function calls of a model response as [(name, args)]
+def _function_calls(response):
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return []
+    calls = []
+    for part in candidates[0].content.parts:
+        function_call = getattr(part, 'function_call', None)
+        if function_call is not None and function_call.name:
+            calls.append((function_call.name, function_call.args))
+    return calls
+
+# Function to read the text of a model response (the SDK's response.text raises when a part is a function call)
+def _response_text(response):
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return response.text
+    return "".join(getattr(part, 'text', '') or '' for part in candidates[0].content.parts)
+
+# Function to answer a question by letting the model call FoodTools, at most max_tool_calls times
+# timings จะถูกเติมขนาด prompt, api_ms (รวมทุกรอบ), tool_calls, model_turns และ token ที่ Gemini รายงาน (รวมทุกรอบ)
+def run_tool_loop(model, question, dataframes, conversation=None, timings=None, max_tool_calls=DEFAULT_MAX_TOOL_CALLS):
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    conversation_section = ""
+    if conversation:
+        conversation_section = "บทสนทนาก่อนหน้า (ใช้เพื่อเข้าใจคำถามที่ต่อเนื่องจากคำถามก่อน):\n" + conversation + "\n\n"
+    prompt = TOOL_PROMPT.format(conversation_section=conversation_section, question=question)
+    timings['prompt_build_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    timings['prompt_chars'] = len(prompt)
+    timings['prompt_tokens'] = estimate_tokens(prompt)
+
+    tools = FoodTools(dataframes)
+    contents = [{'role': 'user', 'parts': [prompt]}]
+    api_ms = 0.0
+    turns = 0
+    usage = {}
+    while True:
+        # ครบจำนวนครั้งแล้ว บังคับให้โมเดลตอบจากผลที่ได้ (ไม่เรียกเครื่องมือเพิ่ม)
+        mode = 'AUTO' if len(tools.calls) < max_tool_calls else 'NONE'
+        call_started = time.perf_counter()
+        response = model.generate_content(
+            contents,
+            tools=[{'function_declarations': TOOL_DECLARATIONS}],
+            tool_config={'function_calling_config': {'mode': mode}}
+        )
+        api_ms += (time.perf_counter() - call_started) * 1000
+        turns += 1
+        for key, value in usage_counts(response).items():
+            usage[key] = usage.get(key, 0) + value
+        function_calls = _function_calls(response)
+        if not function_calls or mode == 'NONE':
+            break
+        contents.append(response.candidates[0].content)
+        parts = []
+        for name, args in function_calls:
+            if len(tools.calls) < max_tool_calls:
+                result = tools.call(name, args)
+            else:
+                result = {'error': "เรียกเครื่องมือครบจำนวนครั้งแล้ว กรุณาตอบจากข้อมูลที่มี"}
+            # ทุก function call ต้องมี function response คู่กัน
+            parts.append({'function_response': {'name': name, 'response': result}})
+        contents.append({'role': 'user', 'parts': parts})
+
+    timings['api_ms'] = round(api_ms, 1)
+    timings['tool_calls'] = len(tools.calls)
+    timings['model_turns'] = turns
+    timings.update(usage)
+    return _response_text(response)
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from identity_memo import IdentityMemo
+
+# ตารางแปลงหน่วยในสูตรอาหารเป็นกรัม (ค่าประมาณสำหรับวัตถุดิบทั่วไป ของเหลวถือว่า 1 มล. = 1 กรัม)
+UNIT_TO_GRAMS = {
+    'กรัม': 1.0,
+    'กิโลกรัม': 1000.0,
+    'มิลลิลิตร': 1.0,
+    'มล.': 1.0,
+    'ลิตร': 1000.0,
+    'ช้อนโต๊ะ': 15.0,
+    'ช้อนชา': 5.0,
+    'ถ้วย': 240.0,
+    'กลีบ': 5.0,
+    'เม็ด': 1.0,
+    'ใบ': 0.5,
+    'ต้น': 20.0,
+    'แว่น': 5.0,
+    'ราก': 5.0,
+    'ดอก': 0.5,
+    'ชิ้น': 5.0,
+    'กำมือ': 20.0,
+    'หัว': 30.0,
+    'ลูก': 50.0,
+    'ฟอง': 50.0,
+    'ตัว': 250.0,
+    'ซอง': 10.0,
+}
+
+# หน่วยที่ใช้ซื้อวัตถุดิบ (ingredients.csv) ที่ไม่มีตัวเลขปริมาณกำกับ
+PURCHASE_UNIT_GRAMS = {
+    'กิโลกรัม': 1000.0,
+    'กรัม': 1.0,
+    'ลิตร': 1000.0,
+    'มิลลิลิตร': 1.0,
+    'ฟอง': 50.0,
+    'ซอง': 10.0,
+}
+
+# หน่วยปริมาตร/น้ำหนักที่อาจอยู่ในชื่อหน่วยซื้อ เช่น "ขวด 700 มล.", "ขวด 1 ลิตร"
+_PACKAGE_PATTERN = r'(\d+(?:\.\d+)?)\s*(กิโลกรัม|กก\.?|กรัม|ลิตร|มิลลิลิตร|มล\.?)'
+_PACKAGE_FACTORS = {
+    'กิโลกรัม': 1000.0,
+    'กก.': 1000.0,
+    'กก': 1000.0,
+    'กรัม': 1.0,
+    'ลิตร': 1000.0,
+    'มิลลิลิตร': 1.0,
+    'มล.': 1.0,
+    'มล': 1.0,
+}
+
+# Function to apply a per-value conversion once per distinct value (units repeat a lot)
+def _map_distinct(values, convert):
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    converted = np.append(np.asarray(convert(pd.Series(uniques, dtype=object)), dtype='float64'), np.nan)
+    # code -1 (ค่าว่าง) ชี้ไปที่ NaN ตัวสุดท้าย
+    return converted[codes]
+
+# Function to parse recipe amounts ("300", "1/2", "1.5") into floats
+def parse_amounts(amounts):
+    amounts = pd.Series(amounts)
+    values = pd.to_numeric(amounts, errors='coerce').astype('float64')
+    missing = values.isna()
+    if missing.any():
+        # รองรับเศษส่วน เช่น 1/2, 1/4
+        fractions = amounts[missing].astype(str).str.extract(r'^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$')
+        numerator = pd.to_numeric(fractions[0], errors='coerce')
+        denominator = pd.to_numeric(fractions[1], errors='coerce').replace(0, np.nan)
+        values[missing] = numerator / denominator
+    return values
+
+# Function to convert recipe amounts with units into grams (NaN when the unit is unknown)
+def amounts_to_grams(amounts, units):
+    return _unit_factors(units) * _map_distinct(amounts, parse_amounts)
+
+# Function to map recipe units to grams per unit (NaN when the unit is unknown)
+def _unit_factors(units):
+    return _map_distinct(units, lambda distinct: distinct.astype(str).str.strip().map(UNIT_TO_GRAMS))
+
+# Function to convert purchase units of ingredients.csv into grams per unit
+def purchase_unit_grams(units):
+    return _map_distinct(units, _purchase_unit_grams)
+
+def _purchase_unit_grams(units):
+    units = units.astype(str).str.strip()
+    grams = units.map(PURCHASE_UNIT_GRAMS).astype('float64')
+    missing = grams.isna()
+    if missing.any():
+        package = units[missing].str.extract(_PACKAGE_PATTERN)
+        size = pd.to_numeric(package[0], errors='coerce')
+        factor = package[1].map(lambda unit: _PACKAGE_FACTORS.get(unit, np.nan) if isinstance(unit, str) else np.nan)
+        grams[missing] = size * factor.astype('float64')
+    return grams.to_numpy()
+
+# คอลัมน์ปริมาณที่เพิ่มให้ตารางสูตรอาหารตอนโหลด (float64 ทุกคอลัมน์, NaN = แปลงไม่ได้)
+# amount_value = ปริมาณเป็นตัวเลข, grams = ปริมาณเป็นกรัม, purchase_units = สัดส่วนของหน่วยที่ซื้อ (ต้นทุน = purchase_units * price_per_unit)
+QUANTITY_COLUMNS = ('amount_value', 'grams', 'purchase_units')
+
+# Function to compute the quantity columns of recipe rows (vectorized, once per distinct amount/unit/ingredient)
+def quantity_columns(recipe_df, ingredients_df=None):
+    amount_value = _map_distinct(recipe_df['amount'], parse_amounts)
+    grams = amount_value * _unit_factors(recipe_df['unit'])
+    purchase_units = np.full(len(recipe_df), np.nan)
+    if ingredients_df is not None and 'unit' in ingredients_df.columns and len(recipe_df):
+        ingredients = ingredients_df[['ingredient_id', 'unit']].drop_duplicates('ingredient_id')
+        unit_grams = pd.Series(purchase_unit_grams(ingredients['unit']), index=ingredients['ingredient_id'].astype(str).to_numpy())
+        per_row = _map_distinct(recipe_df['ingredient_id'], lambda distinct: distinct.astype(str).map(unit_grams))
+        purchase_units = grams / per_row
+    return {'amount_value': amount_value, 'grams': grams, 'purchase_units': purchase_units}
+
+# จำผลของ normalize_recipe ไว้ (ตารางชุดเดิมได้ DataFrame ผลลัพธ์ตัวเดิม ไม่ต้องแปลงซ้ำ)
+_quantity_memo = IdentityMemo(8)
+
+# Function to add the typed quantity columns to a recipe table, once per (recipe, ingredients) pair
+# ตารางที่ได้จากฟังก์ชันนี้ถ้าส่งเข้ามาอีกจะได้ตัวเดิมคืน (reference เดิม ใช้ต่อกับ cache ที่ผูกกับ DataFrame ได้)
+def normalize_recipe(recipe_df, ingredients_df=None):
+    if recipe_df is None or 'amount' not in recipe_df.columns or 'unit' not in recipe_df.columns:
+        return recipe_df
+
+    def build():
+        normalized = recipe_df.assign(**quantity_columns(recipe_df, ingredients_df))
+        _quantity_memo.put([normalized, ingredients_df], normalized)
+        return normalized
+
+    return _quantity_memo.get([recipe_df, ingredients_df], build)
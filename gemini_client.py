@@ -0,0 +1,195 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ค่าเริ่มต้นตามโควตาของ gemini-2.0-flash-lite (ปรับผ่าน secrets ได้)
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+# HTTP status ที่ควรลองใหม่ (rate limit และ server error ชั่วคราว)
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Function to check whether an error from the Gemini SDK is worth retrying
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    for attr in ('code', 'status_code'):
+        code = getattr(error, attr, None)
+        if callable(code):
+            try:
+                code = code()
+            except Exception:
+                code = None
+        if code is not None:
+            try:
+                return int(code) in RETRYABLE_STATUS_CODES
+            except (TypeError, ValueError):
+                pass
+    return False
+
+# Function to compute exponential backoff with full jitter
+def backoff_delay(attempt, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, rng=random.random):
+    return rng() * min(max_delay, base_delay * (2 ** attempt))
+
+# Token bucket shared by every thread; callers reserve a token and sleep until it is available
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        # จอง token ล่วงหน้า (ยอมให้ติดลบ) แล้วคืนเวลาที่ต้องรอ ทำให้คิวเป็นไปตามลำดับที่ขอ
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+# Long-lived Gemini client: bounded concurrency, rate limiting, retries and coalescing of identical prompts.
+# ใช้แทน genai.GenerativeModel ได้โดยตรง (มี generate_content แบบเดียวกัน)
+class GeminiClient:
+    def __init__(
+        self,
+        model,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+        burst=None,
+        max_retries=DEFAULT_MAX_RETRIES,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        sleep=time.sleep
+    ):
+        self.model = model
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst or max_concurrency, sleep=sleep)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini")
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'coalesced': 0, 'errors': 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _retry_or_raise(self, error, attempt):
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count('errors')
+            raise error
+        self._count('retries')
+        self._sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+
+    def _call(self, prompt, **kwargs):
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            self._count('requests')
+            with self._slots:
+                try:
+                    return self.model.generate_content(prompt, **kwargs)
+                except Exception as e:
+                    error = e
+            self._retry_or_raise(error, attempt)
+            attempt += 1
+
+    def _stream(self, prompt):
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            self._count('requests')
+            yielded = False
+            with self._slots:
+                try:
+                    for chunk in self.model.generate_content(prompt, stream=True):
+                        yielded = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    # ลองใหม่ได้เฉพาะเมื่อยังไม่ได้ส่งข้อความส่วนใดให้ผู้ใช้
+                    if yielded:
+                        self._count('errors')
+                        raise
+                    error = e
+            self._retry_or_raise(error, attempt)
+            attempt += 1
+
+    def _forget(self, prompt, future):
+        with self._inflight_lock:
+            if self._inflight.get(prompt) is future:
+                del self._inflight[prompt]
+
+    # Function to submit a prompt; identical prompts already in flight share one request
+    def submit(self, prompt):
+        with self._inflight_lock:
+            future = self._inflight.get(prompt)
+            # future ที่เสร็จแล้วแต่ callback ยังไม่ได้ลบออก ไม่นับว่ายังค้างอยู่
+            if future is not None and not future.done():
+                self._count('coalesced')
+                return future
+            future = self._executor.submit(self._call, prompt)
+            self._inflight[prompt] = future
+        future.add_done_callback(lambda done: self._forget(prompt, done))
+        return future
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            # stream แชร์กันไม่ได้ จึงไม่รวมคำขอที่ซ้ำกัน แต่ยังผ่าน rate limit และ retry
+            return self._stream(prompt)
+        if kwargs:
+            # คำขอแบบ function calling (tools/tool_config) เป็นบทสนทนาหลายรอบ ไม่รวมคำขอที่ซ้ำกัน
+            return self._call(prompt, **kwargs)
+        return self.submit(prompt).result()
+
+    async def generate_content_async(self, prompt):
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+# genai.GenerativeModel created on first use; importing google.generativeai takes about a second
+class LazyGeminiModel:
+    def __init__(self, api_key, model_name):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    # Function to load the SDK in a background thread after the page has rendered, so the first question does not wait
+    def warm_up(self):
+        if self._model is None:
+            threading.Thread(target=self.load, name="gemini-warm-up", daemon=True).start()
+
+    def generate_content(self, prompt, **kwargs):
+        return self.load().generate_content(prompt, **kwargs)
+
+    def start_chat(self, **kwargs):
+        return self.load().start_chat(**kwargs)
@@ -0,0 +1,29 @@
+import time
+
+from request_metrics import usage_counts
+
+# Function to read text of a streamed chunk (chunks that were blocked have no text)
+def chunk_text(chunk):
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+# Function to stream text from a Gemini streaming call while recording timings
+# send: ฟังก์ชันที่ส่ง request และคืน response แบบ stream (เช่น lambda: model.generate_content(prompt, stream=True))
+# timings: dict ที่จะถูกเติม first_token_ms และ total_ms (หน่วยมิลลิวินาที) และจำนวน token ที่ Gemini รายงาน (ถ้ามี)
+def stream_response_text(send, timings):
+    started = time.perf_counter()
+    timings['first_token_ms'] = None
+    try:
+        for chunk in send():
+            # chunk สุดท้ายมี usage_metadata ของทั้งคำตอบ
+            timings.update(usage_counts(chunk))
+            text = chunk_text(chunk)
+            if not text:
+                continue
+            if timings['first_token_ms'] is None:
+                timings['first_token_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            yield text
+    finally:
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
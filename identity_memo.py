@@ -0,0 +1,35 @@
+import threading
+from collections import OrderedDict
+
+# LRU cache of values computed from objects (usually DataFrames), keyed by the objects' identity
+# ใช้แทนการ hash เนื้อหา: DataFrame ชุดเดิม (object เดิม) ได้ผลที่คำนวณไว้แล้วทันที
+class IdentityMemo:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Function to get the value built from the given objects, building it once per set of objects
+    # sources: object ที่ผลลัพธ์ขึ้นอยู่กับ ; key: ค่าอื่นที่ไม่ใช่ object (เช่น ชื่อคอลัมน์) ต้อง hash ได้
+    def get(self, sources, build, key=()):
+        sources = tuple(sources)
+        identity = (tuple(id(source) for source in sources), key)
+        with self._lock:
+            entry = self._entries.get(identity)
+            # เก็บ reference ของ object ไว้ใน entry เพื่อไม่ให้ id ถูกนำกลับมาใช้กับ object ใหม่
+            if entry is not None and all(a is b for a, b in zip(entry[0], sources)):
+                self._entries.move_to_end(identity)
+                return entry[1]
+        value = build()
+        self.put(sources, value, key)
+        return value
+
+    # Function to store a value for the given objects (เช่น ผลลัพธ์ที่ส่งกลับเข้ามาอีกครั้งให้ได้ตัวเดิม)
+    def put(self, sources, value, key=()):
+        sources = tuple(sources)
+        identity = (tuple(id(source) for source in sources), key)
+        with self._lock:
+            self._entries[identity] = (sources, value)
+            self._entries.move_to_end(identity)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
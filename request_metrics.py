@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# จำนวน request ล่าสุดที่เก็บไว้คำนวณ p50/p95 ใน process นี้
+DEFAULT_WINDOW = 1000
+
+# ค่าที่วัดเป็นเวลา (ms) และจำนวน ที่ใช้คำนวณ percentile
+LATENCY_FIELDS = ('prompt_build_ms', 'first_token_ms', 'total_ms')
+SIZE_FIELDS = ('prompt_chars', 'prompt_tokens', 'context_tokens_saved')
+
+# Function to read token counts reported by Gemini (usage_metadata) from a response or its last chunk
+def usage_counts(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return {}
+    counts = {}
+    for field, key in (('prompt_token_count', 'usage_prompt_tokens'), ('candidates_token_count', 'usage_output_tokens')):
+        value = getattr(usage, field, None)
+        if value:
+            counts[key] = int(value)
+    return counts
+
+# Function to compute a percentile (nearest-rank) of a list of numbers
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+# Sink that appends one JSON object per request to a file
+class JsonlSink:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+# Process-wide collector of per-request metrics; keeps a window for percentiles and forwards events to sinks
+class MetricsRecorder:
+    def __init__(self, sinks=None, window=DEFAULT_WINDOW):
+        self.sinks = list(sinks or [])
+        # HTTP server ของ Prometheus endpoint (ถ้าเปิดไว้)
+        self.server = None
+        self._events = deque(maxlen=window)
+        self._counts = Counter()
+        self._errors = Counter()
+        self._sums = Counter()
+        self._observed = Counter()
+        self._lock = threading.Lock()
+
+    # Function to record one request; event keys follow LATENCY_FIELDS/SIZE_FIELDS plus app, path, intent, error
+    def record(self, **event):
+        event = {key: value for key, value in event.items() if value is not None}
+        event.setdefault('timestamp', time.time())
+        event.setdefault('path', 'gemini')
+        with self._lock:
+            self._events.append(event)
+            self._counts[(event.get('app', ''), event['path'])] += 1
+            if event.get('error'):
+                self._errors[(event.get('app', ''), event['error'])] += 1
+            for field in LATENCY_FIELDS + SIZE_FIELDS:
+                if field in event:
+                    self._sums[field] += event[field]
+                    self._observed[field] += 1
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception:
+                # sink ที่เขียนไม่สำเร็จต้องไม่ทำให้การตอบคำถามล้มเหลว
+                pass
+        return event
+
+    def events(self, path=None):
+        with self._lock:
+            events = list(self._events)
+        return [event for event in events if path is None or event['path'] == path]
+
+    # Function to summarize the current window: count, hit rates and p50/p95 of each field
+    def summary(self, path=None):
+        events = self.events(path)
+        result = {'count': len(events)}
+        if events:
+            result['local_rate'] = sum(1 for event in events if event['path'] == 'local') / len(events)
+            result['cache_rate'] = sum(1 for event in events if event['path'] == 'cache') / len(events)
+            result['error_count'] = sum(1 for event in events if event.get('error'))
+        for field in LATENCY_FIELDS + SIZE_FIELDS:
+            values = [event[field] for event in events if field in event]
+            if values:
+                result[field] = {'p50': percentile(values, 50), 'p95': percentile(values, 95)}
+        return result
+
+    # Function to render the metrics in Prometheus text exposition format
+    def prometheus_text(self):
+        events = self.events()
+        with self._lock:
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+            sums = dict(self._sums)
+            observed = dict(self._observed)
+        lines = [
+            "# HELP thai_food_requests_total Questions answered, by app and answer path (local, cache, gemini, none).",
+            "# TYPE thai_food_requests_total counter",
+        ]
+        for (app, path), count in sorted(counts.items()):
+            lines.append(f'thai_food_requests_total{{app="{app}",path="{path}"}} {count}')
+        lines += [
+            "# HELP thai_food_request_errors_total Failed Gemini calls, by app and error class.",
+            "# TYPE thai_food_request_errors_total counter",
+        ]
+        for (app, error), count in sorted(errors.items()):
+            lines.append(f'thai_food_request_errors_total{{app="{app}",error="{error}"}} {count}')
+        # quantile คำนวณจาก request ล่าสุดใน window ส่วน _sum/_count นับสะสมตั้งแต่เริ่ม process
+        for field in LATENCY_FIELDS + SIZE_FIELDS:
+            values = [event[field] for event in events if field in event]
+            name = f"thai_food_{field}"
+            lines.append(f"# TYPE {name} summary")
+            for q in (0.5, 0.95):
+                value = percentile(values, q * 100)
+                if value is not None:
+                    lines.append(f'{name}{{quantile="{q}"}} {value}')
+            lines.append(f"{name}_sum {sums.get(field, 0)}")
+            lines.append(f"{name}_count {observed.get(field, 0)}")
+        return "\n".join(lines) + "\n"
+
+# Function to serve recorder.prometheus_text() at http://host:port/metrics from a daemon thread
+def serve_prometheus(recorder, port, host="0.0.0.0"):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            body = recorder.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+# Function to build a recorder from settings (secrets 'metrics': jsonl_path, prometheus_port)
+def create_metrics_recorder(settings):
+    sinks = []
+    if settings.get('jsonl_path'):
+        sinks.append(JsonlSink(settings['jsonl_path']))
+    recorder = MetricsRecorder(sinks, window=int(settings.get('window', DEFAULT_WINDOW)))
+    if settings.get('prometheus_port'):
+        try:
+            recorder.server = serve_prometheus(recorder, settings['prometheus_port'], settings.get('prometheus_host', "0.0.0.0"))
+        except OSError:
+            # พอร์ตถูกใช้อยู่ (เช่น เปิดหลาย process) ยังเก็บ metrics ได้ตามปกติ
+            pass
+    return recorder
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from identity_memo import IdentityMemo
+
+# ค่าเริ่มต้นของ cache คำตอบ
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+# คำลงท้ายสุภาพที่ไม่ทำให้ความหมายของคำถามเปลี่ยน
+_POLITE_PARTICLES = ('นะครับ', 'นะคะ', 'ครับผม', 'ครับ', 'ค่ะ', 'คะ', 'จ้า', 'จ้ะ')
+
+# เครื่องหมายวรรคตอนและช่องว่าง (รวม zero-width space ที่มักติดมากับข้อความภาษาไทย)
+_PUNCTUATION_PATTERN = re.compile(r"[\s​‌‍﻿?？!！.,，。:;\"'“”‘’()\[\]{}\-_/\\ฯ]+")
+
+# Function to normalize a question so trivially different spellings share one cache entry
+def normalize_question(question):
+    text = unicodedata.normalize('NFC', str(question)).lower()
+    text = _PUNCTUATION_PATTERN.sub('', text)
+    # ตัดคำลงท้ายสุภาพ (อาจมีซ้อนกัน เช่น "นะครับ")
+    stripped = True
+    while stripped:
+        stripped = False
+        for particle in _POLITE_PARTICLES:
+            if text.endswith(particle) and len(text) > len(particle):
+                text = text[:-len(particle)]
+                stripped = True
+    return text
+
+# จำผลของ dataframes_version ล่าสุดไว้ (DataFrame ชุดเดิมไม่ต้อง hash ซ้ำทุกครั้งที่ rerun)
+_version_memo = IdentityMemo(8)
+
+# Function to compute a content hash of the loaded dataframes
+def dataframes_version(dataframes):
+    keys = tuple(sorted(dataframes))
+    return _version_memo.get([dataframes[key] for key in keys], lambda: _hash_dataframes(dataframes), key=keys)
+
+# จำ hash ของแต่ละตารางไว้ด้วย เมื่อโหลดไฟล์ใหม่เฉพาะบางไฟล์ ตารางที่ไม่เปลี่ยนไม่ต้อง hash ซ้ำ
+_frame_memo = IdentityMemo(32)
+
+# Function to hash the content of one dataframe, once per dataframe object
+def _frame_hash(df):
+    def build():
+        # import pandas เมื่อ hash ตารางครั้งแรก (สร้าง cache ตอนเปิดหน้าเว็บไม่ต้องรอ pandas)
+        import pandas as pd
+        digest = hashlib.sha1()
+        digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    return _frame_memo.get([df], build)
+
+# Function to hash the content of every dataframe
+def _hash_dataframes(dataframes):
+    digest = hashlib.sha1()
+    for key in sorted(dataframes):
+        df = dataframes[key]
+        if df is None:
+            continue
+        digest.update(key.encode('utf-8'))
+        digest.update(_frame_hash(df).encode('utf-8'))
+    return digest.hexdigest()
+
+# Thread-safe LRU/TTL cache for Gemini answers, optionally persisted to SQLite
+class ResponseCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # Function to build cache key from question, data version and anything else that shapes the prompt
+    def make_key(self, question, data_version, *extra):
+        parts = [normalize_question(question), str(data_version)] + [str(item) for item in extra]
+        return hashlib.sha1("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+
+            # ไม่พบในหน่วยความจำ ลองหาจาก SQLite (ข้อมูลจากการรันครั้งก่อน)
+            if self._db is not None:
+                row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    response, created = row
+                    if not self._expired(created, now):
+                        self._store(key, response, created)
+                        self.hits += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key, response):
+        created = time.time()
+        with self._lock:
+            self._store(key, response, created)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                    (key, response, created)
+                )
+                self._db.commit()
+
+    def _store(self, key, response, created):
+        self._entries[key] = (response, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries),
+            }
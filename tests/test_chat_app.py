@@ -0,0 +1,38 @@
+import os
+
+import google.generativeai as genai
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from fake_gemini import FakeGeminiModel
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Fake model that counts how many chat sessions the app starts
+class CountingModel(FakeGeminiModel):
+    def __init__(self):
+        super().__init__(responder=lambda prompt: "ตอบ " + str(prompt)[:10])
+        self.sessions = []
+
+    def start_chat(self, history=None):
+        session = super().start_chat(history)
+        self.sessions.append(len(session.history))
+        return session
+
+def test_chat_session_is_restarted_once_per_window(monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(genai, 'GenerativeModel', lambda name: model)
+    monkeypatch.setattr(genai, 'configure', lambda **kwargs: None)
+    # get_model เป็น cache_resource ต้องล้างเพื่อให้ได้โมเดลจำลองตัวนี้
+    st.cache_resource.clear()
+    app = AppTest.from_file(APP_PATH, default_timeout=30)
+    app.secrets['gemini_api_key'] = "test"
+    app.run()
+    for i in range(20):
+        app.chat_input[0].set_value(f"คำถาม {i}").run()
+    assert not app.exception
+    memory = app.session_state['chat_memory']
+    # เริ่มครั้งแรก แล้วเริ่มใหม่ทุก window_turns รอบ ไม่ใช่ทุกรอบเมื่อประวัติเต็ม
+    assert len(model.sessions) == 1 + 20 // memory.window_turns
+    # ประวัติที่ส่งไม่เกิน ความจำย่อ + รอบล่าสุด + รอบใหม่อีกหนึ่ง window
+    assert len(app.session_state['chat'].history) <= 2 + 4 * memory.window_turns
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from food_aggregates import compute_dish_aggregates
+from food_query_engine import answer_locally
+
+# Function to build one dish whose fish sauce is bought by the bottle (no gram size, so no cost)
+def _dataframes():
+    dishes_df = pd.DataFrame({'dish_id': ['D001', 'D002'], 'dish_name': ['ต้มยำกุ้ง', 'ไข่เจียว']})
+    ingredients_df = pd.DataFrame({
+        'ingredient_id': ['I001', 'I002', 'I003'],
+        'ingredient_name': ['กุ้งสด', 'น้ำปลา', 'ไข่ไก่'],
+        'unit': ['กิโลกรัม', 'ขวด', 'กิโลกรัม'],
+        'price_per_unit': [300.0, 20.0, 10.0],
+        'calories_per_100g': [99.0, 35.0, 155.0],
+    })
+    recipe_df = pd.DataFrame({
+        'dish_id': ['D001', 'D001', 'D002'],
+        'ingredient_id': ['I001', 'I002', 'I003'],
+        'amount': ['300', '2', '100'],
+        'unit': ['กรัม', 'ช้อนโต๊ะ', 'กรัม'],
+    })
+    dataframes = {'dishes_df': dishes_df, 'ingredients_df': ingredients_df, 'recipe_df': recipe_df}
+    dataframes['aggregates_df'] = compute_dish_aggregates(dishes_df, ingredients_df, recipe_df)
+    return dataframes
+
+def test_rows_without_cost_are_counted():
+    aggregates = _dataframes()['aggregates_df'].set_index('dish_id')
+    assert aggregates.loc['D001', 'uncosted_count'] == 1
+    assert aggregates.loc['D001', 'unconverted_count'] == 0
+    assert aggregates.loc['D001', 'estimated_cost'] == 90.0
+    assert aggregates.loc['D002', 'uncosted_count'] == 0
+
+def test_partial_cost_is_not_presented_as_full_total():
+    intent, answer = answer_locally("ต้มยำกุ้งราคาเท่าไหร่", _dataframes())
+    assert intent == 'dish_cost'
+    assert "อย่างน้อย 90 บาท" in answer
+    assert "คิดได้ 1 จาก 2 รายการ" in answer
+    assert "คิดต้นทุนไม่ได้" in answer
+
+def test_complete_cost_is_a_total():
+    intent, answer = answer_locally("ไข่เจียวราคาเท่าไหร่", _dataframes())
+    assert intent == 'dish_cost'
+    assert "ประมาณ 1 บาท" in answer
+    assert "อย่างน้อย" not in answer
+
+def test_ranking_skips_dishes_with_partial_cost():
+    intent, answer = answer_locally("อาหารที่แพงที่สุด", _dataframes())
+    assert intent == 'most_expensive'
+    assert "ไข่เจียว" in answer
+    assert "ต้มยำกุ้ง" not in answer
+
+def test_calorie_ranking_keeps_dishes_with_partial_cost():
+    intent, answer = answer_locally("อาหารที่มีแคลอรี่มากที่สุด", _dataframes())
+    assert intent == 'highest_calories'
+    assert "ต้มยำกุ้ง" in answer
@@ -0,0 +1,70 @@
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from fake_gemini import FakeGeminiModel
+from food_api import MAX_BODY_BYTES, FoodAPIServer
+from food_data_store import FoodDataStore
+from food_qa_core import FoodQAService
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fixture running the API server on a free port in a background event loop
+@pytest.fixture
+def server():
+    store = FoodDataStore(os.path.join(REPO_DIR, "csv", "database"), os.path.join(REPO_DIR, "csv", "data_dict"))
+    api = FoodAPIServer(FoodQAService(store=store, model=FakeGeminiModel()), port=0, workers=2)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(api.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield api
+    finally:
+        asyncio.run_coroutine_threadsafe(api.close(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+# Function to send one request and return (status, decoded JSON body)
+def _request(server, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+    try:
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    finally:
+        connection.close()
+
+def test_ask_answers_a_question(server):
+    status, payload = _request(server, 'POST', '/ask', json.dumps({'question': "ผัดไทยใส่อะไรบ้าง"}).encode('utf-8'))
+    assert status == 200
+    assert "ผัดไทย" in payload['answer']
+
+@pytest.mark.parametrize('body', [b'', b'{"question": "  "}', b'["pad thai"]', b'{not json'])
+def test_ask_rejects_missing_or_invalid_question(server, body):
+    status, payload = _request(server, 'POST', '/ask', body)
+    assert status == 400
+    assert payload['error']
+
+def test_unknown_path_is_not_found(server):
+    status, _ = _request(server, 'POST', '/answer', b'{"question": "pad thai"}')
+    assert status == 404
+
+def test_ask_only_accepts_post(server):
+    status, payload = _request(server, 'GET', '/ask')
+    assert status == 405
+    assert payload['error'] == "ใช้ POST"
+
+def test_oversized_body_is_rejected_before_it_is_read(server):
+    # ส่งเฉพาะ header ที่ประกาศขนาดเกินกำหนด server ต้องตอบ 413 โดยไม่รอ body
+    with socket.create_connection(("127.0.0.1", server.port), timeout=10) as sock:
+        sock.sendall(f"POST /ask HTTP/1.1\r\nHost: localhost\r\nContent-Length: {MAX_BODY_BYTES + 1}\r\n\r\n".encode('latin-1'))
+        response = sock.makefile('rb').read().decode('utf-8')
+    assert response.startswith("HTTP/1.1 413 ")
+    assert "Connection: close" in response
@@ -0,0 +1,58 @@
+import io
+import json
+import os
+
+import pytest
+
+from fake_gemini import FakeGeminiModel
+from food_batch import run_batch
+from food_data_store import FoodDataStore
+from food_qa_core import FoodQAService
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function to create a service over csv/database answered by the fake model
+def _service():
+    store = FoodDataStore(os.path.join(REPO_DIR, "csv", "database"), os.path.join(REPO_DIR, "csv", "data_dict"))
+    return FoodQAService(store=store, model=FakeGeminiModel())
+
+# Function to read the ids written to a batch output file
+def _written_ids(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['id'] for line in f]
+
+def test_resume_does_not_repeat_invalid_items(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    items = [{'id': 1, 'question': "ผัดไทยใส่อะไรบ้าง"}, {'id': 2}, {'id': 3, 'question': "  "}]
+    service = _service()
+
+    first = run_batch(service, items, output_path=output_path)
+    assert first['errors'] == 2
+    assert sorted(_written_ids(output_path)) == [1, 2, 3]
+
+    resumed = run_batch(service, items, output_path=output_path)
+    assert resumed['errors'] == 0
+    assert resumed['skipped'] == 3
+    assert sorted(_written_ids(output_path)) == [1, 2, 3]
+
+def test_restart_writes_invalid_items_again(tmp_path):
+    output_path = str(tmp_path / "results.jsonl")
+    items = [{'id': 1}]
+    service = _service()
+    run_batch(service, items, output_path=output_path)
+    summary = run_batch(service, items, output_path=output_path, resume=False)
+    assert summary['errors'] == 1
+    assert _written_ids(output_path) == [1]
+
+def test_missing_output_is_rejected_before_any_work():
+    model = FakeGeminiModel()
+    service = FoodQAService(store=FoodDataStore(os.path.join(REPO_DIR, "csv", "database"), os.path.join(REPO_DIR, "csv", "data_dict")), model=model)
+    with pytest.raises(ValueError):
+        run_batch(service, [{'id': 1, 'question': "ผัดไทยทำยังไง"}])
+    assert model.calls == 0
+
+def test_results_can_be_written_to_an_open_stream():
+    output = io.StringIO()
+    summary = run_batch(_service(), [{'id': 1, 'question': "ผัดไทยใส่อะไรบ้าง"}, {'id': 2}], output=output)
+    assert summary['answered'] == 1 and summary['errors'] == 1
+    assert sorted(json.loads(line)['id'] for line in output.getvalue().splitlines()) == [1, 2]
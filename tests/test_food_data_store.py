@@ -0,0 +1,65 @@
+import os
+import shutil
+import threading
+
+from food_data_store import FoodDataStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function to copy the shipped csv folders so a test can edit them
+def _copy_csv(tmp_path):
+    database_dir = str(tmp_path / "database")
+    data_dict_dir = str(tmp_path / "data_dict")
+    shutil.copytree(os.path.join(REPO_DIR, "csv", "database"), database_dir)
+    shutil.copytree(os.path.join(REPO_DIR, "csv", "data_dict"), data_dict_dir)
+    return database_dir, data_dict_dir
+
+# Function to change the amount of the first recipe row (D001's shrimp, 300 -> 3000 grams)
+def _edit_first_recipe_row(database_dir):
+    path = os.path.join(database_dir, "recipe_ingredients.csv")
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().split("\n")
+    assert lines[1].startswith("D001,I018,300,")
+    lines[1] = lines[1].replace(",300,", ",3000,", 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+
+def test_changed_recipe_row_recomputes_only_that_dish(tmp_path):
+    database_dir, data_dict_dir = _copy_csv(tmp_path)
+    store = FoodDataStore(database_dir, data_dict_dir)
+    before = store.load()
+    assert store.load() is before
+
+    _edit_first_recipe_row(database_dir)
+    after = store.load()
+    assert after is not before
+    assert after.changed_files == ['recipe_ingredients.csv']
+    # ไฟล์ที่ไม่เปลี่ยนได้ DataFrame ตัวเดิม
+    assert after.dataframes['thai_dishes.csv'] is before.dataframes['thai_dishes.csv']
+    assert store._aggregate_index.last_recomputed == 1
+
+    old = before.aggregates_df.set_index('dish_id')
+    new = after.aggregates_df.set_index('dish_id')
+    assert new.loc['D001', 'total_grams'] == old.loc['D001', 'total_grams'] + 2700
+    assert new.drop(index='D001').equals(old.drop(index='D001'))
+
+def test_watcher_reloads_changed_files(tmp_path):
+    database_dir, data_dict_dir = _copy_csv(tmp_path)
+    store = FoodDataStore(database_dir, data_dict_dir)
+    before = store.load()
+    reloaded = []
+    done = threading.Event()
+
+    def on_reload(snapshot):
+        reloaded.append(snapshot)
+        done.set()
+
+    store.watch(interval=0.05, on_reload=on_reload)
+    try:
+        _edit_first_recipe_row(database_dir)
+        assert done.wait(5)
+    finally:
+        store.stop_watching()
+    assert reloaded[0] is store.current()
+    assert reloaded[0].version != before.version
+    assert reloaded[0].changed_files == ['recipe_ingredients.csv']
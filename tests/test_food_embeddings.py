@@ -0,0 +1,118 @@
+import os
+import threading
+
+import pandas as pd
+
+import food_data_store
+import food_embeddings
+from food_embeddings import DEFAULT_MIN_SCORE, EmbeddingIndex, HashingEmbedder, index_for, semantic_matches
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_DIR = os.path.join(REPO_DIR, "csv", "database")
+
+# Embedder that counts how many documents were embedded
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+# Function to read the dish and ingredient tables shipped in csv/database
+def _database():
+    return {
+        'dishes_df': pd.read_csv(os.path.join(DATABASE_DIR, "thai_dishes.csv")),
+        'ingredients_df': pd.read_csv(os.path.join(DATABASE_DIR, "ingredients.csv")),
+    }
+
+def test_misspelled_dish_name_scores_above_threshold():
+    dataframes = _database()
+    index = EmbeddingIndex()
+    index.update(dataframes['dishes_df'], dataframes['ingredients_df'])
+    # "ต้มยำกุ้ง" พิมพ์โดยไม่มีวรรณยุกต์ คำอธิบายยาวของอาหารต้องไม่กลบชื่อ
+    results = index.search("ตมยำกุง", k=3, kind='dish')
+    assert results[0][:2] == ('dish', 'D001')
+    assert results[0][2] >= DEFAULT_MIN_SCORE
+    assert index.search("ผดไทย", k=1, kind='dish', min_score=DEFAULT_MIN_SCORE)[0][1] == 'D002'
+
+def test_unrelated_question_finds_nothing():
+    dataframes = _database()
+    dish_ids, ingredient_ids = semantic_matches("วันนี้อากาศดีไหม", dataframes, index=EmbeddingIndex())
+    assert dish_ids == []
+    assert ingredient_ids == []
+
+def test_each_dish_is_returned_once():
+    dataframes = _database()
+    index = EmbeddingIndex()
+    index.update(dataframes['dishes_df'], dataframes['ingredients_df'])
+    results = index.search("ต้มยำกุ้ง", k=5, kind='dish')
+    assert len({row_id for _, row_id, _ in results}) == len(results)
+
+def test_ids_keep_the_dtype_of_the_id_column():
+    # ข้อมูลตัวอย่างของแอปใช้ dish_id/ingredient_id เป็นตัวเลข
+    dataframes = {
+        'dishes_df': pd.DataFrame({'dish_id': [1, 2], 'dish_name': ['ต้มยำกุ้ง', 'ผัดไทย'], 'description': ['ต้มรสจัด', 'ก๋วยเตี๋ยวผัด']}),
+        'ingredients_df': pd.DataFrame({'ingredient_id': [1, 2], 'ingredient_name': ['กุ้งสด', 'ตะไคร้']}),
+    }
+    dish_ids, _ = semantic_matches("ตมยำกุง", dataframes, index=EmbeddingIndex())
+    assert dish_ids[0] == 1
+    assert dataframes['dishes_df']['dish_id'].isin(dish_ids).any()
+
+def test_search_during_update_sees_matching_keys_and_matrix():
+    dataframes = _database()
+    index = EmbeddingIndex()
+    index.update(dataframes['dishes_df'], dataframes['ingredients_df'])
+    errors = []
+
+    def search():
+        for _ in range(200):
+            try:
+                index.search("ตมยำกุง", k=3)
+            except Exception as e:
+                errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    # เปลี่ยนจำนวนแถวไปมา ถ้า search จับคู่ matrix เก่ากับ keys ใหม่จะ index เกินขนาด
+    for size in (10, 60, 20, 60) * 10:
+        index.update(dataframes['dishes_df'].head(size), dataframes['ingredients_df'])
+    searcher.join()
+    assert errors == []
+
+def test_alternating_datasets_are_not_embedded_again(monkeypatch):
+    embedders = []
+
+    # index ใหม่ทุกตัวนับจำนวนเอกสารที่ embed
+    def new_index(*args, **kwargs):
+        embedders.append(CountingEmbedder())
+        return EmbeddingIndex(embedder=embedders[-1])
+
+    monkeypatch.setattr(food_embeddings, 'EmbeddingIndex', new_index)
+    sample = {
+        'dishes_df': pd.DataFrame({'dish_id': [1, 2], 'dish_name': ['ต้มยำกุ้ง', 'ผัดไทย']}),
+        'ingredients_df': pd.DataFrame({'ingredient_id': [1], 'ingredient_name': ['กุ้งสด']}),
+    }
+    database = _database()
+    for _ in range(3):
+        semantic_matches("ตมยำกุง", sample)
+        semantic_matches("ตมยำกุง", database)
+    assert len(embedders) == 2
+    documents = [len(food_embeddings.index_documents(d['dishes_df'], d['ingredients_df'])) for d in (sample, database)]
+    # ครั้งแรก embed เอกสารทั้งหมด ครั้งต่อไป embed เฉพาะคำถาม
+    assert [embedder.embedded for embedder in embedders] == [documents[0] + 6, documents[1] + 6]
+    assert all(index_for(d['dishes_df'], d['ingredients_df']).path is None for d in (sample, database))
+
+def test_only_store_data_uses_the_saved_index(monkeypatch, tmp_path):
+    store = food_data_store.FoodDataStore(DATABASE_DIR, os.path.join(REPO_DIR, "csv", "data_dict"))
+    snapshot = store.load()
+    saved = EmbeddingIndex(path=str(tmp_path / "embeddings.npz"))
+    monkeypatch.setattr(food_data_store, '_default_store', store)
+    monkeypatch.setattr(food_embeddings, '_default_index', saved)
+    dishes_df, ingredients_df = snapshot.dataframes['thai_dishes.csv'], snapshot.dataframes['ingredients.csv']
+    assert index_for(dishes_df, ingredients_df) is saved
+    semantic_matches("ตมยำกุง", {'dishes_df': dishes_df, 'ingredients_df': ingredients_df})
+    assert (tmp_path / "embeddings.npz").exists()
+    # ตารางที่คัดลอกออกมา (ไม่ใช่ของ store) ใช้ index ในหน่วยความจำ ไม่เขียนไฟล์
+    assert index_for(dishes_df.copy(), ingredients_df).path is None
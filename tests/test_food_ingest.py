@@ -0,0 +1,60 @@
+import pandas as pd
+
+from food_ingest import ingest_csv, ingest_upload
+
+# Recipe rows with one malformed line (an extra column) on line 4 of the file
+RECIPE_CSV = (
+    "dish_id,ingredient_id,amount,unit,notes\n"
+    "D001,I001,300,กรัม,กุ้งขนาดกลาง\n"
+    "D001,I002,2,ช้อนโต๊ะ,\n"
+    "D002,I001,100,กรัม,สด,เกิน\n"
+    "D002,I003,200,กรัม,\n"
+    "D003,I002,1,ช้อนโต๊ะ,\n"
+)
+
+# Function to write the sample recipe file under its known table name
+def _recipe_file(tmp_path):
+    path = tmp_path / "recipe_ingredients.csv"
+    path.write_text(RECIPE_CSV, encoding='utf-8')
+    return str(path)
+
+def test_malformed_line_is_reported(tmp_path):
+    df, report = ingest_csv(_recipe_file(tmp_path))
+    assert report.typed
+    assert report.skipped_lines == [4]
+    assert report.rows == len(df) == 4
+    assert "บรรทัด 4" in report.summary()
+    assert list(df['ingredient_id']) == ['I001', 'I002', 'I003', 'I002']
+
+def test_chunked_ingest_matches_single_read(tmp_path):
+    path = _recipe_file(tmp_path)
+    whole, _ = ingest_csv(path)
+    # บรรทัดที่ผิดอยู่กลาง chunk (pandas ไม่เตือนแถวที่ผิดซึ่งเป็นแถวแรกของ chunk ถัดไป)
+    chunked, report = ingest_csv(path, chunk_rows=3)
+    assert report.chunks == 2
+    assert report.skipped_lines == [4]
+    # หมวดหมู่ที่ต่างกันในแต่ละ chunk รวมเป็น category เดียว
+    assert isinstance(chunked['dish_id'].dtype, pd.CategoricalDtype)
+    assert chunked.astype(str).equals(whole.astype(str))
+
+def test_malformed_first_row_does_not_shift_columns(tmp_path):
+    path = tmp_path / "recipe_ingredients.csv"
+    path.write_text("dish_id,ingredient_id,amount,unit,notes\nD001,I001,300,กรัม,สด,เกิน\nD001,I002,2,ช้อนโต๊ะ,\n", encoding='utf-8')
+    df, report = ingest_csv(str(path))
+    assert list(df['dish_id']) == ['D001', 'D001']
+    assert list(df['amount']) == ['300', '2']
+    assert report.truncated_rows == 1
+    assert "ตัดคอลัมน์เกินของ 1 แถว" in report.summary()
+
+def test_values_that_do_not_fit_the_known_dtypes_fall_back_to_inference(tmp_path):
+    path = tmp_path / "cooking_steps.csv"
+    path.write_text("dish_id,step_number,instruction\nD001,1,ต้มน้ำ\nD001,,ใส่กุ้ง\n", encoding='utf-8')
+    df, report = ingest_csv(str(path))
+    assert not report.typed
+    assert report.rows == 2
+    assert df['step_number'].isna().sum() == 1
+
+def test_upload_with_excel_bom_is_read():
+    df, report = ingest_upload(("﻿" + RECIPE_CSV).encode('utf-8'), filename="recipe_ingredients.csv")
+    assert list(df.columns)[0] == 'dish_id'
+    assert report.skipped_rows == 1
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from food_ingredient_index import IngredientDishIndex, get_ingredient_index
+
+# Function to build recipes: D1 = shrimp, lemongrass, lime; D2 = shrimp, noodles; D3 = chicken, lemongrass
+def _index():
+    recipe_df = pd.DataFrame({
+        'dish_id': ['D1', 'D1', 'D1', 'D2', 'D2', 'D3', 'D3', 'D3'],
+        'ingredient_id': ['shrimp', 'lemongrass', 'lime', 'shrimp', 'noodles', 'chicken', 'lemongrass', 'lemongrass'],
+    })
+    return IngredientDishIndex(recipe_df)
+
+def test_and_query_needs_every_ingredient():
+    assert _index().query(all_of=['shrimp', 'lemongrass']) == ['D1']
+
+def test_or_query_needs_any_ingredient():
+    assert sorted(_index().query(any_of=['noodles', 'chicken'])) == ['D2', 'D3']
+
+def test_not_query_excludes_dishes():
+    index = _index()
+    assert sorted(index.query(none_of=['shrimp'])) == ['D3']
+    assert index.query(all_of=['lemongrass'], none_of=['chicken']) == ['D1']
+    assert index.query(any_of=['shrimp'], none_of=['noodles', 'lime']) == []
+
+def test_unknown_ingredient_matches_nothing():
+    index = _index()
+    assert index.query(all_of=['shrimp', 'beef']) == []
+    assert sorted(index.query(none_of=['beef'])) == ['D1', 'D2', 'D3']
+
+def test_missing_at_most_ranks_by_fewest_missing():
+    index = _index()
+    # D2 ขาด noodles 1 อย่าง, D1 ขาด lemongrass กับ lime 2 อย่าง
+    assert index.missing_at_most(['shrimp'], 1) == [('D2', 1, 1)]
+    assert index.missing_at_most(['shrimp'], 2) == [('D2', 1, 1), ('D1', 1, 2)]
+    assert index.missing_at_most(['shrimp', 'lemongrass', 'lime'], 0) == [('D1', 3, 0)]
+    assert index.missing_at_most(['shrimp'], 2, none_of=['noodles']) == [('D1', 1, 2)]
+
+def test_duplicate_recipe_rows_are_counted_once():
+    index = _index()
+    assert index.missing_at_most(['chicken', 'lemongrass'], 0) == [('D3', 2, 0)]
+    assert index.missing_ingredients('D1', ['shrimp']) == ['lemongrass', 'lime']
+
+def test_int_ids_are_queried_as_strings():
+    index = IngredientDishIndex(pd.DataFrame({'dish_id': [1, 1, 2], 'ingredient_id': [10, 11, 10]}))
+    assert index.query(all_of=[10], none_of=['11']) == ['2']
+
+def test_index_is_built_once_per_recipe_table():
+    recipe_df = pd.DataFrame({'dish_id': ['D1'], 'ingredient_id': ['shrimp']})
+    assert get_ingredient_index(recipe_df) is get_ingredient_index(recipe_df)
+    assert get_ingredient_index(recipe_df.copy()) is not get_ingredient_index(recipe_df)
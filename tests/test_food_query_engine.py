@@ -0,0 +1,67 @@
+import pandas as pd
+
+from food_aggregates import compute_dish_aggregates
+from food_query_engine import answer_locally, classify_intent
+from food_retrieval import find_relevant_ids
+
+# Function to build a small database with dish names that contain each other
+def _dataframes():
+    dishes_df = pd.DataFrame({
+        'dish_id': ['D001', 'D002', 'D003'],
+        'dish_name': ['ต้มยำกุ้ง', 'ผัดไทย', 'ผัดไทยกุ้งสด'],
+        'dish_type': ['ต้ม', 'ผัด', 'ผัด'],
+        'region': ['กลาง', 'กลาง', 'กลาง'],
+    })
+    ingredients_df = pd.DataFrame({
+        'ingredient_id': ['I001', 'I002'],
+        'ingredient_name': ['กุ้งสด', 'เส้นจันทน์'],
+        'unit': ['กิโลกรัม', 'กิโลกรัม'],
+        'price_per_unit': [300.0, 60.0],
+        'calories_per_100g': [99.0, 360.0],
+    })
+    recipe_df = pd.DataFrame({
+        'dish_id': ['D001', 'D002', 'D003', 'D003'],
+        'ingredient_id': ['I001', 'I002', 'I001', 'I002'],
+        'amount': ['300', '200', '100', '200'],
+        'unit': ['กรัม', 'กรัม', 'กรัม', 'กรัม'],
+    })
+    return {'dishes_df': dishes_df, 'ingredients_df': ingredients_df, 'recipe_df': recipe_df}
+
+# Function to add the per-dish aggregates used by calorie/cost answers
+def _with_aggregates(dataframes):
+    dataframes['aggregates_df'] = compute_dish_aggregates(dataframes['dishes_df'], dataframes['ingredients_df'], dataframes['recipe_df'])
+    return dataframes
+
+def test_single_dish_question_is_answered_locally():
+    intent, params = classify_intent("ส่วนผสมของผัดไทยมีอะไรบ้าง", _dataframes())
+    assert intent == 'ingredients'
+    assert params['dish_id'] == 'D002'
+
+def test_longer_name_is_not_counted_as_two_dishes():
+    intent, params = classify_intent("ส่วนผสมของผัดไทยกุ้งสดมีอะไรบ้าง", _dataframes())
+    assert intent == 'ingredients'
+    assert params['dish_id'] == 'D003'
+
+def test_two_dish_question_goes_to_gemini_with_both_dishes():
+    dataframes = _dataframes()
+    question = "ต้มยำกุ้งกับผัดไทย อะไรแคลอรี่มากกว่ากัน"
+    intent, params = classify_intent(question, dataframes)
+    assert intent == 'open'
+    assert params['dish_ids'] == ['D001', 'D002']
+    assert answer_locally(question, dataframes) == ('open', None)
+    dish_ids, _ = find_relevant_ids(question, dataframes)
+    assert {'D001', 'D002'} <= set(dish_ids)
+
+def test_cost_question_mentioning_ingredients_is_a_cost_question():
+    intent, answer = answer_locally("ราคาวัตถุดิบของผัดไทย", _with_aggregates(_dataframes()))
+    assert intent == 'dish_cost'
+    assert "บาท" in answer
+
+def test_calorie_question_mentioning_recipe_is_a_calorie_question():
+    intent, answer = answer_locally("แคลอรี่ของสูตรผัดไทย", _with_aggregates(_dataframes()))
+    assert intent == 'dish_calories'
+    assert "กิโลแคลอรี่" in answer
+
+def test_plain_ingredient_and_step_questions_keep_their_intent():
+    assert classify_intent("ผัดไทยใช้วัตถุดิบอะไรบ้าง", _dataframes())[0] == 'ingredients'
+    assert classify_intent("สูตรผัดไทยทำยังไง", _dataframes())[0] == 'steps'
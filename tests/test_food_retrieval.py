@@ -0,0 +1,32 @@
+import pandas as pd
+
+from food_retrieval import _match_names, find_relevant_ids, normalize_text
+
+# Function to build a dish table with short, nested and similar names
+def _dishes():
+    return pd.DataFrame({
+        'dish_id': ['D001', 'D002', 'D003', 'D004'],
+        'dish_name': ['ต้มยำกุ้ง', 'แกงมัสมั่นไก่', 'ยำ', 'ผัดไทย'],
+    })
+
+def test_exact_names_longest_first():
+    matches = _match_names(_dishes(), 'dish_id', 'dish_name', normalize_text("ต้มยำกุ้ง กับ ผัดไทย"))
+    assert [dish_id for dish_id, _ in matches] == ['D001', 'D004', 'D003']
+
+def test_close_name_is_matched_through_the_ngram_index():
+    # "แกงมัสมั่น" ไม่มีคำว่าไก่ แต่ส่วนที่ตรงกันยาวพอ
+    matches = _match_names(_dishes(), 'dish_id', 'dish_name', normalize_text("แกงมัสมั่นใส่อะไร"))
+    assert matches == [('D002', 'แกงมัสมั่นไก่')]
+
+def test_unrelated_question_matches_nothing():
+    assert _match_names(_dishes(), 'dish_id', 'dish_name', normalize_text("วันนี้อากาศดี")) == []
+
+def test_table_change_is_seen():
+    dishes = _dishes()
+    assert _match_names(dishes, 'dish_id', 'dish_name', "ข้าวซอย") == []
+    dishes = pd.concat([dishes, pd.DataFrame({'dish_id': ['D005'], 'dish_name': ['ข้าวซอย']})], ignore_index=True)
+    assert _match_names(dishes, 'dish_id', 'dish_name', "ข้าวซอย") == [('D005', 'ข้าวซอย')]
+
+def test_find_relevant_ids_uses_matched_names():
+    dish_ids, _ = find_relevant_ids("ผัดไทยทำยังไง", {'dishes_df': _dishes()})
+    assert dish_ids[0] == 'D004'
@@ -0,0 +1,107 @@
+import pandas as pd
+
+from fake_gemini import ScriptedToolModel
+from food_tools import FoodTools, run_tool_loop
+
+# Function to build the sample-data shape used by the Streamlit app (int ids)
+def _dataframes():
+    dishes_df = pd.DataFrame({'dish_id': [1, 2], 'dish_name': ['ต้มยำกุ้ง', 'ผัดไทย']})
+    ingredients_df = pd.DataFrame({
+        'ingredient_id': [1, 2, 3],
+        'ingredient_name': ['กุ้งสด', 'น้ำปลา', 'ผักชี'],
+        'unit': ['กิโลกรัม', 'ขวด 700 มล.', 'กิโลกรัม'],
+        'price_per_unit': [300.0, 35.0, 80.0],
+        'calories_per_100g': [99.0, 35.0, 23.0],
+    })
+    recipe_df = pd.DataFrame({
+        'dish_id': [1, 1, 1, 2],
+        'ingredient_id': [1, 2, 3, 2],
+        'amount': ['300', '2', 'ตามชอบ', '3'],
+        'unit': ['กรัม', 'ช้อนโต๊ะ', '', 'ช้อนโต๊ะ'],
+    })
+    return {'dishes_df': dishes_df, 'ingredients_df': ingredients_df, 'recipe_df': recipe_df}
+
+def test_int_ids_are_found_from_string_arguments():
+    tools = FoodTools(_dataframes())
+    assert len(tools.call('list_ingredients', {'dish_id': '1'})['ingredients']) == 3
+    totals = tools.call('dish_totals', {'dish_id': '1'})
+    assert totals['dish_name'] == 'ต้มยำกุ้ง'
+    assert totals['total_calories'] > 0
+
+def test_int_ids_in_aggregates_are_found():
+    from food_aggregates import compute_dish_aggregates
+    dataframes = _dataframes()
+    dataframes['aggregates_df'] = compute_dish_aggregates(dataframes['dishes_df'], dataframes['ingredients_df'], dataframes['recipe_df'])
+    assert FoodTools(dataframes).call('dish_totals', {'dish_id': '2'})['dish_name'] == 'ผัดไทย'
+
+def test_search_by_ingredient_names_dishes_with_int_ids():
+    result = FoodTools(_dataframes()).call('search_by_ingredient', {'ingredients': ['น้ำปลา']})
+    assert {dish['dish_name'] for dish in result['dishes']} == {'ต้มยำกุ้ง', 'ผัดไทย'}
+
+def test_scaled_ingredients_show_one_consistent_amount():
+    items = FoodTools(_dataframes()).call('list_ingredients', {'dish_id': '1', 'servings': 4})['ingredients']
+    shrimp, fish_sauce, coriander = items
+    assert shrimp['amount'] == '600' and shrimp['grams'] == 600
+    assert fish_sauce['amount'] == '4' and fish_sauce['amount_value'] == 4
+    # ปริมาณที่ไม่ใช่ตัวเลขคงข้อความเดิม
+    assert coriander['amount'] == 'ตามชอบ'
+
+# Function to read the function responses sent back to the model in one request
+def _function_responses(request):
+    contents, _ = request
+    return [part['function_response'] for part in contents[-1]['parts']]
+
+def test_tool_loop_dispatches_every_tool():
+    model = ScriptedToolModel([
+        [('find_dish', {'name': 'ผัดไทย'})],
+        [('list_ingredients', {'dish_id': '2'}), ('dish_totals', {'dish_id': '2', 'servings': 4})],
+        [('search_by_ingredient', {'ingredients': ['กุ้ง'], 'exclude': ['ผักชี']})],
+        "ผัดไทยใช้น้ำปลา",
+    ])
+    timings = {}
+    answer = run_tool_loop(model, "ผัดไทยใช้อะไรบ้าง", _dataframes(), timings=timings)
+    assert answer == "ผัดไทยใช้น้ำปลา"
+    assert timings['tool_calls'] == 4
+    assert timings['model_turns'] == 4
+
+    found = _function_responses(model.requests[1])
+    assert found[0]['name'] == 'find_dish'
+    assert found[0]['response']['dishes'][0]['dish_id'] == 2
+    ingredients, totals = _function_responses(model.requests[2])
+    assert [item['ingredient_name'] for item in ingredients['response']['ingredients']] == ['น้ำปลา']
+    assert totals['response']['servings'] == 4
+    # ต้มยำกุ้งใส่ผักชีจึงถูกตัดออก
+    searched = _function_responses(model.requests[3])[0]['response']
+    assert searched['dishes'] == []
+    assert searched['unknown_ingredients'] == []
+
+def test_unknown_tool_is_reported_to_the_model():
+    model = ScriptedToolModel([[('delete_dish', {'dish_id': '1'})], "ไม่มีเครื่องมือนี้"])
+    answer = run_tool_loop(model, "ลบต้มยำกุ้ง", _dataframes())
+    assert answer == "ไม่มีเครื่องมือนี้"
+    response = _function_responses(model.requests[1])[0]
+    assert response['name'] == 'delete_dish'
+    assert 'delete_dish' in response['response']['error']
+
+def test_bad_arguments_are_reported_to_the_model():
+    model = ScriptedToolModel([[('list_ingredients', {'dish': 'ต้มยำกุ้ง'})], "ตอบ"])
+    run_tool_loop(model, "ต้มยำกุ้งใส่อะไร", _dataframes())
+    assert 'error' in _function_responses(model.requests[1])[0]['response']
+
+def test_tool_call_cap_forces_an_answer():
+    model = ScriptedToolModel([[('find_dish', {'name': 'ผัดไทย'})]] * 5, final_text="ตอบจากข้อมูลที่มี")
+    timings = {}
+    answer = run_tool_loop(model, "ผัดไทย", _dataframes(), timings=timings, max_tool_calls=2)
+    assert answer == "ตอบจากข้อมูลที่มี"
+    assert timings['tool_calls'] == 2
+    modes = [kwargs['tool_config']['function_calling_config']['mode'] for _, kwargs in model.requests]
+    assert modes == ['AUTO', 'AUTO', 'NONE']
+
+def test_calls_past_the_cap_in_one_turn_get_an_error_response():
+    model = ScriptedToolModel([[('find_dish', {'name': 'ผัดไทย'}), ('find_dish', {'name': 'ต้มยำกุ้ง'})], "ตอบ"])
+    timings = {}
+    run_tool_loop(model, "ผัดไทยกับต้มยำกุ้ง", _dataframes(), timings=timings, max_tool_calls=1)
+    first, second = _function_responses(model.requests[1])
+    assert first['response']['dishes'][0]['dish_name'] == 'ผัดไทย'
+    assert 'error' in second['response']
+    assert timings['tool_calls'] == 1
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import pytest
+
+from fake_gemini import FakeGeminiModel
+from gemini_client import GeminiClient, TokenBucket
+
+# Error carrying an HTTP status like the Gemini SDK's exceptions
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+# Function to create a client that records backoff sleeps instead of sleeping
+def _client(model, **kwargs):
+    sleeps = []
+    kwargs.setdefault('requests_per_minute', 60000)
+    client = GeminiClient(model, sleep=sleeps.append, **kwargs)
+    return client, sleeps
+
+def test_retries_after_transient_error():
+    model = FakeGeminiModel(errors=[StatusError(429), ConnectionError("reset")])
+    client, sleeps = _client(model, max_retries=3)
+    try:
+        response = client.generate_content("ผัดไทยใส่อะไรบ้าง")
+    finally:
+        client.close()
+    assert response.text == FakeGeminiModel().responder("")
+    assert model.calls == 3
+    assert client.stats['retries'] == 2
+    assert client.stats['errors'] == 0
+    assert len(sleeps) == 2
+
+def test_does_not_retry_permanent_error():
+    model = FakeGeminiModel(errors=[StatusError(400)])
+    client, sleeps = _client(model)
+    try:
+        with pytest.raises(StatusError):
+            client.generate_content("ผัดไทยใส่อะไรบ้าง")
+    finally:
+        client.close()
+    assert model.calls == 1
+    assert sleeps == []
+    assert client.stats['errors'] == 1
+
+def test_gives_up_after_max_retries():
+    model = FakeGeminiModel(errors=[StatusError(503)] * 5)
+    client, sleeps = _client(model, max_retries=2)
+    try:
+        with pytest.raises(StatusError):
+            client.generate_content("ผัดไทยใส่อะไรบ้าง")
+    finally:
+        client.close()
+    assert model.calls == 3
+    assert client.stats['retries'] == 2
+
+def test_stream_retries_before_first_chunk():
+    model = FakeGeminiModel(errors=[StatusError(503)], chunk_size=5)
+    client, _ = _client(model)
+    try:
+        text = "".join(chunk.text for chunk in client.generate_content("ต้มยำกุ้ง", stream=True))
+    finally:
+        client.close()
+    assert text == FakeGeminiModel().responder("")
+    assert model.calls == 2
+
+def test_concurrency_is_bounded_by_max_concurrency():
+    active = {'now': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    # คำตอบที่ค้างไว้ชั่วครู่ เพื่อให้คำขอหลายรายการทับซ้อนกัน
+    def responder(prompt):
+        with lock:
+            active['now'] += 1
+            active['peak'] = max(active['peak'], active['now'])
+        time.sleep(0.05)
+        with lock:
+            active['now'] -= 1
+        return prompt
+
+    model = FakeGeminiModel(responder=responder)
+    client, _ = _client(model, max_concurrency=2)
+    try:
+        futures = [client.submit(f"คำถามที่ {i}") for i in range(6)]
+        answers = [future.result(timeout=5).text for future in futures]
+    finally:
+        client.close()
+    assert answers == [f"คำถามที่ {i}" for i in range(6)]
+    assert active['peak'] == 2
+    assert model.calls == 6
+
+def test_identical_inflight_prompts_share_one_request():
+    release = threading.Event()
+
+    # คำตอบแรกรอจนกว่าจะส่งคำขอซ้ำครบ
+    def responder(prompt):
+        release.wait(5)
+        return "ตอบ"
+
+    model = FakeGeminiModel(responder=responder)
+    client, _ = _client(model)
+    try:
+        futures = [client.submit("ผัดไทยใส่อะไรบ้าง") for _ in range(3)]
+        other = client.submit("ต้มยำกุ้งใส่อะไรบ้าง")
+        release.set()
+        assert all(future is futures[0] for future in futures)
+        assert futures[0].result(timeout=5).text == "ตอบ"
+        other.result(timeout=5)
+        assert model.calls == 2
+        assert client.stats['coalesced'] == 2
+
+        # คำขอที่เสร็จแล้วไม่ถูกนำกลับมาใช้ คำถามเดิมรอบใหม่จึงเรียกโมเดลอีกครั้ง
+        client.generate_content("ผัดไทยใส่อะไรบ้าง")
+        assert model.calls == 3
+    finally:
+        release.set()
+        client.close()
+
+def test_token_bucket_waits_once_burst_is_used():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_second=2.0, capacity=2, clock=lambda: now[0], sleep=lambda seconds: None)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    now[0] = 5.0
+    assert bucket.reserve() == 0.0
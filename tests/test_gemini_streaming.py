@@ -0,0 +1,64 @@
+import pytest
+
+from fake_gemini import FakeGeminiModel
+from food_qa_core import get_gemini_response_stream
+from gemini_client import GeminiClient
+from gemini_streaming import stream_response_text
+
+def test_chunks_arrive_in_order():
+    model = FakeGeminiModel(responder=lambda prompt: "abcdefghij", chunk_size=3)
+    timings = {}
+    chunks = list(stream_response_text(lambda: model.generate_content("ต้มยำกุ้ง", stream=True), timings))
+    assert chunks == ["abc", "def", "ghi", "j"]
+    assert timings['total_ms'] >= timings['first_token_ms']
+
+def test_first_token_time_is_the_first_chunk_delay():
+    model = FakeGeminiModel(responder=lambda prompt: "ตอบ" * 10, chunk_size=5, first_chunk_delay=0.05, chunk_delay=0.01)
+    timings = {}
+    chunks = stream_response_text(lambda: model.generate_content("ผัดไทย", stream=True), timings)
+    assert next(chunks) == "ตอบตอ"
+    assert 50 <= timings['first_token_ms'] < 200
+    list(chunks)
+    # ส่วนที่เหลือ 5 chunk ห่างกัน 10 ms
+    assert timings['total_ms'] >= timings['first_token_ms'] + 50
+
+def test_empty_chunks_do_not_count_as_first_token():
+    model = FakeGeminiModel(responder=lambda prompt: "")
+    timings = {}
+    assert list(stream_response_text(lambda: model.generate_content("ผัดไทย", stream=True), timings)) == []
+    assert timings['first_token_ms'] is None
+    assert 'total_ms' in timings
+
+def test_mid_stream_error_keeps_sent_text_and_timings():
+    model = FakeGeminiModel(responder=lambda prompt: "abcdefghij", chunk_size=4, stream_error=ConnectionError("reset"), stream_error_after=2)
+    timings = {}
+    received = []
+    with pytest.raises(ConnectionError):
+        for text in stream_response_text(lambda: model.generate_content("ผัดไทย", stream=True), timings):
+            received.append(text)
+    assert received == ["abcd", "efgh"]
+    assert timings['first_token_ms'] is not None
+    assert 'total_ms' in timings
+
+def test_mid_stream_error_is_appended_to_the_answer():
+    model = FakeGeminiModel(responder=lambda prompt: "abcdefghij", chunk_size=4, stream_error=ConnectionError("reset"))
+    timings = {}
+    chunks = list(get_gemini_response_stream(model, "ผัดไทยใส่อะไรบ้าง", {}, timings=timings))
+    assert chunks[0] == "abcd"
+    assert "reset" in chunks[-1]
+    assert timings['error'] == 'ConnectionError'
+
+def test_client_does_not_retry_after_text_was_sent():
+    model = FakeGeminiModel(responder=lambda prompt: "abcdefghij", chunk_size=4, stream_error=ConnectionError("reset"))
+    client = GeminiClient(model, sleep=lambda seconds: None)
+    received = []
+    try:
+        with pytest.raises(ConnectionError):
+            for chunk in client.generate_content("ผัดไทย", stream=True):
+                received.append(chunk.text)
+    finally:
+        client.close()
+    # ส่งข้อความบางส่วนไปแล้ว ถ้าลองใหม่ผู้ใช้จะเห็นข้อความซ้ำ
+    assert received == ["abcd"]
+    assert model.calls == 1
+    assert client.stats['errors'] == 1
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pandas as pd
+
+import response_cache
+from response_cache import ResponseCache, dataframes_version, normalize_question
+
+# Function to freeze the clock used by the cache at a settable time
+def _clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_trivially_different_questions_share_a_key():
+    cache = ResponseCache()
+    assert normalize_question("ผัดไทย ทำยังไง นะครับ?") == normalize_question("ผัดไทยทำยังไง")
+    assert cache.make_key("ผัดไทยทำยังไงคะ", "v1") == cache.make_key(" ผัดไทย ทำยังไง ", "v1")
+    assert cache.make_key("ผัดไทยทำยังไง", "v1") != cache.make_key("ผัดไทยทำยังไง", "v2")
+    assert cache.make_key("ผัดไทยทำยังไง", "v1") != cache.make_key("ต้มยำกุ้งทำยังไง", "v1")
+
+def test_entry_expires_after_ttl(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = ResponseCache(ttl_seconds=60)
+    cache.set("key", "คำตอบ")
+    now[0] += 60
+    assert cache.get("key") == "คำตอบ"
+    now[0] += 1
+    assert cache.get("key") is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 0}
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+def test_sqlite_cache_survives_reopening(tmp_path):
+    db_path = str(tmp_path / "cache" / "responses.sqlite")
+    ResponseCache(db_path=db_path).set("key", "คำตอบเดิม")
+    reopened = ResponseCache(db_path=db_path)
+    assert reopened.stats()['entries'] == 0
+    assert reopened.get("key") == "คำตอบเดิม"
+    # หลังอ่านจาก SQLite แล้วเก็บไว้ในหน่วยความจำด้วย
+    assert reopened.stats()['entries'] == 1
+
+def test_expired_sqlite_rows_are_deleted(monkeypatch, tmp_path):
+    now = _clock(monkeypatch)
+    db_path = str(tmp_path / "responses.sqlite")
+    ResponseCache(ttl_seconds=60, db_path=db_path).set("key", "คำตอบเดิม")
+    now[0] += 61
+    assert ResponseCache(ttl_seconds=60, db_path=db_path).get("key") is None
+    with sqlite3.connect(db_path) as db:
+        assert db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+def test_data_version_follows_table_content():
+    dishes_df = pd.DataFrame({'dish_id': ['D001'], 'dish_name': ['ผัดไทย']})
+    version = dataframes_version({'dishes_df': dishes_df})
+    assert dataframes_version({'dishes_df': dishes_df.copy()}) == version
+    changed = dishes_df.assign(dish_name=['ผัดซีอิ๊ว'])
+    assert dataframes_version({'dishes_df': changed}) != version
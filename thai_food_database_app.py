@@ -1,11 +1,12 @@
 import streamlit as st
-import pandas as pd
 import os
-import json
-import re
-from io import StringIO
-import google.generativeai as genai
-import glob
+import time
+from chat_memory import DEFAULT_PAGE_SIZE, ConversationMemory
+from food_config import EXAMPLE_QUESTIONS, GEMINI_MODEL_NAME, NO_MODEL_ANSWER, cache_model_name, create_gemini_client
+from food_retrieval import DEFAULT_TOKEN_BUDGET
+from gemini_client import GeminiClient
+from request_metrics import create_metrics_recorder
+from response_cache import ResponseCache, dataframes_version
 
 st.set_page_config(
     page_title="Thai Food Chatbot with Gemini",
@@ -17,8 +18,37 @@ st.set_page_config(
 # ถ้าไม่มี secrets จะใช้ค่าว่างเป็นค่าเริ่มต้น
 if 'gemini' in st.secrets:
     GEMINI_API_KEY = st.secrets['gemini']['api_key']
+    GEMINI_SETTINGS = st.secrets['gemini']
 else:
     GEMINI_API_KEY = ""
+    GEMINI_SETTINGS = {}
+
+# 'gemini.function_calling = true' ให้ Gemini เรียกฟังก์ชันค้นข้อมูลแทนการแนบตารางใน prompt
+USE_TOOLS = bool(GEMINI_SETTINGS.get('function_calling', False))
+
+# ตั้งค่า cache คำตอบ (ใช้ร่วมกันทุก session) ถ้ามี secret 'cache.sqlite_path' จะเก็บลงไฟล์ด้วย
+CACHE_SETTINGS = st.secrets['cache'] if 'cache' in st.secrets else {}
+
+# ตั้งค่า metrics ต่อคำถาม: 'metrics.jsonl_path' เขียนลงไฟล์ JSONL, 'metrics.prometheus_port' เปิด endpoint /metrics
+METRICS_SETTINGS = st.secrets['metrics'] if 'metrics' in st.secrets else {}
+
+# Function to create response cache shared by every session of this process
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        max_entries=int(CACHE_SETTINGS.get('max_entries', 1000)),
+        ttl_seconds=float(CACHE_SETTINGS.get('ttl_seconds', 24 * 60 * 60)),
+        db_path=CACHE_SETTINGS.get('sqlite_path')
+    )
+
+response_cache = get_response_cache()
+
+# Function to create the metrics recorder shared by every session of this process
+@st.cache_resource
+def get_metrics_recorder():
+    return create_metrics_recorder(METRICS_SETTINGS)
+
+metrics = get_metrics_recorder()
 
 # Initialize session state for storing dataframes
 if 'dataframes' not in st.session_state:
@@ -28,18 +58,35 @@ if 'data_dicts' not in st.session_state:
 if 'file_uploaded' not in st.session_state:
     st.session_state.file_uploaded = False
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    # ประวัติสนทนา: รอบล่าสุดเก็บครบ รอบเก่าถูกย่อเป็นความจำสั้นๆ
+    st.session_state.chat_history = ConversationMemory()
 if 'api_key_set' not in st.session_state:
     st.session_state.api_key_set = False
+if 'dish_aggregate_index' not in st.session_state:
+    # สร้างเมื่อมีข้อมูลแล้ว (DishAggregateIndex ต้องใช้ pandas)
+    st.session_state.dish_aggregate_index = None
+if 'answer_log' not in st.session_state:
+    st.session_state.answer_log = []
+if 'stream_response' not in st.session_state:
+    st.session_state.stream_response = True
+if 'token_budget' not in st.session_state:
+    st.session_state.token_budget = DEFAULT_TOKEN_BUDGET
+if 'upload_cache' not in st.session_state:
+    st.session_state.upload_cache = {}
+if 'csv_version' not in st.session_state:
+    # version ของ snapshot จากโฟลเดอร์ csv ที่ session นี้ใช้อยู่ (None = ใช้ข้อมูลอัปโหลดหรือข้อมูลตัวอย่าง)
+    st.session_state.csv_version = None
+
+# Function to create Gemini client once per API key and share it across sessions and reruns
+@st.cache_resource
+def get_gemini_client(api_key):
+    # สร้าง model แล้วห่อด้วย client ที่จำกัดจำนวน request พร้อมกัน, rate limit และ retry
+    return create_gemini_client(api_key, GEMINI_SETTINGS, GEMINI_MODEL_NAME)
 
 # Function to initialize Gemini API
 def initialize_gemini_api(api_key):
     try:
-        # กำหนดค่า API key
-        genai.configure(api_key=api_key)
-        # สร้าง model
-        model = genai.GenerativeModel('gemini-2.0-flash-lite')
-        return model, True
+        return get_gemini_client(api_key), True
     except Exception as e:
         st.error(f"ไม่สามารถเชื่อมต่อกับ Gemini API ได้: {str(e)}")
         return None, False
@@ -48,49 +95,42 @@ def initialize_gemini_api(api_key):
 def is_data_dict(filename):
     return 'data_dict' in filename
 
+# Function to start the background watcher that reloads changed CSV files, once per process
+@st.cache_resource
+def start_csv_watcher():
+    from food_data_store import get_data_store
+    store = get_data_store()
+    store.watch()
+    return store
+
 # Function to load CSV files from directories
+# ไฟล์ถูกอ่านครั้งเดียวต่อ process และใช้ร่วมกันทุก session (อ่านใหม่เฉพาะเมื่อไฟล์เปลี่ยน)
 def load_csv_from_directories():
-    loaded_files = 0
+    from food_data_store import get_data_store
+    snapshot = get_data_store().load()
     
-    # ตรวจสอบและโหลดไฟล์จากโฟลเดอร์ data_dict
-    if os.path.exists("csv/data_dict"):
-        csv_files = glob.glob("csv/data_dict/*.csv")
-        for file_path in csv_files:
-            try:
-                filename = os.path.basename(file_path)
-                df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', low_memory=False)
-                st.session_state.data_dicts[filename] = df
-                loaded_files += 1
-                st.sidebar.success(f"โหลด Data Dictionary สำเร็จ: {filename}")
-            except Exception as e:
-                st.sidebar.error(f"ไม่สามารถโหลดไฟล์ {filename} ได้: {str(e)}")
+    for filename in snapshot.data_dicts:
+        st.sidebar.success(f"โหลด Data Dictionary สำเร็จ: {filename}")
+    for filename in snapshot.dataframes:
+        st.sidebar.success(f"โหลดฐานข้อมูลสำเร็จ: {filename}")
+    for filename, error in snapshot.errors.items():
+        st.sidebar.error(f"ไม่สามารถโหลดไฟล์ {filename} ได้: {error}")
+    for filename, report in snapshot.reports.items():
+        if report.skipped_rows:
+            st.sidebar.warning(f"{filename}: {report.summary()}")
     
-    # ตรวจสอบและโหลดไฟล์จากโฟลเดอร์ database
-    if os.path.exists("csv/database"):
-        csv_files = glob.glob("csv/database/*.csv")
-        for file_path in csv_files:
-            try:
-                filename = os.path.basename(file_path)
-                df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', low_memory=False)
-                
-                # แปลงประเภทข้อมูลหลังจากโหลดไฟล์แล้ว
-                for col in df.columns:
-                    try:
-                        # ลองแปลงเป็นตัวเลข ถ้าแปลงไม่ได้ก็ปล่อยเป็น string
-                        df[col] = pd.to_numeric(df[col], errors='ignore')
-                    except:
-                        pass
-                        
-                st.session_state.dataframes[filename] = df
-                loaded_files += 1
-                st.sidebar.success(f"โหลดฐานข้อมูลสำเร็จ: {filename}")
-            except Exception as e:
-                st.sidebar.error(f"ไม่สามารถโหลดไฟล์ {filename} ได้: {str(e)}")
+    # เก็บเฉพาะ reference ใน session (ไม่คัดลอกข้อมูล)
+    st.session_state.data_dicts = dict(snapshot.data_dicts)
+    st.session_state.dataframes = dict(snapshot.dataframes)
+    st.session_state.csv_version = snapshot.version
+    start_csv_watcher()
     
-    return loaded_files > 0
+    return len(snapshot.dataframes) + len(snapshot.data_dicts) > 0
 
 # สร้างข้อมูลทดสอบ (เพิ่มเติม)
 def create_test_data():
+    import pandas as pd
+
     # สร้างข้อมูลทดสอบสำหรับอาหารไทย
     dishes_data = {
         'dish_id': [1, 2, 3],
@@ -152,78 +192,6 @@ def create_test_data():
     
     return dishes_df, ingredients_df, recipe_df, cooking_steps_df
 
-# Function to generate prompt for Gemini
-def generate_gemini_prompt(question, dataframes):
-    # Extract all dataframes
-    dishes_df = dataframes.get('dishes_df')
-    ingredients_df = dataframes.get('ingredients_df')
-    recipe_df = dataframes.get('recipe_df')
-    cooking_steps_df = dataframes.get('cooking_steps_df', None)
-    
-    prompt = """
-คุณเป็นผู้เชี่ยวชาญด้านอาหารไทยที่มีข้อมูลเกี่ยวกับอาหารไทย วัตถุดิบ และสูตรอาหาร
-กรุณาตอบคำถามต่อไปนี้โดยใช้ข้อมูลที่ให้มา:
-
-คำถาม: {question}
-
-ข้อมูลในฐานข้อมูล:
-
-1. ข้อมูลอาหารไทย (dishes_df):
-{dishes_data}
-
-2. ข้อมูลวัตถุดิบ (ingredients_df):
-{ingredients_data}
-
-3. ข้อมูลส่วนผสมในสูตรอาหาร (recipe_df):
-{recipe_data}
-"""
-
-    # เพิ่มข้อมูลวิธีทำถ้ามี
-    if cooking_steps_df is not None:
-        prompt += """
-4. ข้อมูลวิธีทำอาหาร (cooking_steps_df):
-{cooking_steps_data}
-"""
-        prompt = prompt.format(
-            question=question,
-            dishes_data=dishes_df.to_string() if dishes_df is not None else "ไม่มีข้อมูล",
-            ingredients_data=ingredients_df.to_string() if ingredients_df is not None else "ไม่มีข้อมูล",
-            recipe_data=recipe_df.to_string() if recipe_df is not None else "ไม่มีข้อมูล",
-            cooking_steps_data=cooking_steps_df.to_string() if cooking_steps_df is not None else "ไม่มีข้อมูล"
-        )
-    else:
-        prompt = prompt.format(
-            question=question,
-            dishes_data=dishes_df.to_string() if dishes_df is not None else "ไม่มีข้อมูล",
-            ingredients_data=ingredients_df.to_string() if ingredients_df is not None else "ไม่มีข้อมูล",
-            recipe_data=recipe_df.to_string() if recipe_df is not None else "ไม่มีข้อมูล"
-        )
-    
-    prompt += """
-คำแนะนำเพิ่มเติม:
-1. ตอบคำถามให้ครบถ้วนตามข้อมูลที่มีในฐานข้อมูล
-2. หากมีการคำนวณ (เช่น แคลอรี่, ราคา) ให้อธิบายวิธีคำนวณด้วย
-3. หากข้อมูลในฐานข้อมูลไม่เพียงพอ ให้บอกอย่างสุภาพว่าไม่มีข้อมูลเพียงพอ
-4. ตอบในรูปแบบที่อ่านง่าย มีการจัดย่อหน้าและหัวข้ออย่างเหมาะสม
-5. ตอบเป็นภาษาไทยเสมอ
-"""
-    
-    return prompt
-
-# Function to get response from Gemini
-def get_gemini_response(model, question, dataframes):
-    try:
-        # สร้าง prompt
-        prompt = generate_gemini_prompt(question, dataframes)
-        
-        # ส่งไปยัง Gemini API
-        response = model.generate_content(prompt)
-        
-        # แปลงผลลัพธ์เป็นข้อความ
-        return response.text
-    except Exception as e:
-        return f"เกิดข้อผิดพลาดในการเรียกใช้ Gemini API: {str(e)}\n\nกรุณาตรวจสอบ API Key และการเชื่อมต่ออินเทอร์เน็ต"
-
 # Main title
 st.title("🍜 Thai Food Chatbot with Gemini")
 
@@ -257,7 +225,19 @@ with st.sidebar:
                 st.session_state.api_key_set = False
                 st.error("ไม่สามารถเชื่อมต่อกับ Gemini API ได้ กรุณาตรวจสอบ API Key")
     
+    # แสดงคำตอบทีละส่วนระหว่างที่ Gemini กำลังสร้างคำตอบ
+    st.session_state.stream_response = st.checkbox("แสดงคำตอบแบบสตรีม (ทยอยแสดงระหว่างสร้างคำตอบ)", value=st.session_state.stream_response)
+    
     st.header("ข้อมูลฐานข้อมูล")
+
+    # จำกัดขนาดข้อมูลที่แนบไปกับ prompt (เฉพาะแถวที่เกี่ยวข้องกับคำถาม)
+    st.session_state.token_budget = st.number_input(
+        "งบประมาณ token ของข้อมูลใน prompt",
+        min_value=500,
+        max_value=100000,
+        value=st.session_state.token_budget,
+        step=500
+    )
     
     # ตรวจสอบว่ามีไฟล์ใน folder csv/data_dict และ csv/database หรือไม่
     has_csv_folders = (os.path.exists("csv/data_dict") or os.path.exists("csv/database"))
@@ -270,6 +250,17 @@ with st.sidebar:
                 st.session_state.file_uploaded = True
             else:
                 st.error("ไม่พบไฟล์ CSV ใน csv/data_dict หรือ csv/database")
+        
+        # ไฟล์ในโฟลเดอร์ csv ถูกแก้ไขและ watcher อ่านใหม่แล้ว: ใช้ snapshot ใหม่ตั้งแต่คำถามถัดไป
+        snapshot = None
+        if st.session_state.csv_version is not None:
+            from food_data_store import get_data_store
+            snapshot = get_data_store().current()
+        if snapshot is not None and snapshot.version != st.session_state.csv_version:
+            st.session_state.data_dicts = dict(snapshot.data_dicts)
+            st.session_state.dataframes = dict(snapshot.dataframes)
+            st.session_state.csv_version = snapshot.version
+            st.info(f"ไฟล์ CSV ถูกแก้ไข โหลดข้อมูลใหม่แล้ว: {', '.join(snapshot.changed_files)}")
     else:
         st.info("ไม่พบโฟลเดอร์ csv/data_dict หรือ csv/database กรุณาสร้างโฟลเดอร์และเพิ่มไฟล์ CSV หรือใช้การอัปโหลดไฟล์แทน")
     
@@ -289,64 +280,39 @@ with st.sidebar:
             'recipe_ingredients.csv': recipe_df,
             'cooking_steps.csv': cooking_steps_df
         }
+        st.session_state.csv_version = None
         st.session_state.file_uploaded = True
         st.success("โหลดข้อมูลตัวอย่างสำเร็จ")
     
     elif uploaded_files:
+        st.session_state.csv_version = None
         for file in uploaded_files:
-            try:
-                # ลองอ่านไฟล์ด้วยตัวเลือกที่ยืดหยุ่นมากขึ้น
-                df = pd.read_csv(
-                    file,
-                    encoding='utf-8',  # ระบุการเข้ารหัสเป็น UTF-8
-                    on_bad_lines='skip',  # ข้ามบรรทัดที่มีปัญหา
-                    low_memory=False,  # ป้องกันปัญหา low memory
-                    dtype=str  # อ่านทุกคอลัมน์เป็น string ก่อน
-                )
-                
-                # แปลงประเภทข้อมูลหลังจากโหลดไฟล์แล้ว
-                for col in df.columns:
-                    try:
-                        # ลองแปลงเป็นตัวเลข ถ้าแปลงไม่ได้ก็ปล่อยเป็น string
-                        df[col] = pd.to_numeric(df[col], errors='ignore')
-                    except:
-                        pass
-                
-                if is_data_dict(file.name):
-                    st.session_state.data_dicts[file.name] = df
-                    st.success(f"โหลด Data Dictionary สำเร็จ: {file.name}")
-                else:
-                    st.session_state.dataframes[file.name] = df
-                    st.success(f"โหลดฐานข้อมูลสำเร็จ: {file.name}")
-                    
-            except Exception as e:
-                st.error(f"เกิดข้อผิดพลาดในการโหลดไฟล์ {file.name}: {str(e)}")
-                st.info("กำลังลองวิธีการโหลดไฟล์แบบอื่น...")
-                
+            # ไฟล์เดิมไม่ต้องอ่านซ้ำทุกครั้งที่หน้าเว็บ rerun
+            upload_key = (file.name, getattr(file, 'file_id', None) or file.size)
+            cached = st.session_state.upload_cache.get(file.name)
+            if cached is not None and cached[0] == upload_key:
+                df, report = cached[1], cached[2]
+            else:
+                from food_ingest import ingest_upload
                 try:
-                    # ลองอ่านเป็นไฟล์ธรรมดาและแปลงเป็น CSV ด้วยตนเอง
-                    stringio = StringIO(file.getvalue().decode("utf-8"))
-                    lines = stringio.read().splitlines()
-                    header = lines[0].split(",")
-                    
-                    data = []
-                    for line in lines[1:]:
-                        if line.strip():  # ข้ามบรรทัดว่าง
-                            values = line.split(",")
-                            if len(values) == len(header):
-                                data.append(values)
-                    
-                    df = pd.DataFrame(data, columns=header)
-                    
-                    if is_data_dict(file.name):
-                        st.session_state.data_dicts[file.name] = df
-                        st.success(f"โหลด Data Dictionary สำเร็จ (วิธีที่ 2): {file.name}")
-                    else:
-                        st.session_state.dataframes[file.name] = df
-                        st.success(f"โหลดฐานข้อมูลสำเร็จ (วิธีที่ 2): {file.name}")
-                        
-                except Exception as e2:
-                    st.error(f"ไม่สามารถโหลดไฟล์ {file.name} ได้: {str(e2)}")
+                    # อ่านด้วย parser ของ pandas ในรอบเดียว (รองรับข้อความในเครื่องหมายคำพูด และแบ่ง chunk เมื่อไฟล์ใหญ่)
+                    df, report = ingest_upload(file, dtypes='str' if is_data_dict(file.name) else None)
+                except Exception as e:
+                    st.session_state.upload_cache.pop(file.name, None)
+                    st.error(f"ไม่สามารถโหลดไฟล์ {file.name} ได้: {str(e)}")
+                    continue
+                st.session_state.upload_cache[file.name] = (upload_key, df, report)
+            
+            if is_data_dict(file.name):
+                st.session_state.data_dicts[file.name] = df
+                st.success(f"โหลด Data Dictionary สำเร็จ: {file.name}")
+            else:
+                st.session_state.dataframes[file.name] = df
+                st.success(f"โหลดฐานข้อมูลสำเร็จ: {file.name}")
+            if report.skipped_rows:
+                st.warning(f"{file.name}: {report.summary()}")
+            else:
+                st.caption(f"{file.name}: {report.summary()}")
         
         # ตรวจสอบว่ามีไฟล์ที่จำเป็นครบหรือไม่
         required_files = ['thai_dishes', 'ingredients', 'recipe_ingredients']
@@ -369,6 +335,14 @@ with st.sidebar:
 
 # Main content - Chat interface
 if st.session_state.file_uploaded:
+    # โมดูลที่ใช้ pandas import เมื่อมีข้อมูลแล้วเท่านั้น หน้าแรกจึงแสดงได้โดยไม่ต้องรอ pandas
+    from food_aggregates import DishAggregateIndex
+    from food_data_store import get_data_store
+    from food_qa_core import get_gemini_response, get_gemini_response_stream
+    from food_query_engine import answer_locally
+    from food_schema import combine_data_dicts
+    from food_units import normalize_recipe
+
     # Get DataFrames
     dishes_df = None
     ingredients_df = None
@@ -403,6 +377,9 @@ if st.session_state.file_uploaded:
         if not st.session_state.api_key_set:
             st.warning("ยังไม่ได้กำหนด Gemini API Key ที่ถูกต้อง กรุณาตรวจสอบค่า secret หรือกรอก API Key ชั่วคราวในช่องทางด้านซ้าย")
         
+        # ปริมาณในสูตรเป็นกรัมและสัดส่วนของหน่วยที่ซื้อ (ข้อมูลจากโฟลเดอร์ csv แปลงไว้แล้วตอนโหลด)
+        recipe_df = normalize_recipe(recipe_df, ingredients_df)
+
         # รวบรวม dataframes ที่มีทั้งหมด
         all_dataframes = {
             'dishes_df': dishes_df,
@@ -412,17 +389,49 @@ if st.session_state.file_uploaded:
         
         if cooking_steps_df is not None:
             all_dataframes['cooking_steps_df'] = cooking_steps_df
+
+        # คำอธิบายคอลัมน์จาก data dictionary ใช้เป็นส่วนหัวของข้อมูลใน prompt (สร้างครั้งเดียวต่อไฟล์ชุดเดิม)
+        data_dict_df = combine_data_dicts(st.session_state.data_dicts)
+        if data_dict_df is not None:
+            all_dataframes['data_dict_df'] = data_dict_df
+
+        # รหัสเวอร์ชันของข้อมูล ใช้เป็นส่วนหนึ่งของ key ใน cache คำตอบ
+        data_version = dataframes_version(all_dataframes)
+        
+        # ตารางสรุปแคลอรี่/ต้นทุนต่อจาน คำนวณใหม่เฉพาะเมื่อไฟล์ CSV เปลี่ยน
+        try:
+            # ถ้าเป็นข้อมูลชุดที่ใช้ร่วมกันจากโฟลเดอร์ csv ใช้ผลที่คำนวณไว้แล้วของ process
+            # (ใช้ snapshot ที่โหลดไว้แล้ว ไม่ตรวจไฟล์ซ้ำ ข้อมูลอัปโหลด/ข้อมูลตัวอย่างไม่ต้องถาม store)
+            aggregates_df = None
+            snapshot = get_data_store().current() if st.session_state.csv_version is not None else None
+            if snapshot is not None and snapshot.version == st.session_state.csv_version:
+                aggregates_df = snapshot.aggregates_for(dishes_df, ingredients_df, recipe_df)
+            if aggregates_df is None:
+                if st.session_state.dish_aggregate_index is None:
+                    st.session_state.dish_aggregate_index = DishAggregateIndex()
+                aggregates_df = st.session_state.dish_aggregate_index.update(dishes_df, ingredients_df, recipe_df)
+            all_dataframes['aggregates_df'] = aggregates_df
+        except Exception as e:
+            st.warning(f"ไม่สามารถคำนวณข้อมูลสรุปต่อจานได้: {str(e)}")
         
         # Display chat interface
         st.header("สนทนากับแชทบอทอาหารไทย")
         
         # Display chat history
+        # แสดงทีละหน้า (หน้าล่าสุดเป็นค่าเริ่มต้น) เพื่อไม่ให้ทุก rerun ต้องวาดประวัติทั้งหมด
+        chat_history = st.session_state.chat_history
+        page_count = chat_history.page_count(DEFAULT_PAGE_SIZE)
+        page = page_count
+        if page_count > 1:
+            page = st.number_input("หน้าประวัติการสนทนา", min_value=1, max_value=page_count, value=page_count, step=1)
+            st.caption(f"หน้า {page} จาก {page_count} (ทั้งหมด {chat_history.total_turns} คำถาม)")
         chat_container = st.container()
         with chat_container:
-            for i, (q, a) in enumerate(st.session_state.chat_history):
+            turns = chat_history.page(page, DEFAULT_PAGE_SIZE)
+            for i, (_, q, a) in enumerate(turns):
                 st.markdown(f"**คุณ**: {q}")
                 st.markdown(f"**แชทบอท**: {a}")
-                if i < len(st.session_state.chat_history) - 1:
+                if i < len(turns) - 1:
                     st.markdown("---")
         
         # Input for new question
@@ -431,22 +440,75 @@ if st.session_state.file_uploaded:
             submit_button = st.form_submit_button("ถามคำถาม")
             
             if submit_button and question:
-                # Get response
-                if st.session_state.api_key_set and 'gemini_model' in st.session_state:
-                    # ใช้ Gemini API
-                    response = get_gemini_response(st.session_state.gemini_model, question, all_dataframes)
+                started = time.perf_counter()
+                timings = {}
+                # คำถามที่ค้นจากตารางได้โดยตรง ตอบจาก pandas ไม่ต้องเรียก Gemini
+                intent, response = answer_locally(question, all_dataframes)
+                if response is not None:
+                    path = 'local'
+                elif st.session_state.api_key_set and 'gemini_model' in st.session_state:
+                    # แนบบทสนทนาก่อนหน้า (ย่อแล้ว) เพื่อให้ตอบคำถามต่อเนื่องได้ เช่น "แล้วถ้าทำ 4 คนล่ะ"
+                    conversation = chat_history.context_block()
+                    # คำถามเดิมกับข้อมูลชุดเดิม (และบทสนทนาเดียวกัน) ใช้คำตอบจาก cache ได้เลย
+                    cache_key = response_cache.make_key(question, data_version, cache_model_name(GEMINI_MODEL_NAME, USE_TOOLS), st.session_state.token_budget, conversation)
+                    response = response_cache.get(cache_key)
+                    if response is not None:
+                        path = 'cache'
+                    elif st.session_state.stream_response:
+                        # ใช้ Gemini API แบบสตรีม แสดงข้อความทันทีที่ได้รับ
+                        st.markdown(f"**คุณ**: {question}")
+                        response = st.write_stream(get_gemini_response_stream(
+                            st.session_state.gemini_model, question, all_dataframes, st.session_state.token_budget, timings, conversation, USE_TOOLS
+                        ))
+                        path = 'gemini'
+                        if 'error' not in timings:
+                            response_cache.set(cache_key, response)
+                    else:
+                        # ใช้ Gemini API
+                        response = get_gemini_response(st.session_state.gemini_model, question, all_dataframes, st.session_state.token_budget, conversation, timings, use_tools=USE_TOOLS)
+                        path = 'gemini'
+                        if 'error' not in timings:
+                            response_cache.set(cache_key, response)
                 else:
-                    response = "กรุณากำหนด Gemini API Key ที่ถูกต้องใน secrets หรือกรอก API Key ชั่วคราวในช่องทางด้านซ้าย เพื่อให้ระบบสามารถตอบคำถามของคุณได้"
+                    response = NO_MODEL_ANSWER
+                    path = 'none'
+                
+                # บันทึกว่าคำถามนี้ถูกตอบด้วยวิธีใด เพื่อวัดสัดส่วนที่ไม่ต้องเรียก Gemini
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                st.session_state.answer_log.append({
+                    'question': question,
+                    'intent': intent,
+                    'path': path,
+                    'first_token_ms': timings.get('first_token_ms'),
+                    'elapsed_ms': elapsed_ms
+                })
+                # metrics ของทั้ง process (JSONL / Prometheus / แผงใน sidebar)
+                metrics.record(
+                    app='thai_food',
+                    path=path,
+                    intent=intent,
+                    model=GEMINI_MODEL_NAME if path == 'gemini' else None,
+                    prompt_build_ms=timings.get('prompt_build_ms'),
+                    prompt_chars=timings.get('prompt_chars'),
+                    prompt_tokens=timings.get('prompt_tokens'),
+                    context_tokens_saved=timings.get('context_tokens_saved'),
+                    tool_calls=timings.get('tool_calls'),
+                    usage_prompt_tokens=timings.get('usage_prompt_tokens'),
+                    usage_output_tokens=timings.get('usage_output_tokens'),
+                    first_token_ms=timings.get('first_token_ms'),
+                    total_ms=elapsed_ms,
+                    error=timings.get('error')
+                )
                 
                 # Add to chat history
-                st.session_state.chat_history.append((question, response))
+                chat_history.add(question, response)
                 
                 # Rerun to update chat display
                 st.rerun()
         
         # Add option to clear chat history
         if st.button("ล้างประวัติการสนทนา"):
-            st.session_state.chat_history = []
+            chat_history.clear()
             st.rerun()
 
         # Add export chat history
@@ -482,15 +544,8 @@ else:
     
     # Add example questions
     st.write("## ตัวอย่างคำถาม")
-    st.write("- วิธีทำต้มยำกุ้งมีอะไรบ้าง?")
-    st.write("- แคลอรี่ของผัดไทยต่อจานเท่าไหร่?")
-    st.write("- ส่วนผสมของแกงเขียวหวานไก่มีอะไรบ้าง?")
-    st.write("- อยากทำต้มข่าไก่ต้องใช้วัตถุดิบอะไรบ้าง?")
-    st.write("- ราคาในการทำผัดไทยสำหรับ 4 คนประมาณเท่าไหร่?")
-    st.write("- แกงมัสมั่นใช้งบประมาณเท่าไหร่?")
-    st.write("- ผัดไทยทำยังไง?")
-    st.write("- อธิบายขั้นตอนการทำต้มยำกุ้ง")
-    st.write("- อาหารไทยที่มีแคลอรี่น้อยที่สุดคืออะไร?")
+    for example in EXAMPLE_QUESTIONS:
+        st.write(f"- {example}")
 
 # Run the app
 if __name__ == "__main__":
@@ -510,3 +565,40 @@ if __name__ == "__main__":
                 st.sidebar.markdown(f"- {filename}")
     else:
         st.sidebar.warning("ยังไม่ได้โหลดไฟล์ฐานข้อมูล กรุณาโหลดข้อมูลจากโฟลเดอร์ csv หรืออัปโหลดไฟล์ CSV หรือเลือกข้อมูลตัวอย่าง")
+    
+    # แสดงสัดส่วนคำถามที่ตอบได้โดยไม่ต้องเรียก Gemini
+    if st.session_state.answer_log:
+        total = len(st.session_state.answer_log)
+        local = sum(1 for entry in st.session_state.answer_log if entry['path'] == 'local')
+        st.sidebar.markdown("**สถิติการตอบคำถาม:**")
+        st.sidebar.markdown(f"- ตอบจากฐานข้อมูลโดยตรง {local}/{total} คำถาม ({local / total:.0%})")
+        streamed = [entry for entry in st.session_state.answer_log if entry.get('first_token_ms') is not None]
+        if streamed:
+            st.sidebar.markdown(f"- ล่าสุด: ข้อความแรก {streamed[-1]['first_token_ms']:.0f} ms, ครบทั้งคำตอบ {streamed[-1]['elapsed_ms']:.0f} ms")
+    
+    # แสดง p50/p95 ของทุกคำถามใน process นี้
+    metrics_summary = metrics.summary()
+    if metrics_summary['count']:
+        st.sidebar.markdown(f"**ประสิทธิภาพ ({metrics_summary['count']} คำถามล่าสุดของทุก session):**")
+        st.sidebar.markdown(
+            f"- ตอบจากฐานข้อมูล {metrics_summary['local_rate']:.0%}, จาก cache {metrics_summary['cache_rate']:.0%}, "
+            f"ผิดพลาด {metrics_summary['error_count']} ครั้ง"
+        )
+        for field, label, unit in (
+            ('total_ms', 'เวลาตอบทั้งหมด', 'ms'),
+            ('first_token_ms', 'ข้อความแรก', 'ms'),
+            ('prompt_build_ms', 'สร้าง prompt', 'ms'),
+            ('prompt_tokens', 'ขนาด prompt', 'token'),
+            ('context_tokens_saved', 'token ที่ลดได้จากการเลือกคอลัมน์', 'token'),
+        ):
+            if field in metrics_summary:
+                st.sidebar.markdown(f"- {label}: p50 {metrics_summary[field]['p50']:,.0f} / p95 {metrics_summary[field]['p95']:,.0f} {unit}")
+    
+    # แสดงสถิติ cache คำตอบ (รวมทุก session)
+    cache_stats = response_cache.stats()
+    st.sidebar.markdown("**Cache คำตอบ Gemini:**")
+    st.sidebar.markdown(f"- hit {cache_stats['hits']} / miss {cache_stats['misses']} ({cache_stats['hit_rate']:.0%}), เก็บไว้ {cache_stats['entries']} คำตอบ")
+
+# โหลด SDK ของ Gemini เบื้องหลังหลังจากหน้าเว็บแสดงผลแล้ว (คำถามแรกไม่ต้องรอ import)
+if isinstance(st.session_state.get('gemini_model'), GeminiClient):
+    st.session_state.gemini_model.model.warm_up()